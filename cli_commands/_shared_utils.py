@@ -1,6 +1,8 @@
 import argparse
 from pathlib import Path
 
+from empress.reconcile.result_cache import ResultCache, DEFAULT_MAX_BYTES
+
 
 def add_recon_input_args_to_parser(parser: argparse.ArgumentParser):
     parser.add_argument(
@@ -41,6 +43,29 @@ def add_dtl_costs_to_parser(parser: argparse.ArgumentParser):
     )
 
 
+def add_cache_to_parser(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--cache-dir",
+        metavar="<directory>",
+        default=None,
+        help="reuse reconciliations of the same trees and costs stored in this directory, "
+        "and store new ones there",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        metavar="<megabytes>",
+        default=DEFAULT_MAX_BYTES / 2**20,
+        help="size above which the least recently used reconciliations are removed from the cache",
+    )
+
+
+def get_cache(args):
+    if args.cache_dir is None:
+        return None
+    return ResultCache(args.cache_dir, int(args.cache_size * 2**20))
+
+
 def set_csv_path(args, command_str):
     fname = Path(args.parasite)
     cost_suffix = ".{}.{}-{}-{}".format(
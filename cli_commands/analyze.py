@@ -0,0 +1,214 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import empress
+from empress.reconcile import statistics
+import cli_commands._shared_utils
+
+
+def add_analyze_to_parser(analyze_parser: argparse.ArgumentParser):
+    cli_commands._shared_utils.add_recon_input_args_to_parser(analyze_parser)
+    cli_commands._shared_utils.add_dtl_costs_to_parser(analyze_parser)
+    cli_commands._shared_utils.add_cache_to_parser(analyze_parser)
+
+    # Stages to run, each with the default outputs of the command of the same name
+    analyze_parser.add_argument(
+        "--median",
+        action="store_true",
+        help="output a median reconciliation as a .csv file",
+    )
+    analyze_parser.add_argument(
+        "--graph",
+        action="store_true",
+        help="output the entire reconciliation graph as a .csv file",
+    )
+    analyze_parser.add_argument(
+        "--histogram",
+        action="store_true",
+        help="output the pairwise distance histogram as .pdf and .csv files and print its statistics",
+    )
+    analyze_parser.add_argument(
+        "--p-value",
+        action="store_true",
+        help="output the p-value test drawing as a .pdf file",
+    )
+    analyze_parser.add_argument(
+        "--clusters",
+        type=int,
+        metavar="<number_of_clusters>",
+        default=None,
+        help="cluster the reconciliations into this many clusters and print the scores",
+    )
+
+    # Stage options
+    analyze_parser.add_argument(
+        "--n-samples",
+        metavar="<number of samples>",
+        type=int,
+        help="Number of random mappings to sample for the p-value.",
+        default=100,
+    )
+    analyze_parser.add_argument(
+        "--workers",
+        metavar="<number of processes>",
+        type=int,
+        help="Number of processes to sample the random mappings with.",
+        default=1,
+    )
+    analyze_parser.add_argument(
+        "--seed",
+        metavar="<seed>",
+        type=int,
+        help="Seed of the random mappings.",
+        default=None,
+    )
+    analyze_parser.add_argument(
+        "--n-splits",
+        type=int,
+        metavar="<splits>",
+        default=empress.CLUSTER_NSPLITS,
+        help="find at least n splits before combining the splits into clusters",
+    )
+    analyze_parser.add_argument(
+        "--support",
+        action="store_true",
+        help="use the weighted average event support instead of the weighted average "
+        "distance to evaluate clusters",
+    )
+
+
+def run_analyze(args):
+    if not (
+        args.median
+        or args.graph
+        or args.histogram
+        or args.p_value
+        or args.clusters is not None
+    ):
+        raise SystemExit(
+            "analyze: choose at least one of --median, --graph, --histogram, --p-value, --clusters"
+        )
+
+    # Parse and reconcile once, for every stage
+    recon_input = empress.ReconInputWrapper.from_files(
+        args.host, args.parasite, args.mapping
+    )
+    recon_graph = recon_input.reconcile(
+        args.dup_cost,
+        args.trans_cost,
+        args.loss_cost,
+        cache=cli_commands._shared_utils.get_cache(args),
+    )
+    print("Number of optimal reconciliations: {}".format(recon_graph.n_recon))
+
+    # The p-value trials are independent of the other stages, so they run in the background. With several
+    # workers they already run in a process pool, which a thread can wait on; otherwise they get a process.
+    p_value_future = None
+    if args.p_value:
+        if args.workers > 1:
+            executor = ThreadPoolExecutor(1)
+        else:
+            executor = ProcessPoolExecutor(1)
+        with executor:
+            p_value_future = executor.submit(
+                statistics.stats,
+                recon_input,
+                args.dup_cost,
+                args.trans_cost,
+                args.loss_cost,
+                args.n_samples,
+                args.workers,
+                args.seed,
+                recon_graph.total_cost,
+            )
+            _run_graph_stages(args, recon_input, recon_graph)
+            mpr_cost, costs, p = p_value_future.result()
+        _save_p_value(args, mpr_cost, costs, p)
+    else:
+        _run_graph_stages(args, recon_input, recon_graph)
+
+
+def _run_graph_stages(args, recon_input, recon_graph):
+    """
+    Run the stages that use the reconciliation graph
+    """
+    from empress.cluster import cluster_main
+    from empress.histogram import histogram_main
+
+    if args.median:
+        csv = _output_path(args, "recon", ".csv")
+        print("Output median to {}".format(csv))
+        recon_graph.median().export_csv(csv)
+    if args.graph:
+        csv = _output_path(args, "recon_graph", ".csv")
+        print("Output reconciliation graph to {}".format(csv))
+        recon_graph.export_csv(csv)
+    if args.histogram:
+        histogram_args = argparse.Namespace(
+            **vars(args),
+            histogram_pdf=_output_path(args, "histogram", ".pdf"),
+            csv=_output_path(args, "histogram", ".csv"),
+            time=False,
+            stats=True,
+            omit_zeros=False,
+            xnorm=False,
+            ynorm=False,
+            cumulative=False,
+        )
+        histogram_main.compute_pdv(
+            args.host,
+            recon_input,
+            args.dup_cost,
+            args.trans_cost,
+            args.loss_cost,
+            histogram_args,
+            reconciliation=(
+                recon_input.host_dict,
+                recon_input.parasite_dict,
+                recon_graph.recongraph,
+                recon_graph.n_recon,
+                recon_graph.roots,
+            ),
+        )
+    if args.clusters is not None:
+        cluster_args = argparse.Namespace(
+            **vars(args),
+            n_clusters=args.clusters,
+            depth=None,
+            pdv=not args.support,
+            pdv_engine="moments",
+            pdv_vis=False,
+            support_vis=False,
+            medians=False,
+        )
+        cluster_main.perform_clustering(
+            recon_input,
+            args.dup_cost,
+            args.trans_cost,
+            args.loss_cost,
+            args.clusters,
+            cluster_args,
+            tree_info=recon_graph.tree_info(),
+        )
+
+
+def _save_p_value(args, mpr_cost, costs, p):
+    from matplotlib import pyplot as plt
+
+    outfile = _output_path(args, "pvalue", ".pdf")
+    print("p-value {}, output to {}".format(p, outfile))
+    fig, ax = plt.subplots(1, 1)
+    statistics.draw_stats(ax, mpr_cost, costs, p)
+    fig.savefig(outfile)
+    plt.close(fig)
+
+
+def _output_path(args, command_str: str, suffix: str) -> str:
+    """
+    :return: the file an output of a stage goes to, next to the parasite file
+    """
+    cost_suffix = ".{}.{}-{}-{}".format(
+        command_str, args.dup_cost, args.trans_cost, args.loss_cost
+    )
+    return str(Path(args.parasite).with_suffix(cost_suffix + suffix))
@@ -0,0 +1,352 @@
+import argparse
+import csv
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import empress
+from empress import instrumentation
+from empress.reconcile.result_cache import ResultCache
+from empress.reconcile.tree_index import HostTreeIndex
+import cli_commands._shared_utils
+
+RESULT_FIELDS = [
+    "parasite",
+    "mapping",
+    "dup_cost",
+    "trans_cost",
+    "loss_cost",
+    "status",
+    "total_cost",
+    "n_recon",
+    "cospeciations",
+    "duplications",
+    "transfers",
+    "losses",
+    "median_csv",
+    "seconds",
+]
+
+# Per-process state of the workers, set by _init_worker
+_worker = {}
+
+
+class _FamilyTimeout(BaseException):
+    # Not an Exception, so that the code that is interrupted does not catch it
+    pass
+
+
+def add_batch_to_parser(batch_parser: argparse.ArgumentParser):
+    batch_parser.add_argument(
+        "host", metavar="<host_file>", help="file path to the host tree"
+    )
+    batch_parser.add_argument(
+        "manifest",
+        metavar="<manifest_file>",
+        help="tab-separated file with one gene family per line: parasite tree file, tip mapping "
+        "file and, optionally, duplication, transfer and loss costs for that family. Relative "
+        "paths are relative to the manifest",
+    )
+    cli_commands._shared_utils.add_dtl_costs_to_parser(batch_parser)
+    cli_commands._shared_utils.add_cache_to_parser(batch_parser)
+    batch_parser.add_argument(
+        "--results",
+        metavar="<filename>",
+        default=None,
+        help="tab-separated file the results are appended to. Families already in it are "
+        "skipped, so an interrupted batch can be resumed. If no filename is provided, "
+        "outputs to a filename based on the manifest file",
+    )
+    batch_parser.add_argument(
+        "--median-dir",
+        metavar="<directory>",
+        default=None,
+        help="directory of the median reconciliation .csv files. By default each one is "
+        "next to its parasite file",
+    )
+    batch_parser.add_argument(
+        "--workers",
+        metavar="<number of processes>",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes the families are reconciled in",
+    )
+    batch_parser.add_argument(
+        "--timeout",
+        metavar="<seconds>",
+        type=float,
+        default=None,
+        help="give up on a family after this many seconds (not available on Windows)",
+    )
+    batch_parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="reconcile again the families whose earlier attempt failed or timed out",
+    )
+
+
+def run_batch(args):
+    manifest = Path(args.manifest)
+    if args.results is None:
+        args.results = str(manifest.with_suffix(".results.tsv"))
+    try:
+        families = read_manifest(
+            manifest, (args.dup_cost, args.trans_cost, args.loss_cost)
+        )
+    except ValueError as e:
+        raise SystemExit("batch: {}".format(e))
+
+    done = _finished_families(args.results, args.retry_failed)
+    todo = [family for family in families if _family_key(family) not in done]
+    print(
+        "{} families, {} already done, results in {}".format(
+            len(families), len(families) - len(todo), args.results
+        )
+    )
+    if not todo:
+        return
+
+    recon_input = empress.ReconInputWrapper()
+    recon_input.read_host(args.host)
+    init_args = (
+        recon_input.host_dict,
+        recon_input.host_distances,
+        args.median_dir,
+        args.cache_dir,
+        args.cache_size,
+        args.timeout,
+        getattr(args, "profile", None),
+    )
+    if args.median_dir is not None:
+        os.makedirs(args.median_dir, exist_ok=True)
+
+    new_file = not os.path.exists(args.results) or os.path.getsize(args.results) == 0
+    if not new_file:
+        with open(args.results, "rb") as results_file:
+            results_file.seek(-1, os.SEEK_END)
+            cut_short = results_file.read() != b"\n"
+    with open(args.results, "a", newline="") as results_file:
+        writer = csv.DictWriter(results_file, RESULT_FIELDS, delimiter="\t")
+        if new_file:
+            writer.writeheader()
+        elif cut_short:
+            # End the line an earlier run was writing when it stopped
+            results_file.write("\r\n")
+        n_failed = 0
+        for row in _run_families(todo, init_args, max(1, args.workers)):
+            writer.writerow(row)
+            # Every finished family is on disk before the next one is reported
+            results_file.flush()
+            if row["status"] != "ok":
+                n_failed += 1
+                print("{}: {}".format(row["parasite"], row["status"]))
+    print("{} families reconciled, {} failed".format(len(todo) - n_failed, n_failed))
+
+
+def read_manifest(manifest: Path, default_costs: tuple) -> list:
+    """
+    :param manifest <Path>          - the manifest file, see add_batch_to_parser
+    :param default_costs <tuple>    - costs of the families without costs in the manifest
+    :return: list of (parasite file, mapping file, dup_cost, trans_cost, loss_cost) of the families
+    """
+    families = []
+    with open(manifest, newline="") as manifest_file:
+        for line_number, fields in enumerate(
+            csv.reader(manifest_file, delimiter="\t"), 1
+        ):
+            fields = [field.strip() for field in fields]
+            if not fields or not fields[0] or fields[0].startswith("#"):
+                continue
+            if line_number == 1 and fields[0].lower() == "parasite":
+                # Header line
+                continue
+            if len(fields) == 2:
+                costs = default_costs
+            elif len(fields) == 5:
+                try:
+                    costs = tuple(float(cost) for cost in fields[2:])
+                except ValueError:
+                    raise ValueError(
+                        "{}:{}: costs must be numbers".format(manifest, line_number)
+                    )
+            else:
+                raise ValueError(
+                    "{}:{}: expected 2 or 5 tab-separated fields, got {}".format(
+                        manifest, line_number, len(fields)
+                    )
+                )
+            parasite, mapping = (str(manifest.parent / field) for field in fields[:2])
+            families.append((parasite, mapping) + tuple(costs))
+    return families
+
+
+def _family_key(family: tuple) -> tuple:
+    parasite, mapping, dup_cost, trans_cost, loss_cost = family
+    return parasite, mapping, float(dup_cost), float(trans_cost), float(loss_cost)
+
+
+def _finished_families(results: str, retry_failed: bool) -> set:
+    """
+    :return: the keys of the families in the results file that do not need to be reconciled again
+    """
+    if not os.path.exists(results):
+        return set()
+    status = {}
+    with open(results, newline="") as results_file:
+        for row in csv.DictReader(results_file, delimiter="\t"):
+            if row[RESULT_FIELDS[-1]] is None:
+                # Line cut short by a crash
+                continue
+            key = _family_key(tuple(row[field] for field in RESULT_FIELDS[:5]))
+            # The last attempt at a family is the one that counts
+            status[key] = row["status"]
+    return {
+        key
+        for key, family_status in status.items()
+        if family_status == "ok" or not retry_failed
+    }
+
+
+def _run_families(families: list, init_args: tuple, n_workers: int):
+    """
+    Reconcile the families in a process pool and yield a result row for each one, in the order they finish.
+    If a worker process dies, only the families it was running fail, and the pool is started again.
+    """
+    pending = list(reversed(families))
+    while pending:
+        with ProcessPoolExecutor(
+            n_workers, initializer=_init_worker, initargs=init_args
+        ) as executor:
+            running = {}
+            broken = False
+            while (pending or running) and not broken:
+                # Only a few families are submitted at a time, so that a dying worker takes as few
+                # families down with it as possible
+                while pending and len(running) < 2 * n_workers:
+                    family = pending.pop()
+                    running[executor.submit(_reconcile_family, family)] = family
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    family = running.pop(future)
+                    try:
+                        row = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        row = _failed_row(family, "error: worker process died")
+                    except BaseException as e:
+                        row = _failed_row(family, "error: {!r}".format(e))
+                    yield row
+            if broken:
+                for family in running:
+                    yield _failed_row(family, "error: worker process died")
+
+
+def _init_worker(
+    host_dict, host_distances, median_dir, cache_dir, cache_size, timeout, profile
+):
+    """
+    Set up a worker process: the host tree and its index are shared by all the families it reconciles
+    """
+    _worker["host_dict"] = host_dict
+    _worker["host_distances"] = host_distances
+    _worker["host_index"] = HostTreeIndex(host_dict)
+    _worker["median_dir"] = median_dir
+    _worker["cache"] = (
+        None if cache_dir is None else ResultCache(cache_dir, int(cache_size * 2**20))
+    )
+    _worker["timeout"] = timeout
+    _worker["profile"] = profile
+
+
+def _reconcile_family(family: tuple) -> dict:
+    """
+    Reconcile one family, write its median and return its result row. Errors are reported in the row.
+    """
+    start = time.time()
+    timeout = _worker["timeout"]
+    use_alarm = timeout is not None and hasattr(signal, "SIGALRM")
+    try:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            if _worker["profile"] is None:
+                row = _family_result(family)
+            else:
+                # The records of every family are appended to the same file, tagged with the family
+                with instrumentation.profiling(_worker["profile"], family=family[0]):
+                    row = _family_result(family)
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except _FamilyTimeout:
+        return _failed_row(family, "timeout", time.time() - start)
+    except Exception as e:
+        return _failed_row(
+            family, "error: {}".format(e).replace("\t", " ").replace("\n", " ")
+        )
+    row["seconds"] = "{:.3f}".format(time.time() - start)
+    return row
+
+
+def _family_result(family: tuple) -> dict:
+    """
+    :return: the result row of reconciling family, whose median is written to its .csv file
+    """
+    parasite, mapping, dup_cost, trans_cost, loss_cost = family
+    recon_input = empress.ReconInputWrapper(
+        _worker["host_dict"], _worker["host_distances"]
+    )
+    with instrumentation.span("parse"):
+        recon_input.read_parasite(parasite)
+        recon_input.read_mapping(mapping)
+        instrumentation.count(
+            parasite_edges=len(recon_input.parasite_dict),
+            tips=len(recon_input.tip_mapping),
+        )
+    recon_graph = recon_input.reconcile(
+        dup_cost,
+        trans_cost,
+        loss_cost,
+        host_index=_worker["host_index"],
+        cache=_worker["cache"],
+    )
+    median_csv = _median_path(parasite, _worker["median_dir"], family[2:])
+    median = recon_graph.median()
+    median.export_csv(median_csv)
+    cospeciations, duplications, transfers, losses = median.count_events()
+    return dict(
+        zip(RESULT_FIELDS[:5], family),
+        status="ok",
+        total_cost=recon_graph.total_cost,
+        n_recon=recon_graph.n_recon,
+        cospeciations=cospeciations,
+        duplications=duplications,
+        transfers=transfers,
+        losses=losses,
+        median_csv=median_csv,
+    )
+
+
+def _raise_timeout(signum, frame):
+    raise _FamilyTimeout()
+
+
+def _failed_row(family: tuple, status: str, seconds: float = None) -> dict:
+    row = dict(zip(RESULT_FIELDS[:5], family), status=status)
+    if seconds is not None:
+        row["seconds"] = "{:.3f}".format(seconds)
+    return row
+
+
+def _median_path(parasite: str, median_dir: str, costs: tuple) -> str:
+    """
+    :return: the median .csv file of a family, named like the one of the reconcile command
+    """
+    median_csv = Path(parasite).with_suffix(".recon.{}-{}-{}.csv".format(*costs))
+    if median_dir is not None:
+        median_csv = Path(median_dir) / median_csv.name
+    return str(median_csv)
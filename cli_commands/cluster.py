@@ -1,12 +1,13 @@
 import argparse
 import empress
-from empress.cluster import cluster_main
+from empress.histogram import histogram_alg
 import cli_commands._shared_utils
 
 
 def add_cluster_to_parser(cluster_parser: argparse.ArgumentParser):
     cli_commands._shared_utils.add_recon_input_args_to_parser(cluster_parser)
     cli_commands._shared_utils.add_dtl_costs_to_parser(cluster_parser)
+    cli_commands._shared_utils.add_cache_to_parser(cluster_parser)
 
     cluster_parser.add_argument(
         "n_clusters",
@@ -62,9 +63,18 @@ def add_cluster_to_parser(cluster_parser: argparse.ArgumentParser):
         action="store_true",
         help="use the weighted average event support to evaluate clusters",
     )
+    cluster_parser.add_argument(
+        "--pdv-engine",
+        choices=list(histogram_alg.PDV_ENGINES),
+        default="moments",
+        help="how --pdv computes the average distance: from the moments of the distances "
+        "(faster) or from their whole histogram. Both give the same average",
+    )
 
 
 def run_cluster(args):
+    from empress.cluster import cluster_main
+
     recon_input = empress.ReconInputWrapper.from_files(
         args.host, args.parasite, args.mapping
     )
@@ -75,4 +85,5 @@ def run_cluster(args):
         args.loss_cost,
         args.n_clusters,
         args,
+        cache=cli_commands._shared_utils.get_cache(args),
     )
@@ -2,7 +2,6 @@ import argparse
 from pathlib import Path
 
 import empress
-from empress.xscape import costscape
 import cli_commands._shared_utils
 
 
@@ -54,6 +53,8 @@ def add_cost_regions_to_parser(cost_regions_parser: argparse.ArgumentParser):
 
 
 def run_cost_regions(args):
+    from empress.xscape import costscape
+
     recon_input = empress.ReconInputWrapper.from_files(
         args.host, args.parasite, args.mapping
     )
@@ -2,13 +2,13 @@ import argparse
 from pathlib import Path
 
 import empress
-from empress.histogram import histogram_main
 import cli_commands._shared_utils
 
 
 def add_histogram_to_parser(histogram_parser: argparse.ArgumentParser):
     cli_commands._shared_utils.add_recon_input_args_to_parser(histogram_parser)
     cli_commands._shared_utils.add_dtl_costs_to_parser(histogram_parser)
+    cli_commands._shared_utils.add_cache_to_parser(histogram_parser)
 
     histogram_parser.add_argument(
         "--histogram-pdf",
@@ -61,6 +61,8 @@ def add_histogram_to_parser(histogram_parser: argparse.ArgumentParser):
 
 
 def run_histogram(args):
+    from empress.histogram import histogram_main
+
     recon_input = empress.ReconInputWrapper.from_files(
         args.host, args.parasite, args.mapping
     )
@@ -84,5 +86,11 @@ def run_histogram(args):
         assert c.suffix == ".csv"
 
     histogram_main.compute_pdv(
-        args.host, recon_input, args.dup_cost, args.trans_cost, args.loss_cost, args
+        args.host,
+        recon_input,
+        args.dup_cost,
+        args.trans_cost,
+        args.loss_cost,
+        args,
+        cache=cli_commands._shared_utils.get_cache(args),
     )
@@ -1,6 +1,5 @@
 import argparse
 from pathlib import Path
-from matplotlib import pyplot as plt
 import cli_commands._shared_utils
 import empress
 
@@ -8,6 +7,7 @@ import empress
 def add_p_value_to_parser(p_value_parser: argparse.ArgumentParser):
     cli_commands._shared_utils.add_recon_input_args_to_parser(p_value_parser)
     cli_commands._shared_utils.add_dtl_costs_to_parser(p_value_parser)
+    cli_commands._shared_utils.add_cache_to_parser(p_value_parser)
     p_value_parser.add_argument(
         "--outfile",
         metavar="<filename>",
@@ -18,12 +18,44 @@ def add_p_value_to_parser(p_value_parser: argparse.ArgumentParser):
         "--n-samples",
         metavar="<number of samples>",
         type=int,
-        help="Number of random mappings to sample.",
+        help="Number of random mappings to sample. With --alpha, the maximum number.",
         default=100,
     )
+    p_value_parser.add_argument(
+        "--alpha",
+        metavar="<significance level>",
+        type=float,
+        help="Stop sampling as soon as the confidence interval on the p-value lies "
+        "entirely below or above this significance level.",
+        default=None,
+    )
+    p_value_parser.add_argument(
+        "--confidence",
+        metavar="<confidence level>",
+        type=float,
+        help="Confidence level of the interval used with --alpha.",
+        default=0.99,
+    )
+    p_value_parser.add_argument(
+        "--workers",
+        metavar="<number of processes>",
+        type=int,
+        help="Number of processes to sample the random mappings with.",
+        default=1,
+    )
+    p_value_parser.add_argument(
+        "--seed",
+        metavar="<seed>",
+        type=int,
+        help="Seed of the random mappings. The same seed gives the same p-value "
+        "for any number of processes.",
+        default=None,
+    )
 
 
 def run_p_value(args):
+    from matplotlib import pyplot as plt
+
     recon_input = empress.ReconInputWrapper.from_files(
         args.host, args.parasite, args.mapping
     )
@@ -35,7 +67,24 @@ def run_p_value(args):
         outfile = host_filepath.with_suffix(cost_suffix + ".pdf")
     else:
         outfile = args.outfile
-    recongraph = recon_input.reconcile(args.dup_cost, args.trans_cost, args.loss_cost)
-    fig = recongraph.draw_stats(args.n_samples)
+    recongraph = recon_input.reconcile(
+        args.dup_cost,
+        args.trans_cost,
+        args.loss_cost,
+        cache=cli_commands._shared_utils.get_cache(args),
+    )
+    if args.alpha is None:
+        fig = recongraph.draw_stats(args.n_samples, args.workers, args.seed)
+    else:
+        costs, p, (low, high) = recongraph.sequential_stats(
+            args.alpha, args.n_samples, args.confidence, args.workers, args.seed
+        )
+        print(
+            "p-value {} after {} samples, {}% interval [{}, {}]".format(
+                p, len(costs), args.confidence * 100, low, high
+            )
+        )
+        fig, ax = plt.subplots(1, 1)
+        empress.statistics.draw_stats(ax, recongraph.total_cost, costs, p)
     fig.savefig(outfile)
     plt.close(fig)
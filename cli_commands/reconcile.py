@@ -8,6 +8,7 @@ import cli_commands._shared_utils
 def add_reconcile_to_parser(reconcile_parser: argparse.ArgumentParser):
     cli_commands._shared_utils.add_recon_input_args_to_parser(reconcile_parser)
     cli_commands._shared_utils.add_dtl_costs_to_parser(reconcile_parser)
+    cli_commands._shared_utils.add_cache_to_parser(reconcile_parser)
     reconcile_parser.add_argument(
         "--csv",
         metavar="<filename>",
@@ -31,7 +32,12 @@ def run_reconcile(args):
     recon_input = empress.ReconInputWrapper.from_files(
         args.host, args.parasite, args.mapping
     )
-    recon_graph = recon_input.reconcile(args.dup_cost, args.trans_cost, args.loss_cost)
+    recon_graph = recon_input.reconcile(
+        args.dup_cost,
+        args.trans_cost,
+        args.loss_cost,
+        cache=cli_commands._shared_utils.get_cache(args),
+    )
     if args.graph:
         recon_graph.export_csv(args.csv)
     else:
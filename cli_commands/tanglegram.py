@@ -1,6 +1,5 @@
 import argparse
 from pathlib import Path
-from matplotlib import pyplot as plt
 
 import empress
 import cli_commands._shared_utils
@@ -17,6 +16,8 @@ def add_tanglegram_to_parser(tanglegram_parser: argparse.ArgumentParser):
 
 
 def run_tanglegram(args):
+    from matplotlib import pyplot as plt
+
     recon_input = empress.ReconInputWrapper.from_files(
         args.host, args.parasite, args.mapping
     )
@@ -1,33 +1,60 @@
 """
 Wraps empress functionalities
 """
-from typing import Dict
+from __future__ import annotations
+
+from typing import Dict, TYPE_CHECKING
+import importlib
 import sys
 
-from matplotlib import pyplot as plt
 from typing import List, Tuple
 from abc import ABC, abstractmethod
 
+from empress import instrumentation
 from empress.xscape.CostVector import CostVector
 from empress.input_reader import _ReconInput
 from empress.xscape.reconcile import reconcile as xscape_reconcile
-from empress.xscape.plotcosts_analytic import (
-    plot_costs_on_axis as xscape_plot_costs_on_axis,
-)
 from empress.reconcile import recongraph_tools
-from empress.reconcile import recongraph_visualization
+from empress.reconcile import array_dp
 from empress.reconcile import median
 from empress.reconcile import diameter
+from empress.reconcile.tree_index import HostTreeIndex
+from empress.reconcile.result_cache import ResultCache
 from empress.reconcile import statistics
-from empress.histogram import histogram_display
 from empress.histogram import histogram_alg
 from empress.cluster import cluster_util
-from empress.recon_vis import recon_viewer
-from empress.recon_vis import tanglegram
+
+# matplotlib, shapely and networkx take longer to import than most reconciliations take to run, so the
+# modules that draw are only imported when something is drawn. They are still available as attributes
+# of this module (see __getattr__).
+if TYPE_CHECKING:
+    from matplotlib import pyplot as plt
+
+_DRAWING_MODULES = {
+    "plt": "matplotlib.pyplot",
+    "recongraph_visualization": "empress.reconcile.recongraph_visualization",
+    "histogram_display": "empress.histogram.histogram_display",
+    "recon_viewer": "empress.recon_vis.recon_viewer",
+    "tanglegram": "empress.recon_vis.tanglegram",
+}
+
+
+def __getattr__(name: str):
+    if name in _DRAWING_MODULES:
+        return importlib.import_module(_DRAWING_MODULES[name])
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 CLUSTER_NSPLITS = 16
 STATS_TRIALS = 100
 
+# DP implementations that ReconInputWrapper.reconcile can use. They all return the same results;
+# "array" uses integer ids and NumPy tables and is much faster on large host trees.
+RECON_ENGINES = {
+    "dict": recongraph_tools.DP,
+    "array": array_dp.DP,
+}
+
 
 def _find_roots(old_recon_graph) -> list:
     not_roots = set()
@@ -67,8 +94,11 @@ class Drawable(ABC):
         """
         Draw self as matplotlib Figure.
         """
-        figure, ax = plt.subplots(1, 1)
-        self.draw_on(ax, **kwargs)
+        from matplotlib import pyplot as plt
+
+        with instrumentation.span("render", drawing=type(self).__name__):
+            figure, ax = plt.subplots(1, 1)
+            self.draw_on(ax, **kwargs)
         return figure
 
 
@@ -105,6 +135,8 @@ class ReconciliationWrapper(Drawable):
         show_legend: bool = False,
         node_font_size: float = 0.3,
     ):
+        from empress.recon_vis import recon_viewer
+
         recon_viewer.render(
             self.recon_input.host_dict,
             self.recon_input.parasite_dict,
@@ -163,7 +195,14 @@ class ReconGraphWrapper(Drawable):
         total_cost: float,
         event_frequencies: Dict[tuple, float] = None,
         node_frequencies: Dict[tuple, float] = None,
+        host_index: HostTreeIndex = None,
+        parasite_tree: tuple = None,
     ):
+        """
+        :param host_index <HostTreeIndex>   - index of the host tree to share, or None to build it on first use
+        :param parasite_tree <tuple>        - the parasite tree as returned by diameter.reformat_tree, to share
+            with other ReconGraphWrappers of the same recon_input, or None to compute it on first use
+        """
         self.recon_input = recon_input
         self.dup_cost = dup_cost
         self.trans_cost = trans_cost
@@ -174,48 +213,214 @@ class ReconGraphWrapper(Drawable):
         self.roots = roots
         self.event_frequencies = event_frequencies
         self.node_frequencies = node_frequencies
+        self._host_index = host_index
+        # Values derived from the graph, computed on first use (see _artifact)
+        self._artifacts = {}
+        if parasite_tree is not None:
+            self._artifacts["parasite_tree"] = parasite_tree
+
+    @property
+    def host_index(self) -> HostTreeIndex:
+        """
+        The HostTreeIndex of the host tree, built on first use and shared with the
+        ReconGraphWrappers self is clustered into.
+        """
+        if self._host_index is None:
+            self._host_index = HostTreeIndex(self.recon_input.host_dict)
+        return self._host_index
 
-    def draw_on(self, axes: plt.Axes, y_label=True):
+    def _artifact(self, name: str, compute):
         """
-        Draw Pairwise Distance Histogram on axes
+        Return the artifact called name, calling compute to get it the first time.
+        self.recongraph must not be modified once artifacts have been computed.
+        Computing an artifact is profiled as a span called name (see instrumentation.py).
+        """
+        if name not in self._artifacts:
+            with instrumentation.span(name):
+                self._artifacts[name] = compute()
+        return self._artifacts[name]
+
+    @property
+    def parasite_tree(self) -> tuple:
+        """
+        The parasite tree, its root and its number of nodes, as returned by diameter.reformat_tree
         """
-        # Reformat the host and parasite tree to use it with the histogram algorithm
-        parasite_tree, parasite_tree_root, parasite_node_count = diameter.reformat_tree(
-            self.recon_input.parasite_dict, "pTop"
+        return self._artifact(
+            "parasite_tree",
+            lambda: diameter.reformat_tree(self.recon_input.parasite_dict, "pTop"),
         )
-        host_tree, host_tree_root, host_node_count = diameter.reformat_tree(
-            self.recon_input.host_dict, "hTop"
+
+    @property
+    def mapping_node_order(self) -> list:
+        """
+        The mapping nodes of self.recongraph in the postorder of median.mapping_node_sort
+        """
+
+        def compute():
+            parasite_tree, _, _ = self.parasite_tree
+            host_tree, _, _ = self.host_index.vertex_tree()
+            return median.mapping_node_sort(
+                parasite_tree,
+                host_tree,
+                list(self.recongraph.keys()),
+                self.host_index,
+            )
+
+        return self._artifact("mapping_node_order", compute)
+
+    @property
+    def frequencies(self) -> tuple:
+        """
+        The node frequencies, event frequencies and number of MPRs of self.recongraph, as returned by
+        median.generate_frequencies_dict
+        """
+        return self._artifact(
+            "frequencies",
+            lambda: median.generate_frequencies_dict(
+                self.mapping_node_order[::-1], self.recongraph, self.parasite_tree[1]
+            ),
         )
-        hist = histogram_alg.diameter_algorithm(
-            host_tree,
+
+    @property
+    def pdv_histogram(self) -> histogram_alg.Histogram:
+        """
+        The pairwise distance histogram of the reconciliations in self
+        """
+
+        def compute():
+            parasite_tree, parasite_tree_root, _ = self.parasite_tree
+            host_tree, _, _ = self.host_index.vertex_tree()
+            return histogram_alg.diameter_algorithm(
+                host_tree,
+                parasite_tree,
+                parasite_tree_root,
+                self.recongraph,
+                self.recongraph,
+                False,
+                False,
+                species_index=self.host_index,
+            )
+
+        return self._artifact("pdv_histogram", compute)
+
+    @property
+    def median_graph(self) -> tuple:
+        """
+        The median reconciliation graph, its roots and the number of medians below each of its nodes,
+        from which median draws random medians
+        """
+
+        def compute():
+            _, event_frequencies, _ = self.frequencies
+            median_reconciliation, _, roots_for_median = median.compute_median(
+                self.recongraph,
+                event_frequencies,
+                self.mapping_node_order,
+                self.roots,
+            )
+            med_counts_dict = median.get_med_counts(
+                median_reconciliation, roots_for_median
+            )
+            return median_reconciliation, roots_for_median, med_counts_dict
+
+        return self._artifact("median_graph", compute)
+
+    def tree_info(self) -> tuple:
+        """
+        Return the parasite tree, host tree, parasite root, reconciliation graph, number of MPRs
+        and roots of self, in the format of cluster_util.get_tree_info
+        """
+        parasite_tree, parasite_root, _ = self.parasite_tree
+        host_tree, _, _ = self.host_index.vertex_tree()
+        return (
             parasite_tree,
-            parasite_tree_root,
-            self.recongraph,
+            host_tree,
+            parasite_root,
             self.recongraph,
-            False,
-            False,
+            self.n_recon,
+            self.roots,
+        )
+
+    def draw_on(self, axes: plt.Axes, y_label=True):
+        """
+        Draw Pairwise Distance Histogram on axes
+        """
+        from empress.histogram import histogram_display
+
+        histogram_display.plot_histogram_to_ax(
+            axes, self.pdv_histogram.histogram_dict, y_label
         )
-        histogram_display.plot_histogram_to_ax(axes, hist.histogram_dict, y_label)
 
     def draw_graph_to_file(self, fname):
         """
         Draw self and save it as image at path fname.
         """
+        from empress.reconcile import recongraph_visualization
+
         recongraph_visualization.visualize_and_save(self.recongraph, fname)
 
-    def stats(self, num_trials: int = STATS_TRIALS):
+    def stats(self, num_trials: int = STATS_TRIALS, n_workers: int = 1, seed: int = None):
+        """
+        Return the costs of num_trials random tip mappings and the p-value of self.
+        The trials are split across n_workers processes; for a given seed the results
+        do not depend on n_workers.
+        """
         _, costs, p = statistics.stats(
-            self.recon_input, self.dup_cost, self.trans_cost, self.loss_cost, num_trials
+            self.recon_input,
+            self.dup_cost,
+            self.trans_cost,
+            self.loss_cost,
+            num_trials,
+            n_workers,
+            seed,
+            self.total_cost,
         )
         return costs, p
 
-    def draw_stats_on(self, ax: plt.Axes, num_trials: int = STATS_TRIALS):
-        costs, p = self.stats(num_trials)
+    def sequential_stats(
+        self,
+        alpha: float,
+        max_trials: int = STATS_TRIALS,
+        confidence: float = 0.99,
+        n_workers: int = 1,
+        seed: int = None,
+    ):
+        """
+        Like stats, but stop sampling as soon as the confidence interval on the p-value
+        lies entirely below or above alpha. Return the costs of the trials that were run,
+        the p-value, and the interval.
+        """
+        _, costs, p, interval = statistics.sequential_stats(
+            self.recon_input,
+            self.dup_cost,
+            self.trans_cost,
+            self.loss_cost,
+            max_trials,
+            alpha,
+            confidence,
+            n_workers,
+            seed,
+            self.total_cost,
+        )
+        return costs, p, interval
+
+    def draw_stats_on(
+        self,
+        ax: plt.Axes,
+        num_trials: int = STATS_TRIALS,
+        n_workers: int = 1,
+        seed: int = None,
+    ):
+        costs, p = self.stats(num_trials, n_workers, seed)
         statistics.draw_stats(ax, self.total_cost, costs, p)
 
-    def draw_stats(self, num_trials: int = STATS_TRIALS):
+    def draw_stats(
+        self, num_trials: int = STATS_TRIALS, n_workers: int = 1, seed: int = None
+    ):
+        from matplotlib import pyplot as plt
+
         figure, ax = plt.subplots(1, 1)
-        self.draw_stats_on(ax, num_trials)
+        self.draw_stats_on(ax, num_trials, n_workers, seed)
         return figure
 
     def median(self) -> ReconciliationWrapper:
@@ -223,24 +428,7 @@ class ReconGraphWrapper(Drawable):
         Return one of the best ReconciliationWrapper that best represents the
         reconciliation graph. The function internally uses random and is not deterministic.
         """
-        postorder_parasite_tree, parasite_tree_root, _ = diameter.reformat_tree(
-            self.recon_input.parasite_dict, "pTop"
-        )
-        postorder_host_tree, _, _ = diameter.reformat_tree(
-            self.recon_input.host_dict, "hTop"
-        )
-
-        # Compute the median reconciliation graph
-        median_reconciliation, n_meds, roots_for_median = median.get_median_graph(
-            self.recongraph,
-            postorder_parasite_tree,
-            postorder_host_tree,
-            parasite_tree_root,
-            self.roots,
-        )
-
-        med_counts_dict = median.get_med_counts(median_reconciliation, roots_for_median)
-
+        median_reconciliation, roots_for_median, med_counts_dict = self.median_graph
         random_median = median.choose_random_median_wrapper(
             median_reconciliation, roots_for_median, med_counts_dict
         )
@@ -273,11 +461,11 @@ class ReconGraphWrapper(Drawable):
             recon_g,
             mpr_count,
             best_roots,
-        ) = cluster_util.get_tree_info(
-            self.recon_input, self.dup_cost, self.trans_cost, self.loss_cost
-        )
+        ) = self.tree_info()
 
-        score = cluster_util.mk_pdv_score(host_tree, parasite_tree, parasite_root)
+        score = cluster_util.mk_pdv_score(
+            host_tree, parasite_tree, parasite_root, self.host_index
+        )
         n_splits = CLUSTER_NSPLITS
         # If the user asks for more clusters, we need to find at least that many splits
         if n_splits < n:
@@ -290,19 +478,21 @@ class ReconGraphWrapper(Drawable):
         for graph in graphs:
             roots = _find_roots(graph)
             n = recongraph_tools.count_mprs_wrapper(roots, graph)
-            new_graphs.append(
-                ReconGraphWrapper(
-                    graph,
-                    roots,
-                    n,
-                    self.recon_input,
-                    self.dup_cost,
-                    self.trans_cost,
-                    self.loss_cost,
-                    self.total_cost,
-                    self.event_frequencies,
-                )
+            new_graph = ReconGraphWrapper(
+                graph,
+                roots,
+                n,
+                self.recon_input,
+                self.dup_cost,
+                self.trans_cost,
+                self.loss_cost,
+                self.total_cost,
+                self.event_frequencies,
+                # The clusters have the same trees
+                host_index=self.host_index,
+                parasite_tree=self.parasite_tree,
             )
+            new_graphs.append(new_graph)
         return new_graphs
 
     def set_event_frequencies(self):
@@ -311,18 +501,7 @@ class ReconGraphWrapper(Drawable):
         event_frequencies is a dictionary that maps events nodes to their frequencies in all the optimal reconciliations
         indicated by the recongraph
         """
-        postorder_parasite_tree, parasite_tree_root, _ = diameter.reformat_tree(
-            self.recon_input.parasite_dict, "pTop"
-        )
-        postorder_host_tree, _, _ = diameter.reformat_tree(
-            self.recon_input.host_dict, "hTop"
-        )
-        postorder_mapping_node_list = median.mapping_node_sort(
-            postorder_parasite_tree, postorder_host_tree, list(self.recongraph.keys())
-        )
-        node_frequencies, event_frequencies, _ = median.generate_frequencies_dict(
-            postorder_mapping_node_list[::-1], self.recongraph, parasite_tree_root
-        )
+        node_frequencies, event_frequencies, _ = self.frequencies
         self.event_frequencies = event_frequencies
         self.node_frequencies = node_frequencies
 
@@ -336,6 +515,55 @@ class ReconGraphWrapper(Drawable):
         )
 
 
+class ReconGraphBatchWrapper:
+    """
+    The reconciliation graphs of one ReconInputWrapper under many cost settings, computed in one pass
+    (see ReconInputWrapper.reconcile_batch). The ReconGraphWrapper of a setting is only built when it is
+    indexed, and then kept.
+    """
+
+    def __init__(self, recon_input: "ReconInputWrapper", cost_triples):
+        self.recon_input = recon_input
+        self.cost_triples = [tuple(costs) for costs in cost_triples]
+        self.host_index = HostTreeIndex(recon_input.host_dict)
+        self._batch = array_dp.DPBatch(
+            recon_input, self.cost_triples, host_index=self.host_index
+        )
+        self._recongraphs = {}
+
+    def __len__(self) -> int:
+        return len(self.cost_triples)
+
+    def __getitem__(self, k: int) -> ReconGraphWrapper:
+        if not -len(self) <= k < len(self):
+            raise IndexError("cost setting index out of range")
+        k %= len(self)
+        if k not in self._recongraphs:
+            dup_cost, trans_cost, loss_cost = self.cost_triples[k]
+            graph, total_cost, n_recon, roots = self._batch.result(k)
+            recongraph = ReconGraphWrapper(
+                graph,
+                roots,
+                n_recon,
+                self.recon_input,
+                dup_cost,
+                trans_cost,
+                loss_cost,
+                total_cost,
+                host_index=self.host_index,
+            )
+            recongraph.set_event_frequencies()
+            self._recongraphs[k] = recongraph
+        return self._recongraphs[k]
+
+    def total_costs(self) -> List[float]:
+        """
+        Return the cost of a maximum parsimony reconciliation for every cost setting,
+        without building any reconciliation graph.
+        """
+        return self._batch.total_costs().tolist()
+
+
 class CostRegionsWrapper(Drawable):
     def __init__(self, cost_vectors, transfer_min, transfer_max, dup_min, dup_max):
         """
@@ -348,6 +576,10 @@ class CostRegionsWrapper(Drawable):
         self._dup_max = dup_max
 
     def draw_on(self, axes: plt.Axes, log=False):
+        from empress.xscape.plotcosts_analytic import (
+            plot_costs_on_axis as xscape_plot_costs_on_axis,
+        )
+
         xscape_plot_costs_on_axis(
             axes,
             self._cost_vectors,
@@ -367,6 +599,8 @@ class ReconInputWrapper(_ReconInput, Drawable):
         """
         This draws the tanglegram.
         """
+        from empress.recon_vis import tanglegram
+
         tanglegram.render(
             self.host_dict,
             self.parasite_dict,
@@ -400,17 +634,71 @@ class ReconInputWrapper(_ReconInput, Drawable):
         )
 
     def reconcile(
-        self, dup_cost: int, trans_cost: int, loss_cost: int
+        self,
+        dup_cost: int,
+        trans_cost: int,
+        loss_cost: int,
+        engine: str = "dict",
+        host_index: HostTreeIndex = None,
+        cache: ResultCache = None,
     ) -> ReconGraphWrapper:
         """
         Given self (which has parasite tree, host tree, and tip mapping info)
         and the cost of the three events, computes and returns a reconciliation graph.
+        engine selects the DP implementation, one of the keys of RECON_ENGINES.
+        host_index is a HostTreeIndex of self.host_dict to reuse, for instance when the
+        same host tree is reconciled with many parasite trees; by default one is built.
+        If a ResultCache is given, a result found there is used instead of running the
+        DP, and a computed result is stored there.
         """
-        graph, total_cost, n_recon, roots = recongraph_tools.DP(
-            self, dup_cost, trans_cost, loss_cost
-        )
-        recongraph = ReconGraphWrapper(
-            graph, roots, n_recon, self, dup_cost, trans_cost, loss_cost, total_cost
-        )
-        recongraph.set_event_frequencies()
-        return recongraph
+        if engine not in RECON_ENGINES:
+            raise ValueError(
+                "Unknown engine %s, expected one of %s" % (engine, list(RECON_ENGINES))
+            )
+        with instrumentation.span("reconcile", engine=engine):
+            result = None
+            if cache is not None:
+                result = cache.get(self, dup_cost, trans_cost, loss_cost)
+                instrumentation.count(cache_hit=result is not None)
+            if result is None:
+                if host_index is None:
+                    host_index = HostTreeIndex(self.host_dict)
+                graph, total_cost, n_recon, roots = RECON_ENGINES[engine](
+                    self, dup_cost, trans_cost, loss_cost, host_index=host_index
+                )
+                result = {
+                    "graph": graph,
+                    "total_cost": total_cost,
+                    "n_recon": n_recon,
+                    "roots": roots,
+                    "event_frequencies": None,
+                    "node_frequencies": None,
+                }
+            recongraph = ReconGraphWrapper(
+                result["graph"],
+                result["roots"],
+                result["n_recon"],
+                self,
+                dup_cost,
+                trans_cost,
+                loss_cost,
+                result["total_cost"],
+                result["event_frequencies"],
+                result["node_frequencies"],
+                host_index=host_index,
+            )
+            if recongraph.event_frequencies is None:
+                recongraph.set_event_frequencies()
+                if cache is not None:
+                    result["event_frequencies"] = recongraph.event_frequencies
+                    result["node_frequencies"] = recongraph.node_frequencies
+                    cache.put(self, dup_cost, trans_cost, loss_cost, result)
+            return recongraph
+
+    def reconcile_batch(self, cost_triples) -> ReconGraphBatchWrapper:
+        """
+        Reconcile self under every (dup_cost, trans_cost, loss_cost) in cost_triples at once.
+        The cost tables of all settings are computed together; the ReconGraphWrapper of a
+        setting is built when the returned batch is indexed.
+        """
+        return ReconGraphBatchWrapper(self, cost_triples)
@@ -197,7 +197,7 @@ def mk_get_median(gene_tree, species_tree, gene_root, best_roots):
     return get_median
 
 
-def perform_clustering(tree_data, d, t, l, k, args):
+def perform_clustering(tree_data, d, t, l, k, args, cache=None, tree_info=None):
     """
     :param tree_data <_ReconInput>: Output of newickFormatReader.getInput()
     :param d <float>: cost of a duplication
@@ -206,6 +206,9 @@ def perform_clustering(tree_data, d, t, l, k, args):
     :param k <float>: number of clusters
     :param args <ArgumentParser>: args parse object that contains all parameters needed
     to run a functionality.
+    :param cache <ResultCache>: cache of reconciliation results to use, or None
+    :param tree_info <tuple>: output of cluster_util.get_tree_info for tree_data and d, t, l, to use instead of
+    reconciling again
     """
     # if args.interactive:
     #     # converts args to dictionary first
@@ -216,10 +219,17 @@ def perform_clustering(tree_data, d, t, l, k, args):
     if args.support:
         mk_score = cluster_util.mk_support_score
     elif args.pdv:
-        mk_score = cluster_util.mk_pdv_score
+
+        def mk_score(species_tree, gene_tree, gene_root):
+            return cluster_util.mk_pdv_score(
+                species_tree, gene_tree, gene_root, engine=args.pdv_engine
+            )
+
     else:
         assert False
     # Get the recon graph + other info
+    if tree_info is None:
+        tree_info = cluster_util.get_tree_info(tree_data, d, t, l, cache=cache)
     (
         gene_tree,
         species_tree,
@@ -227,7 +237,7 @@ def perform_clustering(tree_data, d, t, l, k, args):
         recon_g,
         mpr_count,
         best_roots,
-    ) = cluster_util.get_tree_info(tree_data, d, t, l)
+    ) = tree_info
 
     # Visualize the graphs
     # RV.visualizeAndSave(recon_g, "original.png")
@@ -4,6 +4,7 @@ from collections import deque
 
 import numpy as np
 
+from empress import instrumentation
 from empress.histogram import histogram_alg
 from empress.reconcile import recongraph_tools, diameter, median
 
@@ -534,13 +535,16 @@ def cluster_graph_n(graph, gene_root, score, n, mpr_count, k, max_splits=None):
     :return - reference return values for combine
     """
     # First split the graph
-    gs = full_split_n(graph, gene_root, n, mpr_count)
+    with instrumentation.span("cluster_split"):
+        gs = full_split_n(graph, gene_root, n, mpr_count)
+        instrumentation.count(splits=len(gs))
     if max_splits is not None and len(gs) > max_splits:
         print("Too many splits: {}".format(len(gs)))
         return None
     mpr_counter = mk_count_mprs(gene_root)
     # Then recombine those splits until we have k graphs
-    return combine(gs, score, k, mpr_counter)
+    with instrumentation.span("cluster_combine", clusters=k):
+        return combine(gs, score, k, mpr_counter)
 
 
 def cluster_graph(graph, gene_root, distance, depth, k, max_splits=None):
@@ -551,13 +555,16 @@ def cluster_graph(graph, gene_root, distance, depth, k, max_splits=None):
     n splits.
     """
     # First split the graph
-    gs = full_split(graph, gene_root, depth)
+    with instrumentation.span("cluster_split"):
+        gs = full_split(graph, gene_root, depth)
+        instrumentation.count(splits=len(gs))
     if max_splits is not None and len(gs) > max_splits:
         print("Too many splits: {}".format(len(gs)))
         return None
     mpr_counter = mk_count_mprs(gene_root)
     # Then recombine those splits until we have k graphs
-    return combine(gs, distance, k, mpr_counter)
+    with instrumentation.span("cluster_combine", clusters=k):
+        return combine(gs, distance, k, mpr_counter)
 
 
 # TODO: this can be improved by keeping the partial DP table around.
@@ -565,7 +572,9 @@ def cluster_graph(graph, gene_root, distance, depth, k, max_splits=None):
 # would mean less repeated computation.
 
 
-def mk_pdv_score(species_tree, gene_tree, gene_root):
+def mk_pdv_score(
+    species_tree, gene_tree, gene_root, species_index=None, engine="moments"
+):
     """
     Makes a score function for a graph by specifying the trees and the root.
     The score is the average pairwise distance. This is effectively a partial
@@ -575,12 +584,23 @@ def mk_pdv_score(species_tree, gene_tree, gene_root):
     :param species_tree <tree>
     :param gene_tree <tree>
     :param gene_root <node>
+    :param species_index <HostTreeIndex> - index of the species tree to reuse across graphs, or None
+    :param engine <str> - one of the keys of histogram_alg.PDV_ENGINES. The mean of the moments is the mean of the
+        histogram, so by default only the moments are computed
     :return score <function recon_graph->float>
     """
 
     def score(g):
         hist = histogram_alg.diameter_algorithm(
-            species_tree, gene_tree, gene_root, g, g, False, False
+            species_tree,
+            gene_tree,
+            gene_root,
+            g,
+            g,
+            False,
+            False,
+            species_index=species_index,
+            engine=engine,
         )
         return hist.mean()
 
@@ -631,19 +651,27 @@ def mk_support_score(species_tree, gene_tree, gene_root):
     return score
 
 
-def mk_get_pdv_hist(species_tree, gene_tree, gene_root):
+def mk_get_pdv_hist(species_tree, gene_tree, gene_root, species_index=None):
     """
     Partially apply diameter_algorithm on non-changing arguments
     for convenient use with multiple graphs.
     :param species_tree <tree>
     :param gene_tree <tree>
     :param gene_root <node>
+    :param species_index <HostTreeIndex> - index of the species tree to reuse across graphs, or None
     :return get_hist <function recon_graph->dict int->int>
     """
 
     def get_hist(g):
         h = histogram_alg.diameter_algorithm(
-            species_tree, gene_tree, gene_root, g, g, False, False
+            species_tree,
+            gene_tree,
+            gene_root,
+            g,
+            g,
+            False,
+            False,
+            species_index=species_index,
         )
         return h.histogram_dict
 
@@ -734,11 +762,13 @@ def calc_improvement_pdv(big_k, little_k):
     return little_k / float(big_k)
 
 
-def get_tree_info(newick, d, t, l):
+def get_tree_info(newick, d, t, l, host_index=None, cache=None):
     """
     Reconcile the trees and return all the relevant info.
     :param newick <_ReconInput>: Output of newickFormatReader.getInput()
     :params d,t,l <float> - the relative DTL costs
+    :param host_index <HostTreeIndex> - index of the host tree to reuse, or None
+    :param cache <ResultCache> - cache of reconciliation results to use, or None
     :return gene_tree <tree>
     :return species_tree <tree>
     :return gene_root <node>
@@ -753,12 +783,15 @@ def get_tree_info(newick, d, t, l):
         dtl_recon_graph,
         mpr_count,
         best_roots,
-    ) = recongraph_tools.reconcile(newick, d, t, l)
+    ) = recongraph_tools.reconcile(newick, d, t, l, host_index, cache)
     # Reformat the host and parasite tree to use it with the histogram algorithm
     gene_tree, gene_root, gene_node_count = diameter.reformat_tree(
         edge_gene_tree, "pTop"
     )
-    species_tree, species_tree_root, species_node_count = diameter.reformat_tree(
-        edge_species_tree, "hTop"
-    )
+    if host_index is not None:
+        species_tree, species_tree_root, species_node_count = host_index.vertex_tree()
+    else:
+        species_tree, species_tree_root, species_node_count = diameter.reformat_tree(
+            edge_species_tree, "hTop"
+        )
     return gene_tree, species_tree, gene_root, dtl_recon_graph, mpr_count, best_roots
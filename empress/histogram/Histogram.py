@@ -2,22 +2,257 @@
 Histogram class for Histogram Algorithm
 Extension of the diameter algorithm.
 Author: Santi Santichaivekin (working under Ran Libeskind-Hadas)
+
+A histogram is stored densely: counts[i] is the count of the distance offset + i. The counts are an int64
+array while they provably fit in int64. Beyond that they are "wide": counts[i, l] is the l-th _LIMB_BITS-bit
+limb of the count of the distance offset + i, least significant first, so that the counts of graphs with
+astronomically many MPRs stay exact while every operation is still a few NumPy calls. Every histogram keeps
+an upper bound on its counts, so that choosing between the two does not need a pass over the counts.
 """
 
+import numpy as np
+
+# Counts below this bound are kept in int64 arrays
+_INT64_BOUND = 2**62
+# Convolutions of int64 counts with at least this many products are done with an FFT when it is exact
+FFT_MIN_PRODUCTS = 1 << 15
+# A float64 FFT convolution is exact once rounded when the norms of its operands multiply to less than this
+_FFT_BOUND = 2**44
+# Bits per limb of wide counts. Small limbs keep the FFT convolution of wide counts exact for any realistic
+# histogram.
+_LIMB_BITS = 12
+_LIMB_MASK = (1 << _LIMB_BITS) - 1
+# Wide counts are multiplied limb by limb by factors below this bound
+_LIMB_FACTOR_BOUND = 2**40
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def _n_limbs(bound: int) -> int:
+    """
+    :return: the number of limbs of the counts up to bound
+    """
+    return max(1, -(-int(bound).bit_length() // _LIMB_BITS))
+
+
+def _padded(counts: np.ndarray, n_limbs: int) -> np.ndarray:
+    """
+    :return: the wide counts with zero limbs added up to n_limbs limbs
+    """
+    padded = np.zeros((counts.shape[0], n_limbs), dtype=np.int64)
+    padded[:, : counts.shape[1]] = counts
+    return padded
+
+
+def _wide(counts: np.ndarray, n_limbs: int) -> np.ndarray:
+    """
+    :param counts <np.ndarray>  - int64 counts or wide counts
+    :return: the counts as wide counts with at least n_limbs limbs
+    """
+    if counts.ndim == 1:
+        shifts = _LIMB_BITS * np.arange(min(n_limbs, _n_limbs(_INT64_BOUND)))
+        counts = (counts[:, None] >> shifts) & _LIMB_MASK
+    if counts.shape[1] >= n_limbs:
+        return counts
+    return _padded(counts, n_limbs)
+
+
+def _wide_ints(values: list) -> np.ndarray:
+    """
+    :return: the non-negative python ints values as wide counts
+    """
+    n_limbs = _n_limbs(max(values))
+    return np.array(
+        [
+            [(value >> (_LIMB_BITS * limb)) & _LIMB_MASK for limb in range(n_limbs)]
+            for value in values
+        ],
+        dtype=np.int64,
+    )
+
+
+def _python_ints(counts: np.ndarray) -> list:
+    """
+    :return: the wide counts as a list of python ints
+    """
+    weights = np.array(
+        [1 << (_LIMB_BITS * limb) for limb in range(counts.shape[1])], dtype=object
+    )
+    return counts.astype(object).dot(weights).tolist()
+
+
+def _normalized(counts: np.ndarray) -> np.ndarray:
+    """
+    :param counts <np.ndarray>  - wide counts whose limbs may be out of range, negative or too large
+    :return: the same counts with every limb in [0, 2 ** _LIMB_BITS), except for the last limb of negative
+        counts, and without the last limbs if they are all 0
+    """
+    if counts.size == 0:
+        return counts
+    largest = np.abs(counts).max().item()
+    if largest > _LIMB_MASK or counts.min() < 0:
+        # Split every limb into n_parts limbs, the last one signed, and add them up with the next limbs; a
+        # few carries are left
+        n_parts = _n_limbs(largest)
+        carried = np.zeros((counts.shape[0], counts.shape[1] + n_parts + 1), np.int64)
+        for part in range(n_parts):
+            piece = counts >> (_LIMB_BITS * part)
+            if part < n_parts - 1:
+                piece &= _LIMB_MASK
+            carried[:, part : part + counts.shape[1]] += piece
+        carry = carried[:, :-1] >> _LIMB_BITS
+        while carry.any():
+            carried[:, :-1] &= _LIMB_MASK
+            carried[:, 1:] += carry
+            carry = carried[:, :-1] >> _LIMB_BITS
+        counts = carried
+    used = np.flatnonzero(counts.any(axis=0))
+    return counts[:, : used[-1].item() + 1 if len(used) > 0 else 1]
+
+
+def _fft_convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    :return: the convolution of the arrays a and b of small integers, rounded to int64
+    """
+    n = len(a) + len(b) - 1
+    size = 1 << (n - 1).bit_length()
+    product = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)
+    return np.rint(product[:n]).astype(np.int64)
+
+
+def _convolve_wide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    The convolution of two arrays of wide counts as one FFT of their limbs, where the limbs of every count are
+    padded so that the products of different pairs of counts never mix.
+    :return: the wide counts of the convolution
+    """
+    (n, a_limbs), (m, b_limbs) = a.shape, b.shape
+    if n * a_limbs * m * b_limbs << (4 * _LIMB_BITS) >= _FFT_BOUND**2:
+        # Too long for the FFT to be exact
+        product = np.convolve(
+            np.array(_python_ints(a), dtype=object),
+            np.array(_python_ints(b), dtype=object),
+        )
+        return _wide_ints(product.tolist())
+    slots = a_limbs + b_limbs - 1
+    a, b = _padded(a, slots).ravel(), _padded(b, slots).ravel()
+    if len(a) * len(b) < FFT_MIN_PRODUCTS:
+        # The products of the limbs fit in int64 however many are added up
+        limbs = np.convolve(a, b)
+    else:
+        limbs = _fft_convolve(a, b)
+    return _normalized(limbs[: (n + m - 1) * slots].reshape(n + m - 1, slots))
+
 
 class Histogram:
-    def __init__(self, init):
+    def __init__(self, init, offset=0, scale=1, bound=None):
         """
         Initialize the Histoogram to either be {} or {0:1}. {0:1} corresponds to (1a) in the paper,
-        and {} corresponds to (1b) in the paper.
+        and {} corresponds to (1b) in the paper. A dict of integer distance to count, or an array of
+        the counts of the distances offset, offset + 1, ... can also be given.
+        :param scale - every distance is multiplied by scale when read (see xscale)
+        :param bound - upper bound on the counts of an array, computed if None
         """
-        assert init == None or init == 0 or type(init) == dict
-        if init == 0:
-            self.histogram_dict = {0: 1}
+        self.scale = scale
+        if init is None:
+            self.offset = 0
+            self.counts = _EMPTY
+            self.bound = 0
+        elif type(init) == np.ndarray:
+            self.offset = offset
+            if (
+                init.ndim == 2
+                and init.shape[1] * _LIMB_BITS < _INT64_BOUND.bit_length()
+            ):
+                # Wide counts that fit in int64 again
+                init = init.dot(1 << (_LIMB_BITS * np.arange(init.shape[1])))
+            self.counts = init
+            if bound is not None:
+                self.bound = bound
+            elif init.ndim == 2:
+                # At least _INT64_BOUND
+                self.bound = 1 << (_LIMB_BITS * init.shape[1])
+            else:
+                self.bound = init.max().item() if len(init) > 0 else 0
         elif type(init) == dict:
-            self.histogram_dict = init
+            self._set_dict(init)
+        else:
+            assert init == 0
+            self.offset = 0
+            self.counts = np.ones(1, dtype=np.int64)
+            self.bound = 1
+
+    def _set_dict(self, histogram_dict):
+        keys = [key for key, count in histogram_dict.items() if count != 0]
+        if not keys:
+            self.offset = 0
+            self.counts = _EMPTY
+            self.bound = 0
+            return
+        self.offset = min(keys)
+        values = [0] * (max(keys) - self.offset + 1)
+        for key in keys:
+            values[key - self.offset] = histogram_dict[key]
+        self.bound = max(values)
+        if not all(isinstance(value, (int, np.integer)) for value in values):
+            self.counts = np.array(values, dtype=np.float64)
+        elif self.bound < _INT64_BOUND:
+            self.counts = np.array(values, dtype=np.int64)
         else:
-            self.histogram_dict = {}
+            self.counts = _wide_ints([int(value) for value in values])
+
+    @property
+    def histogram_dict(self):
+        """
+        The dict of each distance with a nonzero count to its count, by increasing distance. Unlike the plain
+        dict attribute of earlier versions, it is a new dict built from the counts: distances of count 0 are
+        left out (so they are not written to CSV files nor compared by ==), and changing the dict does not
+        change the histogram. Assign a new dict to histogram_dict instead.
+        """
+        if self.counts.ndim == 2:
+            nonzero = np.flatnonzero(self.counts.any(axis=1))
+            counts = _python_ints(self.counts[nonzero])
+        else:
+            nonzero = np.flatnonzero(self.counts)
+            counts = self.counts[nonzero].tolist()
+        keys = (nonzero + self.offset).tolist()
+        if self.scale != 1:
+            keys = [key * self.scale for key in keys]
+        return dict(zip(keys, counts))
+
+    @histogram_dict.setter
+    def histogram_dict(self, histogram_dict):
+        self.scale = 1
+        self._set_dict(histogram_dict)
+
+    @property
+    def nbytes(self):
+        """
+        The memory used by the counts
+        """
+        return self.counts.nbytes
+
+    def _unscaled(self):
+        if self.scale != 1:
+            raise ValueError("A scaled histogram can only be read")
+
+    def _zero_count(self):
+        """
+        :return: the count of the distance 0, as a python number
+        """
+        if not 0 <= -self.offset < len(self.counts):
+            return 0
+        if self.counts.ndim == 2:
+            return _python_ints(self.counts[-self.offset : 1 - self.offset])[0]
+        return self.counts[-self.offset].item()
+
+    def _n_limbs(self):
+        """
+        :return: the number of limbs of the counts of self as wide counts
+        """
+        if self.counts.ndim == 2:
+            return self.counts.shape[1]
+        return _n_limbs(self.bound)
 
     def shift(self, value):
         """
@@ -25,11 +260,10 @@ class Histogram:
         This corresponds to +1 and +2 constants in the paper.
         {0:1, 3:2} << 2   => {2:1, 5:2}
         """
-        new_dict = {}
-        old_dict = self.histogram_dict
-        for old_key in old_dict:
-            new_dict[old_key + value] = old_dict[old_key]
-        return Histogram(new_dict)
+        self._unscaled()
+        if value == 0:
+            return self
+        return Histogram(self.counts, self.offset + value, bound=self.bound)
 
     def combine(self, other):
         """
@@ -44,19 +278,43 @@ class Histogram:
         """
         Subtract the count of self from another.
         """
-        new_hist = self.histogram_dict.copy()
-        other_hist = other.histogram_dict
-        for key in other_hist:
-            new_hist[key] -= other_hist[key]
-            assert new_hist[key] >= 0, (self, other, key)
-        return Histogram(new_hist)
+        self._unscaled()
+        other._unscaled()
+        if len(other.counts) == 0:
+            return self
+        start = other.offset - self.offset
+        end = start + len(other.counts)
+        assert 0 <= start and end <= len(self.counts), (self, other)
+        if self.counts.ndim == 2 or other.counts.ndim == 2:
+            n_limbs = max(self._n_limbs(), other._n_limbs())
+            new_counts = _wide(self.counts, n_limbs).copy()
+            new_counts[start:end] -= _wide(other.counts, n_limbs)
+            new_counts = _normalized(new_counts)
+            assert (new_counts[:, -1] >= 0).all(), (self, other)
+        else:
+            new_counts = self.counts.astype(np.result_type(self.counts, other.counts))
+            new_counts[start:end] -= other.counts
+            assert (new_counts >= 0).all(), (self, other)
+        return Histogram._trimmed(new_counts, self.offset, self.bound)
+
+    @staticmethod
+    def _trimmed(counts, offset, bound):
+        """
+        :return: the histogram of counts, starting at the distance offset, without the zeros at both ends
+        """
+        nonzero = np.flatnonzero(counts if counts.ndim == 1 else counts.any(axis=1))
+        if len(nonzero) == 0:
+            return Histogram(None)
+        first = nonzero[0].item()
+        return Histogram(
+            counts[first : nonzero[-1].item() + 1], offset + first, bound=bound
+        )
 
     def xscale(self, factor):
         """
         Scale the distances by the given factor
         """
-        new_hist = {k * factor: v for k, v in list(self.histogram_dict.items())}
-        return Histogram(new_hist)
+        return Histogram(self.counts, self.offset, self.scale * factor, self.bound)
 
     def mean(self):
         """
@@ -80,25 +338,54 @@ class Histogram:
 
     def standard_deviation(self):
         """
-        The standard deviation of the distances
+        The standard deviation of the distances. With integer distances and counts, the variance is computed
+        exactly and rounded once, so Moments.standard_deviation gives the same value.
         """
-        mean = self.mean()
-        s = 0
         n = 0
+        total = 0
+        squares = 0
         for k, v in list(self.histogram_dict.items()):
             n += v
-            s += v * ((k - mean) ** 2)
-        return (s / float(n)) ** 0.5
+            total += k * v
+            squares += k * k * v
+        variance = (squares * n - total * total) / (n * n)
+        return max(variance, 0) ** 0.5
 
     @staticmethod
     def sum(hist_list):
-        new_dict = {}
+        hists = []
         for hist in hist_list:
-            for key in hist.histogram_dict:
-                if key not in new_dict:
-                    new_dict[key] = 0
-                new_dict[key] += hist.histogram_dict[key]
-        return Histogram(new_dict)
+            hist._unscaled()
+            if len(hist.counts) > 0:
+                hists.append(hist)
+        if len(hists) == 0:
+            return Histogram(None)
+        if len(hists) == 1:
+            return hists[0]
+        offset = min(hist.offset for hist in hists)
+        end = max(hist.offset + len(hist.counts) for hist in hists)
+        bound = sum(hist.bound for hist in hists)
+        if bound >= _INT64_BOUND:
+            for hist in hists:
+                hist._tighten()
+            bound = sum(hist.bound for hist in hists)
+        if bound < _INT64_BOUND or any(
+            hist.counts.dtype == np.float64 for hist in hists
+        ):
+            new_counts = np.zeros(
+                end - offset, dtype=np.result_type(*(hist.counts for hist in hists))
+            )
+            for hist in hists:
+                start = hist.offset - offset
+                new_counts[start : start + len(hist.counts)] += hist.counts
+            return Histogram(new_counts, offset, bound=bound)
+
+        n_limbs = max(hist._n_limbs() for hist in hists)
+        new_counts = np.zeros((end - offset, n_limbs), dtype=np.int64)
+        for hist in hists:
+            start = hist.offset - offset
+            new_counts[start : start + len(hist.counts)] += _wide(hist.counts, n_limbs)
+        return Histogram(_normalized(new_counts), offset)
 
     def product_combine(self, other, n_choices):
         """
@@ -110,43 +397,106 @@ class Histogram:
         the same mapping node, we multiply the number of
         histograms by 2 if the indeces are not 0.
 
+        A pair of distances counts 2 ** n_choices times, minus one choice for each of the two that is 0 (and
+        at least once). So the bins of distance 0 are split off, and the product is the weighted sum of the
+        convolution of the rest with the rest, of the zero bins with the rest and of the zero bins together.
+        """
+        self._unscaled()
+        other._unscaled()
+        if len(self.counts) == 0 or len(other.counts) == 0:
+            return Histogram(None)
+        a_zero = self._zero_count()
+        b_zero = other._zero_count()
+        if n_choices == 0 or (a_zero == 0 and b_zero == 0):
+            return self._convolve(other)._times(2**n_choices)
+
+        a_rest = self._without_zero()
+        b_rest = other._without_zero()
+        one_weight = 2 ** max(n_choices - 1, 0)
+        parts = [
+            a_rest._convolve(b_rest)._times(2**n_choices),
+            b_rest._times(a_zero * one_weight),
+            a_rest._times(b_zero * one_weight),
+        ]
+        if a_zero != 0 and b_zero != 0:
+            parts.append(Histogram({0: a_zero * b_zero * 2 ** max(n_choices - 2, 0)}))
+        return Histogram.sum(parts)
+
+    def _convolve(self, other):
+        """
+        :return: the histogram of the sums of the distances of self and other, without choices
+        """
+        if len(self.counts) == 0 or len(other.counts) == 0:
+            return Histogram(None)
+        a, b = self.counts, other.counts
+        offset = self.offset + other.offset
+        if a.dtype == np.float64 or b.dtype == np.float64:
+            return Histogram(np.convolve(a, b), offset)
+        length = min(len(a), len(b))
+        if self.bound * other.bound * length >= _INT64_BOUND:
+            self._tighten()
+            other._tighten()
+        bound = self.bound * other.bound * length
+        if bound >= _INT64_BOUND:
+            counts = _convolve_wide(
+                _wide(a, self._n_limbs()), _wide(b, other._n_limbs())
+            )
+            return Histogram(counts, offset)
+        if (
+            len(a) * len(b) >= FFT_MIN_PRODUCTS
+            and self.bound * other.bound * max(len(a), len(b)) < _FFT_BOUND
+        ):
+            return Histogram(_fft_convolve(a, b), offset, bound=bound)
+        return Histogram(np.convolve(a, b), offset, bound=bound)
+
+    def _tighten(self):
+        """
+        Make self.bound the largest count, if the counts are int64
         """
-        # TODO: maybe rename to convolution, rewrite the test, rewrite the docstring
-        new_dict = {}
-
-        old_dict_A = self.histogram_dict
-        old_keys_A = list(old_dict_A.keys())
-        old_dict_B = other.histogram_dict
-        old_keys_B = list(old_dict_B.keys())
-
-        for old_key_A in old_keys_A:
-            for old_key_B in old_keys_B:
-                new_key = old_key_A + old_key_B
-                if new_key not in new_dict:
-                    new_dict[new_key] = 0
-                # Determine how many choices
-                local_choices = n_choices
-                if old_key_A == 0:
-                    local_choices -= 1
-                if old_key_B == 0:
-                    local_choices -= 1
-                if local_choices < 0:
-                    local_choices = 0
-                n_pairs = old_dict_A[old_key_A] * old_dict_B[old_key_B]
-                new_dict[new_key] += n_pairs * (2**local_choices)
-
-        return Histogram(new_dict)
+        if self.counts.ndim == 1 and len(self.counts) > 0:
+            self.bound = self.counts.max().item()
+
+    def _without_zero(self):
+        """
+        :return: self without the bin of distance 0
+        """
+        if self._zero_count() == 0:
+            return self
+        counts = self.counts.copy()
+        counts[-self.offset] = 0
+        return Histogram._trimmed(counts, self.offset, self.bound)
+
+    def _times(self, factor):
+        """
+        :return: self with every count multiplied by the python int factor
+        """
+        if factor == 1 or len(self.counts) == 0:
+            return self
+        if self.bound * factor >= _INT64_BOUND:
+            self._tighten()
+        bound = self.bound * factor
+        if self.counts.ndim == 1 and (
+            bound < _INT64_BOUND or self.counts.dtype == np.float64
+        ):
+            return Histogram(self.counts * factor, self.offset, bound=bound)
+        if factor >= _LIMB_FACTOR_BOUND:
+            return self._convolve(Histogram({0: factor}))
+        counts = _wide(self.counts, self._n_limbs())
+        return Histogram(_normalized(counts * factor), self.offset)
 
     def double_nonzero_entry(self):
         """
         Return a new histogram with its nonzero entry
         doubled.
         """
-        new_dict = self.histogram_dict.copy()
-        for key in new_dict:
-            if key != 0:
-                new_dict[key] *= 2
-        return Histogram(new_dict)
+        new_hist = self._times(2)
+        if self._zero_count() != 0:
+            zero = -self.offset
+            if new_hist.counts.ndim == 2:
+                new_hist.counts[zero] = _wide(self.counts, new_hist._n_limbs())[zero]
+            else:
+                new_hist.counts[zero] = self.counts[zero]
+        return new_hist
 
     def __eq__(self, other):
         return self.histogram_dict == other.histogram_dict
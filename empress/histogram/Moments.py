@@ -0,0 +1,225 @@
+"""
+Moments class for the Histogram Algorithm
+A replacement for Histogram in histogram_alg.diameter_algorithm that keeps only the number of pairs, the sum and
+the sum of squares of their distances, so that the mean and the standard deviation of the pairwise distances are
+exact in time independent of the width of the histogram.
+
+The recurrences also need the count of distance 0 (see Histogram.product_combine), and the largest distance is
+kept for the diameter. Distances are never negative, so a shift empties the bin of distance 0, and the largest
+distance of a convolution is the sum of the largest distances. A subtraction in the recurrences only takes off
+pairs that were counted twice, so it leaves the largest distance as it is.
+"""
+
+import sys
+
+
+class Moments:
+    def __init__(self, init):
+        """
+        Initialize the Moments of the histogram {} (init None) or {0:1} (init 0), like Histogram.
+        """
+        assert init is None or init == 0
+        self.zero = self.count = 0 if init is None else 1
+        self.total = 0
+        self.squares = 0
+        self.largest = 0
+
+    @staticmethod
+    def _of(zero, count, total, squares, largest):
+        """
+        :return: the moments of count pairs, zero of them at distance 0, whose distances add up to total, whose
+            squares add up to squares, and whose largest distance is largest
+        """
+        moments = Moments(None)
+        moments.zero = zero
+        moments.count = count
+        moments.total = total
+        moments.squares = squares
+        moments.largest = largest
+        return moments
+
+    @property
+    def nbytes(self):
+        """
+        The memory used by the moments
+        """
+        return sum(
+            sys.getsizeof(value)
+            for value in (self.zero, self.count, self.total, self.squares)
+        )
+
+    def shift(self, value):
+        """
+        Shift the distances by some value.
+        """
+        if value == 0 or self.count == 0:
+            return self
+        return Moments._of(
+            0,
+            self.count,
+            self.total + value * self.count,
+            self.squares + 2 * value * self.total + value * value * self.count,
+            self.largest + value,
+        )
+
+    def combine(self, other):
+        """
+        The moments of the two histograms added together.
+        """
+        return Moments.sum([self, other])
+
+    def subtract(self, other):
+        """
+        Subtract the pairs of other, which are all in self, from self.
+        """
+        assert self.count >= other.count, (self, other)
+        return Moments._of(
+            self.zero - other.zero,
+            self.count - other.count,
+            self.total - other.total,
+            self.squares - other.squares,
+            self.largest,
+        )
+
+    def xscale(self, factor):
+        """
+        Scale the distances by the given factor
+        """
+        return Moments._of(
+            self.zero,
+            self.count,
+            self.total * factor,
+            self.squares * factor * factor,
+            self.largest * factor,
+        )
+
+    def mean(self):
+        """
+        The mean distance, computed like Histogram.mean
+        """
+        return self.total / float(self.count)
+
+    def standard_deviation(self):
+        """
+        The standard deviation of the distances, computed like Histogram.standard_deviation
+        """
+        variance = (self.squares * self.count - self.total * self.total) / (
+            self.count * self.count
+        )
+        return max(variance, 0) ** 0.5
+
+    @staticmethod
+    def sum(moments_list):
+        moments_list = [moments for moments in moments_list if moments.count != 0]
+        if len(moments_list) == 1:
+            return moments_list[0]
+        return Moments._of(
+            sum(moments.zero for moments in moments_list),
+            sum(moments.count for moments in moments_list),
+            sum(moments.total for moments in moments_list),
+            sum(moments.squares for moments in moments_list),
+            max((moments.largest for moments in moments_list), default=0),
+        )
+
+    def product_combine(self, other, n_choices):
+        """
+        The moments of Histogram.product_combine of the histograms of self and other
+        """
+        if self.count == 0 or other.count == 0:
+            return Moments(None)
+        if n_choices == 0 or (self.zero == 0 and other.zero == 0):
+            return self._convolve(other)._times(2**n_choices)
+
+        a_rest = self._without_zero()
+        b_rest = other._without_zero()
+        one_weight = 2 ** max(n_choices - 1, 0)
+        return Moments.sum(
+            [
+                a_rest._convolve(b_rest)._times(2**n_choices),
+                b_rest._times(self.zero * one_weight),
+                a_rest._times(other.zero * one_weight),
+                Moments._of(1, 1, 0, 0, 0)._times(
+                    self.zero * other.zero * 2 ** max(n_choices - 2, 0)
+                ),
+            ]
+        )
+
+    def _convolve(self, other):
+        """
+        :return: the moments of the sums of the distances of self and other, without choices
+        """
+        if self.count == 0 or other.count == 0:
+            return Moments(None)
+        return Moments._of(
+            self.zero * other.zero,
+            self.count * other.count,
+            self.total * other.count + other.total * self.count,
+            self.squares * other.count
+            + 2 * self.total * other.total
+            + other.squares * self.count,
+            self.largest + other.largest,
+        )
+
+    def _without_zero(self):
+        """
+        :return: self without the pairs of distance 0
+        """
+        if self.zero == self.count:
+            return Moments(None)
+        return Moments._of(
+            0, self.count - self.zero, self.total, self.squares, self.largest
+        )
+
+    def _times(self, factor):
+        """
+        :return: self with every pair counted factor times
+        """
+        if factor == 1:
+            return self
+        if factor == 0:
+            return Moments(None)
+        return Moments._of(
+            self.zero * factor,
+            self.count * factor,
+            self.total * factor,
+            self.squares * factor,
+            self.largest,
+        )
+
+    def double_nonzero_entry(self):
+        """
+        Return new moments with the pairs of nonzero distance counted twice.
+        """
+        return Moments._of(
+            self.zero,
+            2 * self.count - self.zero,
+            2 * self.total,
+            2 * self.squares,
+            self.largest,
+        )
+
+    def __eq__(self, other):
+        return (
+            self.zero,
+            self.count,
+            self.total,
+            self.squares,
+            self.largest,
+        ) == (other.zero, other.count, other.total, other.squares, other.largest)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lshift__(self, value):
+        return self.shift(value)
+
+    def __add__(self, other):
+        return self.combine(other)
+
+    def __sub__(self, other):
+        return self.subtract(other)
+
+    def __repr__(self):
+        return "Moments(zero={}, count={}, total={}, squares={}, largest={})".format(
+            self.zero, self.count, self.total, self.squares, self.largest
+        )
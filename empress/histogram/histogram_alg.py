@@ -2,8 +2,11 @@
 
 from itertools import product
 
+from empress import instrumentation
 from empress.histogram.Histogram import Histogram
+from empress.histogram.Moments import Moments
 from empress.histogram.histogram_brute_force import BFVerifier
+from empress.reconcile.tree_index import ancestry_relation
 
 # def reformat_tree(tree, root):
 #     """A recursive function that changes the format of a (species or gene) tree from edge to vertex, as described
@@ -40,6 +43,14 @@ from empress.histogram.histogram_brute_force import BFVerifier
 #     return new_vertex_tree, new_root, (child1_count + child2_count + 1)
 
 
+# What diameter_algorithm can compute for the pairs of reconciliations: their whole histogram of distances, or only
+# the moments of that histogram (see Moments.py), which is enough for the mean and standard deviation and much faster
+PDV_ENGINES = {
+    "histogram": Histogram,
+    "moments": Moments,
+}
+
+
 def intersect_cost(event):
     """
     The cost added if both reconciliations being looked at share a particular event
@@ -71,7 +82,8 @@ def calculate_ancestral_table(species_tree):
     as keys vertices of the tree (again) and values which are strings,
     representing how the first index relates to the second (see below
     for info on what certain strings mean). It creates these dictionaries
-    by traversing the tree.
+    by traversing the tree. It takes O(V^2) time and memory, so diameter_algorithm answers
+    the same queries with tree_index.ancestry_relation instead.
     """
 
     # Initialize the ancestral table which we will be returning
@@ -142,7 +154,15 @@ def is_exit_event(event):
 
 # Modified : use Histogram instead of value
 def calculate_hist_both_exit(
-    zero_loss, enter_table, u, gene_tree, uA, dtl_recon_graph_a, uB, dtl_recon_graph_b
+    zero_loss,
+    enter_table,
+    u,
+    gene_tree,
+    uA,
+    dtl_recon_graph_a,
+    uB,
+    dtl_recon_graph_b,
+    hist_class=Histogram,
 ):
     """
     This function computes the histogram of a 'double exit', where both mapping nodes exit immediately
@@ -154,14 +174,15 @@ def calculate_hist_both_exit(
     :param dtl_recon_graph_a <dict>   - the 'a' DTL reconciliation graph
     :param uB <str>                   - the 'b' mapping node
     :param dtl_recon_graph_b <dict>   - the 'b' DTL reconciliation graph
+    :param hist_class <type>          - Histogram, or Moments to compute only the moments of the histograms
     :return <Histogram>               - the Histogram object of both mapping nodes exiting
     """
-    hist_both_exit = Histogram(None)
+    hist_both_exit = hist_class(None)
 
     # Test to see if u is a leaf
     if is_leaf(u, gene_tree):
         if uA == uB and ("C", (None, None), (None, None)) in dtl_recon_graph_a[uA]:
-            hist_both_exit = Histogram(0)
+            hist_both_exit = hist_class(0)
     else:
         uA_exit_events = [
             event
@@ -222,7 +243,15 @@ def calculate_hist_both_exit(
 
 
 def calculate_incomparable_enter_hist(
-    zero_loss, enter_table, u, uA, uA_loss_events, uB, uB_loss_events, hist_both_exit
+    zero_loss,
+    enter_table,
+    u,
+    uA,
+    uA_loss_events,
+    uB,
+    uB_loss_events,
+    hist_both_exit,
+    hist_class=Histogram,
 ):
     """
     Returns the enter table entry for [uA][uB] with the assumption that A is on a different part of the species
@@ -235,6 +264,7 @@ def calculate_incomparable_enter_hist(
     :param uB <str>                     - the second mapping node to compare
     :param uB_loss_events <list>        - a list of the loss events on that mapping node
     :param hist_both_exit <Histogram>   - the histogram of the double-exit that was previously calculated for uA and uB
+    :param hist_class <type>            - Histogram, or Moments to compute only the moments of the histograms
     :return <Histogram>                 - the enter table entry for [uA][uB]
     """
     hists = [hist_both_exit]
@@ -256,7 +286,7 @@ def calculate_incomparable_enter_hist(
         b_child = loss_event_B[1][1]
         loss_cost = cost(loss_event_A, zero_loss) + cost(loss_event_B, zero_loss)
         lost_hists.append(enter_table[u][(u, a_child)][(u, b_child)] << loss_cost)
-    return Histogram.sum(hists) - Histogram.sum(lost_hists)
+    return hist_class.sum(hists) - hist_class.sum(lost_hists)
 
 
 def calculate_equal_enter_hist(
@@ -270,6 +300,7 @@ def calculate_equal_enter_hist(
     hist_both_exit,
     exit_table_a,
     exit_table_b,
+    hist_class=Histogram,
 ):
     """
     Returns the enter table entry for [uA][uB] with the assumption that uA equals uB (but they might have different
@@ -286,6 +317,7 @@ def calculate_equal_enter_hist(
                                           the mapping nodes' children
     :param exit_table_b <dict>          - the b exit table, which contains information about the single exit events for
                                           the mapping nodes' children
+    :param hist_class <type>            - Histogram, or Moments to compute only the moments of the histograms
     :return <Histogram>                 - the enter table entry for [uA][uB]
     """
     # If uA does not equal uB, then something's gone horribly wrong.
@@ -311,7 +343,7 @@ def calculate_equal_enter_hist(
     for event in uA_loss_events:
         a_child = event[1][1]
         hists.append(exit_table_b[u][uB][(u, a_child)] << cost(event, zero_loss))
-    return Histogram.sum(hists)
+    return hist_class.sum(hists)
 
 
 def calculate_ancestral_enter_hist(
@@ -326,6 +358,8 @@ def calculate_ancestral_enter_hist(
     hist_both_exit,
     exit_table_a,
     exit_table_b,
+    hist_class=Histogram,
+    memory=None,
 ):
     """
     Returns the enter table entry for [uA][uB] with the assumption that A is an ancestor of B (if is_swapped is
@@ -344,6 +378,8 @@ def calculate_ancestral_enter_hist(
                                           the mapping nodes' children
     :param exit_table_b <dict>          - the b exit table, which contains information about the single exit events for
                                           the mapping nodes' children
+    :param hist_class <type>            - Histogram, or Moments to compute only the moments of the histograms
+    :param memory <_TableMemory>        - the memory of the tables, charged with the exit table entry, or None
     :return <Histogram>                 - the enter table entry for [uA][uB]
     """
 
@@ -366,7 +402,9 @@ def calculate_ancestral_enter_hist(
         # Initialize the ancestor's (uA) entry in exit_table, if need be.
         if uA not in exit_table_a[u]:
             exit_table_a[u][uA] = {}
-        exit_table_a[u][uA][uB] = Histogram.sum(hists)
+        exit_table_a[u][uA][uB] = hist_class.sum(hists)
+        if memory is not None:
+            memory.add((u, "exit"), exit_table_a[u][uA][uB])
 
         enter_hists = [exit_table_a[u][uA][uB]]
         for event in uA_loss_events:
@@ -380,7 +418,7 @@ def calculate_ancestral_enter_hist(
             else:
                 event_enter = enter_table[u][(u, a_child)][uB]
             enter_hists += [event_enter << cost(event, zero_loss)]
-        return Histogram.sum(enter_hists)
+        return hist_class.sum(enter_hists)
     else:
         # uB is an ancestor to uA
         # Tally up the histograms of the descendant's (uA's) loss events
@@ -393,7 +431,9 @@ def calculate_ancestral_enter_hist(
         # Initialize the ancestor's (uB) entry in exit_table, if need be.
         if uB not in exit_table_b[u]:
             exit_table_b[u][uB] = {}
-        exit_table_b[u][uB][uA] = Histogram.sum(hists)
+        exit_table_b[u][uB][uA] = hist_class.sum(hists)
+        if memory is not None:
+            memory.add((u, "exit"), exit_table_b[u][uB][uA])
 
         enter_hists = [exit_table_b[u][uB][uA]]
         for event in uB_loss_events:
@@ -403,7 +443,64 @@ def calculate_ancestral_enter_hist(
             else:
                 event_enter = enter_table[u][uA][(u, b_child)]
             enter_hists += [event_enter << cost(event, zero_loss)]
-        return Histogram.sum(enter_hists)
+        return hist_class.sum(enter_hists)
+
+
+class _TableMemory:
+    """
+    The number of entries and the bytes of histogram counts held by the enter and exit tables, by gene node, with
+    their peaks. Entries that share their counts, like the mirrored entries of a symmetric table or a histogram
+    shifted by 0, are counted once, until the last of them is freed.
+    """
+
+    def __init__(self, budget):
+        """
+        :param budget <int>     - bytes of histogram counts the tables may hold at once, or None for no limit
+        """
+        self.budget = budget
+        self.entries = 0
+        self.bytes = 0
+        self.peak_entries = 0
+        self.peak_bytes = 0
+        self.node_entries = {}
+        self.node_counts = {}
+        # Number of entries and bytes of every counts held, by id
+        self.counts = {}
+
+    def add(self, u, hist, n_entries=1):
+        """
+        Count n_entries entries of the tables of gene node u holding hist, as soon as they are stored
+        """
+        # Moments have no counts array, so they are shared as a whole
+        key = id(getattr(hist, "counts", hist))
+        self.entries += n_entries
+        self.node_entries[u] = self.node_entries.get(u, 0) + n_entries
+        self.node_counts.setdefault(u, []).append((key, n_entries))
+        if key in self.counts:
+            self.counts[key][0] += n_entries
+        else:
+            self.counts[key] = [n_entries, hist.nbytes]
+            self.bytes += hist.nbytes
+        self.peak_entries = max(self.peak_entries, self.entries)
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        if self.budget is not None and self.bytes > self.budget:
+            raise MemoryError(
+                "histogram tables need more than the memory budget of {} bytes".format(
+                    self.budget
+                )
+            )
+
+    def release(self, u):
+        """
+        Uncount the entries of the tables of gene node u, which were freed
+        """
+        self.entries -= self.node_entries.pop(u, 0)
+        for key, n_entries in self.node_counts.pop(u, []):
+            held = self.counts[key]
+            held[0] -= n_entries
+            if held[0] == 0:
+                self.bytes -= held[1]
+                del self.counts[key]
 
 
 def make_group_dict(gene_tree, dtl_recon_graph, postorder_species_nodes):
@@ -415,16 +512,18 @@ def make_group_dict(gene_tree, dtl_recon_graph, postorder_species_nodes):
     :return <dict>                          - a dict keyed by gene node, where the values are the lists of mapping nodes for that
                                               gene node
     """
-    postorder_group = {}
-    for u in gene_tree:
-        # First we make the dictionary only contain nodes that have this gene node
-        postorder_group[u] = [mapping for mapping in dtl_recon_graph if mapping[0] == u]
-        # Then we sort the dictionary into postorder, using the species node's index in the postorder species list as a
-        # guide.
-        postorder_group[u] = sorted(
-            postorder_group[u],
-            key=lambda mapping: postorder_species_nodes.index(mapping[1]),
-        )
+    # First we make the dictionary only contain nodes that have this gene node
+    postorder_group = {u: [] for u in gene_tree}
+    for mapping in dtl_recon_graph:
+        if mapping[0] in postorder_group:
+            postorder_group[mapping[0]].append(mapping)
+    # Then we sort the dictionary into postorder, using the species node's index in the postorder species list as a
+    # guide.
+    species_position = {
+        species: i for i, species in enumerate(postorder_species_nodes)
+    }
+    for u in postorder_group:
+        postorder_group[u].sort(key=lambda mapping: species_position[mapping[1]])
     return postorder_group
 
 
@@ -437,6 +536,10 @@ def diameter_algorithm(
     debug,
     zero_loss,
     verify=False,
+    species_index=None,
+    symmetric=None,
+    memory_budget=None,
+    engine="histogram",
 ):
     """
     This function finds the diameter of a reconciliation graph, as measured by the largest symmetric set difference
@@ -452,8 +555,20 @@ def diameter_algorithm(
     :param debug <bool>               - whether or not to print out pretty tables
     :param zero_loss <bool>           - whether losses should count at all
     :param verify <bool>              - whether to verify the calculations using brute force
+    :param species_index <HostTreeIndex> - index of the species tree to reuse (see tree_index.py), or None
+    :param symmetric <bool>           - whether the two graphs are the same, so that the entry of each unordered pair
+                                        of mapping nodes is computed once. By default, whether they are the same object
+    :param memory_budget <int>        - bytes of histogram counts the tables may hold at once, beyond which a
+                                        MemoryError is raised, or None for no limit
+    :param engine <str>               - one of the keys of PDV_ENGINES: "moments" computes the Moments of the
+                                        histogram instead, which cannot be verified
     :return <Histogram>               - the diameter of the reconciliation
     """
+    if engine not in PDV_ENGINES:
+        raise ValueError(
+            "Unknown engine %s, expected one of %s" % (engine, list(PDV_ENGINES))
+        )
+    hist_class = PDV_ENGINES[engine]
 
     # Use debugging
     # assert(dtl_recon_graph_a == dtl_recon_graph_b)
@@ -465,29 +580,47 @@ def diameter_algorithm(
     postorder_group_a = make_group_dict(
         gene_tree, dtl_recon_graph_a, postorder_species_nodes
     )
-    postorder_group_b = make_group_dict(
-        gene_tree, dtl_recon_graph_b, postorder_species_nodes
-    )
+    if symmetric is None:
+        symmetric = dtl_recon_graph_a is dtl_recon_graph_b
+    if symmetric:
+        postorder_group_b = postorder_group_a
+    else:
+        postorder_group_b = make_group_dict(
+            gene_tree, dtl_recon_graph_b, postorder_species_nodes
+        )
 
-    ancestral_table = calculate_ancestral_table(species_tree)
+    # Ancestry queries in O(1), from the Euler tour of the index of the species tree if there is one
+    if species_index is not None:
+        species_index.check_vertex_tree(species_tree)
+        relation = species_index.relation
+    else:
+        relation = ancestry_relation(species_tree)
 
     if debug:
+        ancestral_table = {
+            A: {B: relation(A, B) for B in species_tree} for A in species_tree
+        }
         print_table_nicely(ancestral_table, ", ", "Ancestral", "literal")
 
     exit_table_a = {}
-    exit_table_b = {}
+    # With the same graph, both exit tables are the same: they are keyed by the ancestor, then the descendant
+    exit_table_b = exit_table_a if symmetric else {}
 
     enter_table = {}
+    # The tables of a gene node are freed once they have been read: the exit tables once its enter table is done,
+    # and its enter table once the one of its parent is done. Debugging prints the whole exit tables at the end.
+    memory = _TableMemory(memory_budget)
 
     for u in postorder_gene_nodes:
-        enter_table[u] = {}
+        enter_table[u] = {uA: {} for uA in postorder_group_a[u]}
         exit_table_a[u] = {}
         exit_table_b[u] = {}
 
-        # Loop over every pair of mapping nodes in group(u)
-        for uA in postorder_group_a[u]:
-            enter_table[u][uA] = {}
-            for uB in postorder_group_b[u]:
+        # Loop over every pair of mapping nodes in group(u). With the same graph, enter_table[u][uB][uA] is
+        # enter_table[u][uA][uB], so only the pairs where uB is not before uA in postorder are computed. Every entry
+        # they need is of a pair of descendants, or of the same pair earlier in postorder, so it is already there.
+        for i, uA in enumerate(postorder_group_a[u]):
+            for uB in postorder_group_b[u][i:] if symmetric else postorder_group_b[u]:
                 hist_both_exit = calculate_hist_both_exit(
                     zero_loss,
                     enter_table,
@@ -497,10 +630,11 @@ def diameter_algorithm(
                     dtl_recon_graph_a,
                     uB,
                     dtl_recon_graph_b,
+                    hist_class,
                 )
 
-                # Look up ancestry string in the precomputed table (indexed by the species nodes of the mapping nodes)
-                ancestry = ancestral_table[uA[1]][uB[1]]
+                # How the species nodes of the mapping nodes relate to each other
+                ancestry = relation(uA[1], uB[1])
 
                 uA_loss_events = [
                     event
@@ -525,6 +659,7 @@ def diameter_algorithm(
                         uB,
                         uB_loss_events,
                         hist_both_exit,
+                        hist_class,
                     )
                 elif ancestry == "eq":
                     hist = calculate_equal_enter_hist(
@@ -538,6 +673,7 @@ def diameter_algorithm(
                         hist_both_exit,
                         exit_table_a,
                         exit_table_b,
+                        hist_class,
                     )
                 # The only difference between the 'des' and 'an' cases are whether the nodes should be swapped
                 elif ancestry == "des":
@@ -553,6 +689,8 @@ def diameter_algorithm(
                         hist_both_exit,
                         exit_table_a,
                         exit_table_b,
+                        hist_class,
+                        memory,
                     )
                 elif ancestry == "an":
                     hist = calculate_ancestral_enter_hist(
@@ -567,16 +705,23 @@ def diameter_algorithm(
                         hist_both_exit,
                         exit_table_a,
                         exit_table_b,
+                        hist_class,
+                        memory,
                     )
                 else:
                     raise ValueError(
-                        "Invalid ancestry type '{0}', check calculate_ancestral_table().".format(
+                        "Invalid ancestry type '{0}', check the ancestry relation.".format(
                             ancestry
                         )
                     )
                 if verify:
                     verfier.verify_enter(uA, uB, hist)
                 enter_table[u][uA][uB] = hist
+                if symmetric and uA != uB:
+                    enter_table[u][uB][uA] = hist
+                    memory.add(u, hist, 2)
+                else:
+                    memory.add(u, hist)
                 if debug:
                     print(
                         "{0} -{1}-> {2}, Double-equal\t{3}\Hist:{4}".format(
@@ -587,12 +732,25 @@ def diameter_algorithm(
         if debug:
             print_table_nicely(enter_table[u], ", ", "EnterTable({0})".format(u))
 
+        if not debug:
+            exit_table_a.pop(u)
+            # The same table as exit_table_a if symmetric
+            exit_table_b.pop(u, None)
+            memory.release((u, "exit"))
+            for child in gene_tree[u]:
+                if child is not None:
+                    del enter_table[child]
+                    memory.release(child)
+
+    instrumentation.count(
+        peak_table_entries=memory.peak_entries, peak_table_bytes=memory.peak_bytes
+    )
     if debug:
         print("Exit Table A: {0}".format(exit_table_a))
         print("")
         print("Exit Table B: {0}".format(exit_table_b))
     # Now, the diameter of this reconciliation will be the maximum entry on the enter table.
-    result = Histogram(None)
+    result = hist_class(None)
     for uA in enter_table[gene_tree_root]:
         for uB in enter_table[gene_tree_root][uA]:
             if uB > uA:
@@ -2,11 +2,23 @@ import time
 import math
 from pathlib import Path
 
+from empress import instrumentation
 from empress.histogram import histogram_alg, histogram_display
 from empress.reconcile import recongraph_tools, diameter
 
 
-def calc_histogram(tree_data, d, t, l, time_it, normalize=False, zero_loss=False):
+def calc_histogram(
+    tree_data,
+    d,
+    t,
+    l,
+    time_it,
+    normalize=False,
+    zero_loss=False,
+    cache=None,
+    reconciliation=None,
+    engine="histogram",
+):
     """
     Compute the PDV from a .newick file
     :param tree_data <_ReconInput> - Output of newickFormatReader.getInput()
@@ -16,18 +28,25 @@ def calc_histogram(tree_data, d, t, l, time_it, normalize=False, zero_loss=False
     :param time_it <bool> - collect timing info
     :param normalize <bool> - normalize the histogram by the size of the gene tree
     :param zero_loss <bool> - ignore loss events
+    :param cache <ResultCache> - cache of reconciliation results to use, or None
+    :param reconciliation <tuple> - output of recongraph_tools.reconcile for tree_data and d, t, l, to use
+        instead of reconciling again
+    :param engine <str> - one of the keys of histogram_alg.PDV_ENGINES, "moments" to compute only the Moments
+        of the PDV
     :return diameter_alg_hist <Histogram> - the PDV for the given .newick
     :return elapsed <float> - the time it took to compute the PDV
         None if time_it is False
     """
     # From the newick tree create the reconciliation graph
+    if reconciliation is None:
+        reconciliation = recongraph_tools.reconcile(tree_data, d, t, l, cache=cache)
     (
         edge_species_tree,
         edge_gene_tree,
         dtl_recon_graph,
         mpr_count,
         best_roots,
-    ) = recongraph_tools.reconcile(tree_data, d, t, l)
+    ) = reconciliation
 
     # If we want to know the number of MPRs
     # print(mpr_count)
@@ -43,15 +62,19 @@ def calc_histogram(tree_data, d, t, l, time_it, normalize=False, zero_loss=False
     if time_it:
         start = time.time()
     # Calculate the histogram via histogram algorithm
-    diameter_alg_hist = histogram_alg.diameter_algorithm(
-        species_tree,
-        gene_tree,
-        gene_tree_root,
-        dtl_recon_graph,
-        dtl_recon_graph,
-        False,
-        zero_loss,
-    )
+    with instrumentation.span(
+        "histogram", mapping_nodes=len(dtl_recon_graph), engine=engine
+    ):
+        diameter_alg_hist = histogram_alg.diameter_algorithm(
+            species_tree,
+            gene_tree,
+            gene_tree_root,
+            dtl_recon_graph,
+            dtl_recon_graph,
+            False,
+            zero_loss,
+            engine=engine,
+        )
     if time_it:
         end = time.time()
         elapsed = end - start
@@ -109,7 +132,7 @@ def transform_hist(hist, omit_zeros, xnorm, ynorm, cumulative):
     return hist_cum, width
 
 
-def compute_pdv(filename, tree_data, d, t, l, args):
+def compute_pdv(filename, tree_data, d, t, l, args, cache=None, reconciliation=None):
     """
     Compute the PDV and other information and save them / output them
     :param filename - the path to a .newick file with the input trees and tip mapping
@@ -119,35 +142,56 @@ def compute_pdv(filename, tree_data, d, t, l, args):
     :param l <float> - ^^ loss
     :param args <ArgumentParser> - object that contains all parameters needed
     to compute, save, and/or output the PDV
+    :param cache <ResultCache> - cache of reconciliation results to use, or None
+    :param reconciliation <tuple> - output of recongraph_tools.reconcile to use, see calc_histogram
     """
     # if args.interactive:
     #     # converts args to dictionary first
     #     args = vars(args)
     #     args = HistogramMainInput.getInput(Path(filename), d, t, l, args)
-    hist, elapsed = calc_histogram(tree_data, d, t, l, args.time)
-    hist = hist.histogram_dict
+    # The statistics alone only need the moments of the PDV
+    stats_only = args.stats and args.histogram_pdf is None and args.csv is None
+    hist, elapsed = calc_histogram(
+        tree_data,
+        d,
+        t,
+        l,
+        args.time,
+        cache=cache,
+        reconciliation=reconciliation,
+        engine="moments" if stats_only else "histogram",
+    )
     if args.time:
         print("Time spent: {} Seconds".format(elapsed))
+    if stats_only:
+        _print_stats(hist.zero, hist.largest, hist.mean(), hist.standard_deviation())
+        return
+    hist = hist.histogram_dict
     # Calculate the statistics (with zeros)
     if args.stats:
         n_mprs = hist[0]
         diameter, mean, std = histogram_display.compute_stats(hist)
-        print("Number of MPRs: {}".format(n_mprs))
-        print("Diameter of MPR-space: {}".format(diameter))
-        print("Mean MPR distance: {} with standard deviation {}".format(mean, std))
+        _print_stats(n_mprs, diameter, mean, std)
     hist_new, width = transform_hist(
         hist, args.omit_zeros, args.xnorm, args.ynorm, args.cumulative
     )
     # Make the histogram image
     if args.histogram_pdf is not None:
-        histogram_display.plot_histogram(
-            args.histogram_pdf,
-            hist,
-            width,
-            Path(args.host).stem,
-            args.dup_cost,
-            args.trans_cost,
-            args.loss_cost,
-        )
+        with instrumentation.span("render", drawing="histogram"):
+            histogram_display.plot_histogram(
+                args.histogram_pdf,
+                hist,
+                width,
+                Path(args.host).stem,
+                args.dup_cost,
+                args.trans_cost,
+                args.loss_cost,
+            )
     if args.csv is not None:
         histogram_display.csv_histogram(args.csv, hist)
+
+
+def _print_stats(n_mprs, diameter, mean, std):
+    print("Number of MPRs: {}".format(n_mprs))
+    print("Diameter of MPR-space: {}".format(diameter))
+    print("Mean MPR distance: {} with standard deviation {}".format(mean, std))
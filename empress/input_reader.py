@@ -1,16 +1,30 @@
 # ReconInput class
+import re
 from io import StringIO
 
-# BioPython libraries
-from Bio import Phylo
-
 from pathlib import Path
 
+from empress import instrumentation
+
+# The tokens of the Newick format, as Bio.Phylo's Newick parser reads them
+_NEWICK_TOKENS = re.compile(
+    r"(\(|\)|[^\s\(\)\[\]\'\:\;\,]+|\:\ ?[+-]?[0-9]*\.?[0-9]+(?:[eE][+-]?[0-9]+)?"
+    r"|\,|\[(?:\\.|[^\]])*\]|\'(?:\\.|[^\'])*\'|\;|\n)"
+)
+
 
 class ReconInputError(Exception):
     pass
 
 
+class _NewickFallback(Exception):
+    """
+    Raised by _ReconInput._parse_newick_native for input it leaves to Bio.Phylo
+    """
+
+    pass
+
+
 class _ReconInput:
     """
     Storage class for the newick data (trees, tip mapping, and optional distance parameters)
@@ -36,9 +50,15 @@ class _ReconInput:
     @classmethod
     def from_files(cls, host_fname: str, parasite_fname: str, mapping_fname: str):
         recon_input = cls()
-        recon_input.read_host(host_fname)
-        recon_input.read_parasite(parasite_fname)
-        recon_input.read_mapping(mapping_fname)
+        with instrumentation.span("parse"):
+            recon_input.read_host(host_fname)
+            recon_input.read_parasite(parasite_fname)
+            recon_input.read_mapping(mapping_fname)
+            instrumentation.count(
+                host_edges=len(recon_input.host_dict),
+                parasite_edges=len(recon_input.parasite_dict),
+                tips=len(recon_input.tip_mapping),
+            )
         return recon_input
 
     def is_complete(self):
@@ -165,6 +185,169 @@ class _ReconInput:
         :return tree_dict <dict>     - dict representation of tree
         :return real_distance_dict <dict> - maps node name to distance of that node from the root
         """
+        try:
+            return _ReconInput._parse_newick_native(newick_string, tree_type)
+        except _NewickFallback:
+            return _ReconInput._parse_newick_bio(newick_string, tree_type)
+
+    @staticmethod
+    def _parse_newick_native(newick_string, tree_type):
+        """
+        Single pass, iterative Newick parser that reads the string the way Bio.Phylo does (same tokens, numeric
+        internal labels taken as support values, unnamed nodes named in preorder) and returns the same tree and
+        distance dicts as _parse_newick_bio. Raises _NewickFallback on input it does not handle: several or
+        malformed trees, trees that are not binary and trees with duplicate node names.
+        :param newick_string <str>   - string representation of tree
+        :param tree_type <str>       - "host" or "parasite"
+        :return tree_dict <dict>     - dict representation of tree
+        :return real_distance_dict <dict> - maps node name to distance of that node from the root
+        """
+        # Bio.Phylo strips the end of every line and joins the lines, and a tree ends with a line ending with ";"
+        texts = []
+        text = ""
+        for line in newick_string.split("\n"):
+            text += line.rstrip()
+            if text.endswith(";"):
+                texts.append(text)
+                text = ""
+        if text:
+            texts.append(text)
+        if len(texts) != 1:
+            raise _NewickFallback()
+
+        # Nodes are numbered in the order they are opened. The parent of a node is only kept until the node is
+        # closed, when it is added to the children of its parent.
+        names = [None]
+        lengths = [None]
+        children = [[]]
+        parents = [-1]
+
+        def new_node(parent):
+            names.append(None)
+            lengths.append(None)
+            children.append([])
+            parents.append(parent)
+            return len(names) - 1
+
+        def close_node(node):
+            name = names[node]
+            if name and children[node] and _ReconInput._is_support_value(name):
+                names[node] = None
+            parent = parents[node]
+            if parent >= 0:
+                children[parent].append(node)
+                parents[node] = -1
+            return parent
+
+        root = 0
+        current = root
+        open_count = 0
+        close_count = 0
+        tokens = _NEWICK_TOKENS.finditer(texts[0].strip())
+        for match in tokens:
+            token = match.group()
+            first = token[0]
+            if first == "'":
+                if not names[current]:
+                    names[current] = token[1:-1]
+                else:
+                    # Escaped quotes are two consecutive quotes
+                    names[current] += token[:-1]
+            elif first == "[" or token == "\n":
+                pass
+            elif token == "(":
+                current = new_node(current)
+                open_count += 1
+            elif token == ",":
+                # Without the outer parentheses, the root is only found at the first comma
+                if current == root:
+                    root = new_node(-1)
+                    parents[current] = root
+                current = new_node(close_node(current))
+            elif token == ")":
+                current = close_node(current)
+                if current < 0:
+                    raise _NewickFallback()
+                close_count += 1
+            elif token == ";":
+                break
+            elif first == ":":
+                lengths[current] = float(token[1:])
+            else:
+                names[current] = token
+        if open_count != close_count or next(tokens, None) is not None:
+            raise _NewickFallback()
+        close_node(current)
+        close_node(root)
+
+        preorder = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if len(children[node]) not in (0, 2):
+                raise _NewickFallback()
+            preorder.append(node)
+            stack.extend(reversed(children[node]))
+        if len(preorder) < 3:
+            raise _NewickFallback()
+
+        prefix = "_h" if tree_type == "host" else "_p"
+        count = 0
+        for node in preorder:
+            if names[node] is None:
+                names[node] = "{}{}".format(prefix, count)
+                count += 1
+        if len(set(names[node] for node in preorder)) != len(preorder):
+            raise _NewickFallback()
+
+        tree_dict = {}
+        real_distance_dict = {}
+        distances = {root: lengths[root] or 0}
+        root_edge_name = "hTop" if tree_type == "host" else "pTop"
+        for node in preorder:
+            name = names[node]
+            parent = parents[node]
+            if node == root:
+                edge_name = root_edge_name
+                edge = ("Top", name)
+            else:
+                edge = edge_name = (names[parent], name)
+                distances[node] = distances[parent] + (lengths[node] or 0)
+            if children[node]:
+                left, right = children[node]
+                parents[left] = parents[right] = node
+                tree_dict[edge_name] = edge + (
+                    (name, names[left]),
+                    (name, names[right]),
+                )
+            else:
+                tree_dict[edge_name] = edge + (None, None)
+            real_distance_dict[name] = distances[node]
+        return tree_dict, real_distance_dict
+
+    @staticmethod
+    def _is_support_value(label):
+        """
+        :return: whether Bio.Phylo reads the label of an internal node as a support value rather than a name
+        """
+        if label.isdigit():
+            return True
+        try:
+            float(label)
+        except ValueError:
+            return False
+        return True
+
+    @staticmethod
+    def _parse_newick_bio(newick_string, tree_type):
+        """
+        Parse with Bio.Phylo, for the input _parse_newick_native leaves to it
+        :param newick_string <str>   - string representation of tree
+        :param tree_type <str>       - "host" or "parasite"
+        :return tree_dict <dict>     - dict representation of tree
+        :return real_distance_dict <dict> - maps node name to distance of that node from the root
+        """
+        from Bio import Phylo
 
         tree = Phylo.read(StringIO(newick_string), "newick")
         _ReconInput._name_unnamed_nodes(tree, tree_type)
@@ -180,7 +363,7 @@ class _ReconInput:
         return tree_dict, real_distance_dict
 
     @staticmethod
-    def _name_unnamed_nodes(tree: Phylo.Newick.Tree, tree_type: str):
+    def _name_unnamed_nodes(tree: "Phylo.Newick.Tree", tree_type: str):
         count = 0
         for clade in tree.find_clades():
             if clade.name is None:
@@ -232,29 +415,43 @@ class _ReconInput:
         :return <None>               - D is updated so that it may represent the tree
         """
 
-        root = tuple_tree[0]
-        left_tree = tuple_tree[1]
-        right_tree = tuple_tree[2]
-        if tree_type == "parasite" and parent_vertex == "Top":
-            edge_name = "pTop"
-        elif tree_type == "host" and parent_vertex == "Top":
-            edge_name = "hTop"
-        else:
-            edge_name = (parent_vertex, root)
+        # The subtrees are visited in preorder with an explicit stack, so deep trees do not hit the recursion limit
+        stack = [(tuple_tree, parent_vertex)]
+        while stack:
+            tuple_tree, parent_vertex = stack.pop()
+            root = tuple_tree[0]
+            left_tree = tuple_tree[1]
+            right_tree = tuple_tree[2]
+            if tree_type == "parasite" and parent_vertex == "Top":
+                edge_name = "pTop"
+            elif tree_type == "host" and parent_vertex == "Top":
+                edge_name = "hTop"
+            else:
+                edge_name = (parent_vertex, root)
 
-        if left_tree is None:  # and thus rightTree == None and this is a leaf
-            tree_dict[edge_name] = edge_name + (None, None)
-        else:
-            left_edge_name = (root, left_tree[0])
-            right_edge_name = (root, right_tree[0])
-            if edge_name == "pTop":
-                tree_dict[edge_name] = ("Top", root, left_edge_name, right_edge_name)
-            elif edge_name == "hTop":
-                tree_dict[edge_name] = ("Top", root, left_edge_name, right_edge_name)
+            if left_tree is None:  # and thus rightTree == None and this is a leaf
+                tree_dict[edge_name] = edge_name + (None, None)
             else:
-                tree_dict[edge_name] = edge_name + (left_edge_name, right_edge_name)
-            _ReconInput._build_tree_dictionary(left_tree, root, tree_dict, tree_type)
-            _ReconInput._build_tree_dictionary(right_tree, root, tree_dict, tree_type)
+                left_edge_name = (root, left_tree[0])
+                right_edge_name = (root, right_tree[0])
+                if edge_name == "pTop":
+                    tree_dict[edge_name] = (
+                        "Top",
+                        root,
+                        left_edge_name,
+                        right_edge_name,
+                    )
+                elif edge_name == "hTop":
+                    tree_dict[edge_name] = (
+                        "Top",
+                        root,
+                        left_edge_name,
+                        right_edge_name,
+                    )
+                else:
+                    tree_dict[edge_name] = edge_name + (left_edge_name, right_edge_name)
+                stack.append((right_tree, root))
+                stack.append((left_tree, root))
 
     @staticmethod
     def _parse_tip_mapping(pairs):
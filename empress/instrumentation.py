@@ -0,0 +1,151 @@
+# instrumentation.py
+# Per-stage timing and memory measurements
+
+# The stages of a reconciliation (parsing, filling the DP tables, building the graph, counting MPRs, ...) are wrapped
+# in named spans. While profiling is enabled, each span writes one JSON line when it ends, with its wall and CPU time,
+# the peak memory traced by tracemalloc while it ran, its counters (sizes of the trees, number of mapping nodes, ...)
+# and the tags given to profiling (for instance, the gene family). Spans nest; a record names its parent span, and
+# the peak memory of a span includes that of its children.
+#
+# When profiling is disabled, span costs one function call and count does nothing, so the stages are instrumented
+# unconditionally.
+#
+#     with instrumentation.profiling("profile.jsonl", family="gene1"):
+#         recon_input.reconcile(1, 2, 3)
+
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+# The profiler of the innermost profiling block, or None
+_profiler = None
+
+
+class _Span:
+    def __init__(self, name: str, parent, counters: dict):
+        self.name = name
+        self.parent = parent
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.counters = counters
+        self.peak = 0
+
+
+class _Profiler:
+    def __init__(self, out, tags: dict, current: _Span = None):
+        """
+        :param out <file>       - text file the records are written to
+        :param tags <dict>      - items added to every record
+        :param current <_Span>  - the running span the spans of this profiler nest in, or None
+        """
+        self.out = out
+        self.tags = tags
+        self.current = current
+
+    def enter(self, name: str, counters: dict) -> _Span:
+        span = _Span(name, self.current, counters)
+        if self.current is not None:
+            # The peak of the parent so far, before the peak is reset for the child
+            self.current.peak = max(
+                self.current.peak, tracemalloc.get_traced_memory()[1]
+            )
+        self.current = span
+        # Before python 3.9, the peak of a span is the peak since tracing started
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        span.start_bytes = tracemalloc.get_traced_memory()[0]
+        span.start_wall = time.perf_counter()
+        span.start_cpu = time.process_time()
+        return span
+
+    def exit(self, span: _Span):
+        wall = time.perf_counter() - span.start_wall
+        cpu = time.process_time() - span.start_cpu
+        span.peak = max(span.peak, tracemalloc.get_traced_memory()[1])
+        self.current = span.parent
+        if span.parent is not None:
+            span.parent.peak = max(span.parent.peak, span.peak)
+        record = dict(self.tags)
+        record.update(
+            span=span.name,
+            parent=None if span.parent is None else span.parent.name,
+            depth=span.depth,
+            wall=round(wall, 6),
+            cpu=round(cpu, 6),
+            start_bytes=span.start_bytes,
+            peak_bytes=span.peak,
+        )
+        record.update(span.counters)
+        self.out.write(json.dumps(record, default=str) + "\n")
+        self.out.flush()
+
+
+def enabled() -> bool:
+    """
+    :return: whether the spans are being recorded
+    """
+    return _profiler is not None
+
+
+@contextlib.contextmanager
+def profiling(output=None, **tags):
+    """
+    Record the spans that run inside the block
+    :param output <str or file>     - JSON-lines file the records are appended to, "-" or None for stderr
+    :param tags                     - items added to every record, e.g. family="gene1"
+    """
+    global _profiler
+    if output is None or output == "-":
+        out = contextlib.nullcontext(sys.stderr)
+    elif isinstance(output, str):
+        out = open(output, "a")
+    else:
+        out = contextlib.nullcontext(output)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    outer = _profiler
+    try:
+        with out as out_file:
+            if outer is not None:
+                # The spans of a nested block are children of the running span of the outer block
+                _profiler = _Profiler(out_file, dict(outer.tags, **tags), outer.current)
+            else:
+                _profiler = _Profiler(out_file, tags)
+            yield _profiler
+    finally:
+        _profiler = outer
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def _recorded_span(profiler: _Profiler, name: str, counters: dict):
+    span = profiler.enter(name, counters)
+    try:
+        yield span
+    finally:
+        profiler.exit(span)
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def span(name: str, **counters):
+    """
+    :param name <str>   - name of the stage
+    :param counters     - counters of the stage known when it starts, e.g. parasite_nodes=10
+    :return: context manager that records the stage if profiling is enabled
+    """
+    if _profiler is None:
+        return _NO_SPAN
+    return _recorded_span(_profiler, name, counters)
+
+
+def count(**counters):
+    """
+    Set counters of the innermost running span, e.g. count(mapping_nodes=len(graph)), if profiling is enabled
+    """
+    if _profiler is not None and _profiler.current is not None:
+        _profiler.current.counters.update(counters)
@@ -4,6 +4,11 @@ A Proposal for reconciliation graph and reconciliation interface.
 from abc import ABC  # Abstract Base Classes
 from typing import List, Dict
 from enum import Enum
+import math
+
+import numpy as np
+
+from empress.reconcile.compact_graph import CompactReconGraph, EVENT_TYPES
 
 __all__ = [
     "MappingNode",
@@ -271,15 +276,22 @@ class Reconciliation:
         This will save the Reconciliation along with the metadata if metadata
         is specified, e.g. ``recon.save('./reconname', {'created_at': 'Noon'})``.
         The metadata is only for book-keeping purposes and is not read when load.
+        The file format is the one of CompactReconGraph.save.
         """
-        raise NotImplementedError
+        _save_events(path, [self.source], self._map, metadata)
 
     @staticmethod
     def load(path) -> "Reconciliation":
         """
         Load a Reconciliation from path, e.g. ``Reconciliation.load('./reconname')``.
         """
-        raise NotImplementedError
+        sources, events_of = _load_events(path)
+        if len(sources) != 1 or any(len(events) != 1 for events in events_of.values()):
+            raise ValueError("%s does not contain a single reconciliation" % path)
+        recon_obj = Reconciliation(sources[0], {})
+        for mapping, events in events_of.items():
+            recon_obj.set_event(mapping, events[0])
+        return recon_obj
 
 
 class ReconGraph:
@@ -352,12 +364,98 @@ class ReconGraph:
         This will save the reconciliation graph along with the metadata if metadata
         is specified, e.g. ``recon.save('./reconname', {'created_at': 'Noon'})``.
         The metadata is only for book-keeping purposes and is not read when load.
+        The file format is the one of CompactReconGraph.save.
         """
-        raise NotImplementedError
+        _save_events(path, self.sources, self._map, metadata)
 
     @staticmethod
     def load(path) -> "ReconGraph":
         """
-        Load a Reconciliation from path, e.g. ``Reconciliation.load('./reconname')``.
+        Load a ReconGraph from path, e.g. ``ReconGraph.load('./reconname')``.
         """
-        raise NotImplementedError
+        sources, events_of = _load_events(path)
+        return ReconGraph(sources, events_of)
+
+
+# The event classes by the event type codes of recongraph_tools
+_EVENT_CLASSES = {"S": Cospeciation, "D": Duplication, "T": Transfer}
+_EVENT_CODES = {
+    EventType.COSPECIATION: "S",
+    EventType.DUPLICATION: "D",
+    EventType.TRANSFER: "T",
+    EventType.LOSS: "L",
+    EventType.TIPTIP: "C",
+}
+
+
+def _save_events(
+    path: str, sources: List[MappingNode], event_map: dict, metadata: Dict[str, str]
+):
+    """
+    Save the events of a Reconciliation or ReconGraph as a CompactReconGraph
+    :param event_map - maps every MappingNode to an Event (Reconciliation) or a list of Events (ReconGraph)
+    """
+    no_mapping = (None, None)
+    recon_graph = {}
+    frequencies = []
+    for mapping, events in event_map.items():
+        if isinstance(events, Event):
+            events = [events]
+        event_tuples = []
+        for event in events:
+            event_code = _EVENT_CODES[event.event_type]
+            if isinstance(event, TwoChildrenEvent):
+                children = (
+                    (event.left.parasite, event.left.host),
+                    (event.right.parasite, event.right.host),
+                )
+            elif isinstance(event, Loss):
+                children = ((event.child.parasite, event.child.host), no_mapping)
+            else:
+                children = (no_mapping, no_mapping)
+            event_tuples.append((event_code,) + children)
+            frequencies.append(math.nan if event.freq is None else event.freq)
+        recon_graph[(mapping.parasite, mapping.host)] = event_tuples
+    graph = CompactReconGraph.from_dict(
+        recon_graph, [(source.parasite, source.host) for source in sources]
+    )
+    graph.event_frequencies = np.array(frequencies, dtype=np.float64)
+    graph.save(path, metadata)
+
+
+def _load_events(path: str):
+    """
+    :return: the sources and the lists of events by MappingNode saved by _save_events
+    """
+    graph = CompactReconGraph.load(path)
+    mappings = [
+        MappingNode(*graph.mapping_node(i)) for i in range(len(graph.node_parasite))
+    ]
+    frequencies = (
+        graph.event_frequencies.tolist()
+        if graph.event_frequencies is not None
+        else [math.nan] * graph.n_events
+    )
+    event_types = graph.event_types.tolist()
+    event_children = graph.event_children.tolist()
+    offsets = graph.event_offsets.tolist()
+
+    events_of = {}
+    for i in range(graph.n_nodes):
+        events = []
+        for e in range(offsets[i], offsets[i + 1]):
+            event_code = EVENT_TYPES[event_types[e]]
+            freq = None if math.isnan(frequencies[e]) else frequencies[e]
+            child1, child2 = event_children[e]
+            if event_code in _EVENT_CLASSES:
+                event = _EVENT_CLASSES[event_code](
+                    mappings[child1], mappings[child2], freq
+                )
+            elif event_code == "L":
+                event = Loss(mappings[child1], freq)
+            else:
+                event = TipTip(freq)
+            events.append(event)
+        events_of[mappings[i]] = events
+    sources = [mappings[i] for i in graph.roots.tolist()]
+    return sources, events_of
@@ -400,33 +400,36 @@ def topological_order_helper(
     is_leaf = start_node not in temporal_graph
     if is_leaf:
         return False, next_order
-    else:
-        has_cycle = start_node in visiting_nodes
-        if has_cycle:
-            return True, next_order
-        visiting_nodes.add(start_node)
-        child_nodes = sorted(temporal_graph[start_node])
+    has_cycle = start_node in visiting_nodes
+    if has_cycle:
+        return True, next_order
+    visiting_nodes.add(start_node)
+    # the depth-first search keeps the nodes of the current path, with their children that are left to explore,
+    # on an explicit stack so that long paths do not hit the recursion limit
+    stack = [(start_node, iter(sorted(temporal_graph[start_node])))]
+    while stack:
+        node, child_nodes = stack[-1]
         for child_node in child_nodes:
             # if the child_node is already labeled, we skip it
             if child_node in ordering_dict:
                 continue
             if child_node in unvisited_nodes:
                 unvisited_nodes.pop(child_node)
-            has_cycle_child, next_order = topological_order_helper(
-                child_node,
-                next_order,
-                visiting_nodes,
-                unvisited_nodes,
-                temporal_graph,
-                ordering_dict,
-            )
+            if child_node not in temporal_graph:
+                continue
             # if we find a cycle, we stop the process
-            if has_cycle_child:
+            if child_node in visiting_nodes:
                 return True, next_order
-        # if children are all labeled, we can label the start_node
-        visiting_nodes.remove(start_node)
-        ordering_dict[start_node] = next_order
-        return False, next_order + 1
+            visiting_nodes.add(child_node)
+            stack.append((child_node, iter(sorted(temporal_graph[child_node]))))
+            break
+        else:
+            # if children are all labeled, we can label the node
+            stack.pop()
+            visiting_nodes.remove(node)
+            ordering_dict[node] = next_order
+            next_order += 1
+    return False, next_order
 
 
 def populate_nodes_with_order(tree_node, tree_type, ordering_dict, leaf_order):
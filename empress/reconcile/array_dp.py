@@ -0,0 +1,663 @@
+# array_dp.py
+# An integer-indexed implementation of the DP in recongraph_tools.py
+
+# recongraph_tools.DP keeps its A, C, O and best_switch tables in dictionaries keyed by pairs of edge tuples. This
+# module computes the same tables, but gives every host and parasite edge a dense integer id (its position in a
+# postorder traversal of its tree) and stores each table as a 2-D array indexed by [parasite id, host id]. Edge and
+# vertex names are only looked up again when events are written to the reconciliation graph, so the results are
+# identical to those of recongraph_tools.DP: the same graph (with events in the same order), cost, number of MPRs
+# and roots.
+
+# The tables are filled one parasite edge (one row) at a time, in parasite postorder. Within a row, C and O are
+# min-reductions over the host children and best_switch is a min-reduction over the host ancestors, so a row can
+# either be computed with a python loop over the host edges, or with one NumPy operation per host level: all host
+# edges of the same height for C and O, and all host edges of the same depth for best_switch.
+
+# By default, the events of a mapping node are not stored while the tables are filled. Once the tables are done,
+# the graph is built from the best roots, and the events of each reachable mapping node (including the landing
+# sites of its transfers) are derived from the rows of its parasite edge and of that edge's children. The
+# reachable graph is usually a small fraction of all |P| x |H| mapping nodes.
+
+from typing import Tuple
+
+import numpy as np
+
+from empress import instrumentation
+from empress.input_reader import _ReconInput
+from empress.reconcile import recongraph_tools
+from empress.reconcile.tree_index import TreeIndex, HostTreeIndex
+
+Infinity = float("inf")
+
+# Fewest host edges per level, on average, for which a NumPy operation per level beats a python loop per edge.
+# Deep, unbalanced host trees (caterpillars) have about one edge per level and are filled with the loop.
+MIN_LEVEL_WIDTH = 4
+
+
+def _host_tree_index(
+    tree_data: _ReconInput, host_index: HostTreeIndex
+) -> HostTreeIndex:
+    """
+    :return: host_index, checked against the host tree of tree_data, or a new index of it if host_index is None
+    """
+    if host_index is None:
+        return HostTreeIndex(tree_data.host_dict)
+    host_index.check_tree(tree_data.host_dict)
+    return host_index
+
+
+def _tip_hosts(parasite: TreeIndex, host: TreeIndex, tip_mapping: dict) -> list:
+    """
+    :return: for every parasite id, the id of the host tip its vertex is mapped to, or -1 if it is not a tip
+    """
+    host_tip_id = {host.vertices[h]: h for h in host.tips}
+    tip_hosts = [-1] * parasite.size
+    for p in parasite.tips:
+        # Raise the same KeyError as recongraph_tools.DP when a parasite tip is missing from the mapping
+        tip_hosts[p] = host_tip_id.get(tip_mapping[parasite.vertices[p]], -1)
+    return tip_hosts
+
+
+def _row_loop(
+    p, parasite, host, tip_hosts, C, best_switch, dup_cost, transfer_cost, loss_cost
+):
+    """
+    Compute the C, O and best_switch rows of parasite edge p with a python loop over the host edges.
+    :return: the three rows as lists
+    """
+    host_child1 = host.child1.tolist()
+    host_child2 = host.child2.tolist()
+    p1 = parasite.child1[p]
+    p2 = parasite.child2[p]
+    vp_is_a_tip = p1 < 0
+    if not vp_is_a_tip:
+        C1 = C[p1].tolist()
+        C2 = C[p2].tolist()
+        switch1 = best_switch[p1].tolist()
+        switch2 = best_switch[p2].tolist()
+
+    C_p = [Infinity] * host.size
+    O_p = [Infinity] * host.size
+    for h in range(host.size):
+        h1 = host_child1[h]
+        h2 = host_child2[h]
+        if h1 < 0:
+            A = 0 if vp_is_a_tip and tip_hosts[p] == h else Infinity
+        else:
+            loss_ep_eh = loss_cost + min(C_p[h1], C_p[h2])
+            if not vp_is_a_tip:
+                co_ep_eh = min(C1[h1] + C2[h2], C1[h2] + C2[h1])
+                A = min(co_ep_eh, loss_ep_eh)
+            else:
+                A = loss_ep_eh
+        if not vp_is_a_tip:
+            dup_ep_eh = dup_cost + C1[h] + C2[h]
+            switch_ep_eh = transfer_cost + min(C1[h] + switch2[h], C2[h] + switch1[h])
+            C_p[h] = min(A, dup_ep_eh, switch_ep_eh)
+        else:
+            C_p[h] = A
+        O_p[h] = C_p[h] if h1 < 0 else min(C_p[h], O_p[h1], O_p[h2])
+
+    switch_p = [Infinity] * host.size
+    for h in host.preorder:
+        h1 = host_child1[h]
+        h2 = host_child2[h]
+        if h1 >= 0:
+            switch_p[h1] = min(switch_p[h], O_p[h2])
+            switch_p[h2] = min(switch_p[h], O_p[h1])
+    return C_p, O_p, switch_p
+
+
+def _row_levels(
+    p,
+    parasite,
+    host,
+    tip_hosts,
+    C,
+    best_switch,
+    dup_cost,
+    transfer_cost,
+    loss_cost,
+    batch_shape=(),
+):
+    """
+    Compute the C, O and best_switch rows of parasite edge p with one NumPy operation per host level.
+    Rows may have leading batch axes (e.g. one per cost setting), in which case the costs and tip hosts
+    must broadcast against them.
+    :param batch_shape <tuple> - the shape of the leading batch axes of the rows
+    :return: the three rows as arrays of shape batch_shape + (number of host edges,)
+    """
+    p1 = parasite.child1[p]
+    p2 = parasite.child2[p]
+    if p1 < 0:
+        # A tip only maps to its host tip at no cost; everything above that is reached by losses
+        tip_host = np.asarray(tip_hosts[p])[..., None]
+        C_p = np.where(np.arange(host.size) == tip_host, 0.0, Infinity)
+        C_p = np.broadcast_to(C_p, batch_shape + (host.size,)).copy()
+        no_loss = C_p.copy()
+    else:
+        C1 = C[p1]
+        C2 = C[p2]
+        # The cost of every event that is not a loss: duplication and transfer everywhere...
+        no_loss = np.minimum(
+            dup_cost + C1 + C2,
+            transfer_cost + np.minimum(C1 + best_switch[p2], C2 + best_switch[p1]),
+        )
+        # ... and cospeciation on internal host edges
+        internal = ~host.is_tip
+        h1 = host.child1[internal]
+        h2 = host.child2[internal]
+        no_loss[..., internal] = np.minimum(
+            no_loss[..., internal],
+            np.minimum(C1[..., h1] + C2[..., h2], C1[..., h2] + C2[..., h1]),
+        )
+        C_p = no_loss.copy()
+
+    # Losses depend on the C values of the host children, so fill C and O one height level at a time
+    O_p = C_p.copy()
+    for level in host.height_levels:
+        h1 = host.child1[level]
+        h2 = host.child2[level]
+        C_p[..., level] = np.minimum(
+            no_loss[..., level], loss_cost + np.minimum(C_p[..., h1], C_p[..., h2])
+        )
+        O_p[..., level] = np.minimum(
+            C_p[..., level], np.minimum(O_p[..., h1], O_p[..., h2])
+        )
+
+    # best_switch is a prefix minimum from the root down, one depth level at a time
+    switch_p = np.full(C_p.shape, Infinity)
+    for level in host.depth_levels:
+        h1 = host.child1[level]
+        h2 = host.child2[level]
+        switch_p[..., h1] = np.minimum(switch_p[..., level], O_p[..., h2])
+        switch_p[..., h2] = np.minimum(switch_p[..., level], O_p[..., h1])
+    return C_p, O_p, switch_p
+
+
+def _o_best(host: TreeIndex, C_p: list, O_p: list, h: int) -> list:
+    """
+    :return: the host ids in the subtree of h whose C value gives O[p, h] its value, in the order
+    recongraph_tools.DP lists them in oBest
+    """
+    o_best = []
+    stack = [h]
+    while stack:
+        x = stack.pop()
+        x1, x2 = host.child_ids[x]
+        if x1 < 0:
+            o_best.append(x)
+            continue
+        if C_p[x] == O_p[x]:
+            o_best.append(x)
+        # Pushed in reverse, so that the subtree of the first child is listed first
+        if O_p[x2] == O_p[x]:
+            stack.append(x2)
+        if O_p[x1] == O_p[x]:
+            stack.append(x1)
+    return o_best
+
+
+def _landing_sites(
+    host: TreeIndex, C_p: list, O_p: list, switch_p: list, h: int
+) -> list:
+    """
+    Rebuild best_switch_locations[(vp, vh)] of recongraph_tools.DP from the finished rows of parasite edge p.
+    The list of an edge is the list of its parent (when the best switch comes from above the parent) followed
+    by the oBest list of its sibling (when the best switch lands below the sibling), so the siblings that
+    contribute are found by walking up from h.
+    :return: the list of host ids, or [-1] for the host root
+    """
+    if h == host.root:
+        return [-1]
+    siblings = []
+    while True:
+        parent = host.parent_ids[h]
+        h1, h2 = host.child_ids[parent]
+        sibling = h2 if h == h1 else h1
+        siblings.append(sibling if switch_p[h] == O_p[sibling] else -1)
+        if parent == host.root or switch_p[h] != switch_p[parent]:
+            break
+        h = parent
+    sites = []
+    for sibling in reversed(siblings):
+        if sibling >= 0:
+            sites.extend(_o_best(host, C_p, O_p, sibling))
+    return sites
+
+
+class _RowEvents:
+    """
+    Derives the optimal events of the mapping nodes of one parasite edge from the finished cost rows of that
+    edge and of its children, with the same tie-breaking order as recongraph_tools.DP.
+    """
+
+    def __init__(
+        self, p, parasite, host, tip_hosts, C, O, best_switch, costs, copy_rows
+    ):
+        """
+        :param copy_rows <bool> - read the rows from python lists rather than from the tables. Copying pays off
+            when the events of most of the host edges of the row are needed.
+        """
+        self.p = p
+        self.vp = parasite.vertices[p]
+        self.host = host
+        self.tip_host = tip_hosts[p]
+        self.dup_cost, self.transfer_cost, self.loss_cost = costs
+        row = (lambda values: values.tolist()) if copy_rows else (lambda values: values)
+        self.C_p = row(C[p])
+        p1 = parasite.child1[p]
+        p2 = parasite.child2[p]
+        self.vp_is_a_tip = p1 < 0
+        if not self.vp_is_a_tip:
+            self.p_child1 = parasite.vertices[p1]
+            self.p_child2 = parasite.vertices[p2]
+            self.C1 = row(C[p1])
+            self.C2 = row(C[p2])
+            self.switch1 = row(best_switch[p1])
+            self.switch2 = row(best_switch[p2])
+            self.O1 = row(O[p1])
+            self.O2 = row(O[p2])
+
+    def events(self, h: int) -> list:
+        """
+        :return: the list of optimal event nodes of the mapping node (vp, vh) for host id h
+        """
+        host = self.host
+        vp = self.vp
+        vh = host.vertices[h]
+        h1, h2 = host.child_ids[h]
+        C_p = self.C_p
+        loss_cost = self.loss_cost
+
+        # A(ep, eh) and its events
+        if h1 < 0:
+            if self.vp_is_a_tip and self.tip_host == h:
+                A = 0
+                A_min = [("C", (None, None), (None, None))]
+            else:
+                A = Infinity
+                A_min = []
+        else:
+            h_child1 = host.vertices[h1]
+            h_child2 = host.vertices[h2]
+            if not self.vp_is_a_tip:
+                C1 = self.C1
+                C2 = self.C2
+                co_ep_eh = min(C1[h1] + C2[h2], C1[h2] + C2[h1])
+                co_min = []
+                if co_ep_eh == C2[h1] + C1[h2]:
+                    co_min.append(
+                        ("S", (self.p_child2, h_child1), (self.p_child1, h_child2))
+                    )
+                if co_ep_eh == C1[h1] + C2[h2]:
+                    co_min.append(
+                        ("S", (self.p_child1, h_child1), (self.p_child2, h_child2))
+                    )
+            else:
+                co_ep_eh = Infinity
+                co_min = []
+            loss_ep_eh = loss_cost + min(C_p[h1], C_p[h2])
+            loss_min = []
+            if loss_ep_eh == loss_cost + C_p[h1]:
+                loss_min.append(("L", (vp, h_child1), (None, None)))
+            if loss_ep_eh == loss_cost + C_p[h2]:
+                loss_min.append(("L", (vp, h_child2), (None, None)))
+            A = min(co_ep_eh, loss_ep_eh)
+            if co_ep_eh < loss_ep_eh:
+                A_min = co_min
+            elif loss_ep_eh < co_ep_eh:
+                A_min = loss_min
+            else:
+                A_min = loss_min + co_min
+
+        events = []
+        if not self.vp_is_a_tip:
+            C1 = self.C1
+            C2 = self.C2
+            if C_p[h] == self.dup_cost + C1[h] + C2[h]:
+                events.append(("D", (self.p_child1, vh), (self.p_child2, vh)))
+            switch_from_1 = C1[h] + self.switch2[h]
+            switch_from_2 = C2[h] + self.switch1[h]
+            if C_p[h] == self.transfer_cost + min(switch_from_1, switch_from_2):
+                if switch_from_1 <= switch_from_2:
+                    for location in _landing_sites(
+                        host, self.C2, self.O2, self.switch2, h
+                    ):
+                        events.append(
+                            (
+                                "T",
+                                (self.p_child1, vh),
+                                (self.p_child2, _host_name(host, location)),
+                            )
+                        )
+                else:
+                    for location in _landing_sites(
+                        host, self.C1, self.O1, self.switch1, h
+                    ):
+                        events.append(
+                            (
+                                "T",
+                                (self.p_child2, vh),
+                                (self.p_child1, _host_name(host, location)),
+                            )
+                        )
+        if C_p[h] == A:
+            events.extend(A_min)
+        return events
+
+
+def DP(
+    tree_data: _ReconInput,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    vectorize: bool = True,
+    lazy: bool = True,
+    host_index: HostTreeIndex = None,
+) -> Tuple[dict, float, int, list]:
+    """
+    Drop-in replacement for recongraph_tools.DP; see that function for the meaning of the parameters
+    and of the returned graph, cost, number of MPRs and best roots.
+    :param vectorize <bool> - compute each row of the cost tables with one NumPy operation per host
+        level instead of a python loop over the host edges, unless the host levels hold fewer than
+        MIN_LEVEL_WIDTH edges on average. The results are the same either way.
+    :param lazy <bool> - fill only the cost tables first, then derive events only for the mapping nodes
+        reachable from the best roots. Otherwise the events of every finite mapping node are built while
+        the tables are filled, like recongraph_tools.DP does. The results are the same either way.
+    :param host_index <HostTreeIndex> - index of tree_data.host_dict to reuse, or None to build one
+    """
+    host = _host_tree_index(tree_data, host_index)
+    parasite = TreeIndex(tree_data.parasite_dict, "pTop")
+    tip_hosts = _tip_hosts(parasite, host, tree_data.tip_mapping)
+    costs = (dup_cost, transfer_cost, loss_cost)
+    n_levels = len(host.height_levels) + len(host.depth_levels)
+    wide_levels = host.size >= MIN_LEVEL_WIDTH * n_levels
+    compute_row = _row_levels if vectorize and wide_levels else _row_loop
+
+    # C, O, and best_switch as defined in the tech report, indexed by [parasite id, host id]
+    C = np.full((parasite.size, host.size), Infinity)
+    O = np.full((parasite.size, host.size), Infinity)
+    best_switch = np.full((parasite.size, host.size), Infinity)
+
+    events_dict = {}
+    min_cost = {}
+
+    with instrumentation.span(
+        "dp_tables", parasite_edges=parasite.size, host_edges=host.size
+    ):
+        for p in range(parasite.size):
+            C[p], O[p], best_switch[p] = compute_row(
+                p, parasite, host, tip_hosts, C, best_switch, *costs
+            )
+            if lazy:
+                continue
+            row = _RowEvents(
+                p, parasite, host, tip_hosts, C, O, best_switch, costs, True
+            )
+            for h in np.flatnonzero(C[p] != Infinity).tolist():
+                min_cost[(row.vp, host.vertices[h])] = row.C_p[h]
+                events_dict[(row.vp, host.vertices[h])] = row.events(h)
+
+    if lazy:
+        return _lazy_result(parasite, host, tip_hosts, C, O, best_switch, costs)
+    with instrumentation.span("graph_build"):
+        tree_min = recongraph_tools.find_best_roots(tree_data.parasite_dict, min_cost)
+        dtl_recon_graph = recongraph_tools.build_dtl_recon_graph(
+            tree_min, events_dict, {}
+        )
+        _count_graph(dtl_recon_graph)
+    mpr_count = recongraph_tools.count_mprs_wrapper(tree_min, dtl_recon_graph)
+    best_cost = min_cost[tree_min[0]]
+    return dtl_recon_graph, best_cost, mpr_count, tree_min
+
+
+def DP_cost(
+    tree_data: _ReconInput,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    host_index: HostTreeIndex = None,
+) -> float:
+    """
+    The cost of a maximum parsimony reconciliation, as returned by recongraph_tools.DP, for callers that need
+    nothing else (e.g. the Monte Carlo samples of statistics.py). No events are derived, and the rows of a
+    parasite edge are dropped as soon as the row of its parent is done, so only the rows of the current
+    parasite frontier are ever held.
+    :param tree_data <_ReconInput> - see recongraph_tools.DP
+    :param dup_cost <float> - cost of a duplication event
+    :param transfer_cost <float> - cost of a transfer event
+    :param loss_cost <float> - cost of a loss event
+    :param host_index <HostTreeIndex> - index of tree_data.host_dict to reuse, or None to build one
+    :return: the total cost of the best reconciliation
+    """
+    host = _host_tree_index(tree_data, host_index)
+    parasite = TreeIndex(tree_data.parasite_dict, "pTop")
+    tip_hosts = _tip_hosts(parasite, host, tree_data.tip_mapping)
+    root_costs = _root_costs(
+        parasite, host, tip_hosts, dup_cost, transfer_cost, loss_cost, ()
+    )
+    return root_costs.min().item()
+
+
+def DP_cost_batch(
+    tree_data: _ReconInput,
+    tip_mappings: list,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    host_index: HostTreeIndex = None,
+) -> np.ndarray:
+    """
+    DP_cost for many tip mappings of the same host and parasite trees at once. Only the rows of the parasite
+    tips differ between the mappings, so all the mappings are carried through the recurrences together, as
+    an extra axis of every row.
+    :param tree_data <_ReconInput> - the host and parasite trees; its own tip mapping is not used
+    :param tip_mappings <list> - tip mappings in the format of _ReconInput.tip_mapping
+    :param dup_cost <float> - cost of a duplication event
+    :param transfer_cost <float> - cost of a transfer event
+    :param loss_cost <float> - cost of a loss event
+    :param host_index <HostTreeIndex> - index of tree_data.host_dict to reuse, or None to build one
+    :return: the total cost of the best reconciliation for each tip mapping
+    """
+    host = _host_tree_index(tree_data, host_index)
+    parasite = TreeIndex(tree_data.parasite_dict, "pTop")
+    # tip_hosts[p] holds the host tip of parasite edge p under every mapping
+    tip_hosts = np.array(
+        [_tip_hosts(parasite, host, tip_mapping) for tip_mapping in tip_mappings],
+        dtype=np.intp,
+    ).reshape(len(tip_mappings), parasite.size)
+    root_costs = _root_costs(
+        parasite,
+        host,
+        tip_hosts.T,
+        dup_cost,
+        transfer_cost,
+        loss_cost,
+        (len(tip_mappings),),
+    )
+    return root_costs.min(axis=-1)
+
+
+def _root_costs(
+    parasite, host, tip_hosts, dup_cost, transfer_cost, loss_cost, batch_shape
+) -> np.ndarray:
+    """
+    Fill the C and best_switch rows in parasite postorder, holding only the rows whose parent is not done yet
+    :return: the row of C of the parasite root
+    """
+    C = {}
+    best_switch = {}
+    for p in range(parasite.size):
+        C[p], _, best_switch[p] = _row_levels(
+            p,
+            parasite,
+            host,
+            tip_hosts,
+            C,
+            best_switch,
+            dup_cost,
+            transfer_cost,
+            loss_cost,
+            batch_shape,
+        )
+        if not parasite.is_tip[p]:
+            for child in (parasite.child1[p], parasite.child2[p]):
+                del C[child]
+                del best_switch[child]
+    return C[parasite.root]
+
+
+class DPBatch:
+    """
+    The cost tables of the DP for many cost settings of the same trees, filled in one pass. The trees are
+    indexed once, and every row holds all the settings along an extra axis, so C, O and best_switch have
+    shape (parasite edges, settings, host edges). The reconciliation graph of a setting is only built when
+    it is asked for, with the lazy reconstruction of DP.
+    """
+
+    def __init__(
+        self, tree_data: _ReconInput, cost_triples, host_index: HostTreeIndex = None
+    ):
+        """
+        :param tree_data <_ReconInput> - see recongraph_tools.DP
+        :param cost_triples - a list of (dup_cost, transfer_cost, loss_cost), or an array of shape (n, 3)
+        :param host_index <HostTreeIndex> - index of tree_data.host_dict to reuse, or None to build one
+        """
+        self.costs = np.asarray(cost_triples, dtype=float).reshape(-1, 3)
+        self._host = _host_tree_index(tree_data, host_index)
+        self._parasite = TreeIndex(tree_data.parasite_dict, "pTop")
+        self._tip_hosts = _tip_hosts(self._parasite, self._host, tree_data.tip_mapping)
+
+        shape = (self._parasite.size, len(self.costs), self._host.size)
+        self.C = np.full(shape, Infinity)
+        self.O = np.full(shape, Infinity)
+        self.best_switch = np.full(shape, Infinity)
+
+        # Columns of shape (n, 1), which broadcast against the rows of shape (n, host edges)
+        dup_cost, transfer_cost, loss_cost = np.hsplit(self.costs, 3)
+        for p in range(self._parasite.size):
+            self.C[p], self.O[p], self.best_switch[p] = _row_levels(
+                p,
+                self._parasite,
+                self._host,
+                self._tip_hosts,
+                self.C,
+                self.best_switch,
+                dup_cost,
+                transfer_cost,
+                loss_cost,
+                (len(self.costs),),
+            )
+
+    def __len__(self) -> int:
+        return len(self.costs)
+
+    def total_costs(self) -> np.ndarray:
+        """
+        :return: the cost of a maximum parsimony reconciliation for every setting
+        """
+        return self.C[self._parasite.root].min(axis=-1)
+
+    def result(self, k: int) -> Tuple[dict, float, int, list]:
+        """
+        :param k <int> - index of the cost setting
+        :return: what DP returns for the k-th cost setting
+        """
+        return _lazy_result(
+            self._parasite,
+            self._host,
+            self._tip_hosts,
+            self.C[:, k],
+            self.O[:, k],
+            self.best_switch[:, k],
+            tuple(self.costs[k].tolist()),
+        )
+
+
+def _lazy_result(parasite, host, tip_hosts, C, O, best_switch, costs):
+    """
+    The second phase of DP(lazy=True): build the reconciliation graph from the finished tables
+    :return: the graph, cost, number of MPRs and best roots, as returned by DP
+    """
+    with instrumentation.span("graph_build"):
+        tree_min = _find_best_roots(parasite, host, C)
+        dtl_recon_graph = _build_reachable_graph(
+            parasite, host, tip_hosts, C, O, best_switch, costs, tree_min
+        )
+        _count_graph(dtl_recon_graph)
+    mpr_count = recongraph_tools.count_mprs_wrapper(tree_min, dtl_recon_graph)
+    best_cost = C[parasite.root, host.vertex_id[tree_min[0][1]]].item()
+    return dtl_recon_graph, best_cost, mpr_count, tree_min
+
+
+def _count_graph(dtl_recon_graph: dict):
+    """
+    Set the counters of the graph_build span
+    """
+    instrumentation.count(
+        mapping_nodes=len(dtl_recon_graph),
+        events=sum(len(events) for events in dtl_recon_graph.values()),
+    )
+
+
+def _find_best_roots(parasite: TreeIndex, host: TreeIndex, C: np.ndarray) -> list:
+    """
+    recongraph_tools.find_best_roots on the C table: the mapping nodes of the parasite root with minimum cost,
+    in host postorder
+    """
+    root_costs = C[parasite.root]
+    finite = np.flatnonzero(root_costs != Infinity)
+    min_score = root_costs[finite].min()
+    vp = parasite.vertices[parasite.root]
+    return [
+        (vp, host.vertices[h]) for h in finite[root_costs[finite] == min_score].tolist()
+    ]
+
+
+def _build_reachable_graph(
+    parasite, host, tip_hosts, C, O, best_switch, costs, best_roots
+) -> dict:
+    """
+    recongraph_tools.build_dtl_recon_graph, with the events of each mapping node derived from the cost tables
+    when the node is first reached. The traversal visits nodes in the same order as that recursive function,
+    so the graph has the same order of keys.
+    """
+    rows = {}
+
+    def events(mapping_node):
+        vp, vh = mapping_node
+        p = parasite.vertex_id[vp]
+        if p not in rows:
+            rows[p] = _RowEvents(
+                p, parasite, host, tip_hosts, C, O, best_switch, costs, False
+            )
+        return rows[p].events(host.vertex_id[vh])
+
+    def children(event_list):
+        for event in event_list:
+            for location in event:
+                if type(location) is tuple and location != (None, None):
+                    yield location
+
+    graph = {}
+    for root in best_roots:
+        if root in graph:
+            continue
+        graph[root] = events(root)
+        stack = [children(graph[root])]
+        while stack:
+            mapping_node = next(stack[-1], None)
+            if mapping_node is None:
+                stack.pop()
+            elif mapping_node not in graph:
+                graph[mapping_node] = events(mapping_node)
+                stack.append(children(graph[mapping_node]))
+    return graph
+
+
+def _host_name(host: TreeIndex, h: int):
+    """
+    :return: the name of host vertex h, or None for the placeholder location of the host root
+    """
+    return host.vertices[h] if h >= 0 else None
@@ -0,0 +1,563 @@
+# compact_graph.py
+# A reconciliation graph stored in flat integer arrays
+
+# The reconciliation graphs of recongraph_tools.py are dictionaries from mapping nodes (parasite, host) to lists of
+# events (type, child mapping node 1, child mapping node 2), where every mapping node is a tuple of two strings and
+# every event a tuple of a string and two tuples. A CompactReconGraph stores the same graph in the style of a
+# compressed sparse row matrix:
+#
+#   parasite_names, host_names - name tables, in order of first appearance
+#   node_parasite, node_host   - for every mapping node id, the ids of its parasite and host names
+#   event_offsets              - the events of mapping node i are the events event_offsets[i] to event_offsets[i+1] - 1
+#   event_types                - the type of every event, as an index into EVENT_TYPES
+#   event_children             - the ids of the two child mapping nodes of every event, NO_NODE for (None, None)
+#
+# The mapping nodes that are keys of the graph get the ids 0 to n_nodes - 1, in the order of the keys. Mapping nodes
+# that are children of events without being keys of the graph (which is never the case for the graphs built by DP)
+# get the ids after them. An event takes 9 bytes and a mapping node 16, the names being shared with the trees.
+#
+# Algorithms that only follow events, like counting MPRs or computing frequencies, run on the arrays directly.
+# The other algorithms take the graph in the legacy format: as_dict returns a read-only mapping that builds the
+# events of a mapping node when they are looked up, and to_dict builds a full dictionary.
+#
+# A graph is saved to a single binary file:
+#
+#   _MAGIC | format version (uint32) | 0 (uint32) | header length (uint64) | header | arrays
+#
+# The header is UTF-8 JSON holding the name tables, the metadata, and the dtype, shape and offset of every array.
+# Every array starts at a multiple of _ALIGNMENT bytes, in little-endian byte order, so load can memory-map the
+# arrays instead of reading them: opening a large graph is instant, and processes that load the same file share
+# its pages.
+
+import json
+from collections.abc import Mapping
+from typing import List, Tuple
+
+import numpy as np
+
+# The event types, in the order of their codes in event_types
+EVENT_TYPES = ("S", "D", "T", "L", "C")
+_EVENT_CODE = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+
+# The id of the (None, None) mapping node that losses and tip mappings lead to
+NO_NODE = -1
+
+# On-disk format (see the top of this file). FORMAT_VERSION is increased whenever the layout changes.
+FORMAT_VERSION = 1
+_MAGIC = b"EMPRESSG"
+_ALIGNMENT = 64
+_ARRAYS = (
+    "node_parasite",
+    "node_host",
+    "event_offsets",
+    "event_types",
+    "event_children",
+    "roots",
+    "event_frequencies",
+)
+
+
+class CompactReconGraph:
+    """
+    A reconciliation graph whose mapping nodes are integer ids and whose events are stored in flat arrays
+    (see the top of this file).
+    """
+
+    def __init__(
+        self,
+        parasite_names: list,
+        host_names: list,
+        node_parasite: np.ndarray,
+        node_host: np.ndarray,
+        event_offsets: np.ndarray,
+        event_types: np.ndarray,
+        event_children: np.ndarray,
+        roots: np.ndarray = None,
+        event_frequencies: np.ndarray = None,
+    ):
+        """
+        :param parasite_names <list>        - parasite vertex names
+        :param host_names <list>            - host vertex names
+        :param node_parasite <np.ndarray>   - index into parasite_names of the parasite of every mapping node
+        :param node_host <np.ndarray>       - index into host_names of the host of every mapping node
+        :param event_offsets <np.ndarray>   - n_nodes + 1 offsets into the event arrays
+        :param event_types <np.ndarray>     - index into EVENT_TYPES of every event
+        :param event_children <np.ndarray>  - n_events x 2 array of child mapping node ids
+        :param roots <np.ndarray>           - ids of the mapping nodes that can be the root of an MPR
+        :param event_frequencies <np.ndarray> - optional frequency of every event, NaN where unknown
+        """
+        self.parasite_names = parasite_names
+        self.host_names = host_names
+        self.node_parasite = node_parasite
+        self.node_host = node_host
+        self.event_offsets = event_offsets
+        self.event_types = event_types
+        self.event_children = event_children
+        self.roots = np.zeros(0, dtype=np.int32) if roots is None else np.asarray(roots)
+        self.event_frequencies = event_frequencies
+        self.n_nodes = len(event_offsets) - 1
+        # The file the arrays are memory-mapped from, if any
+        self.path = None
+        self._node_id = None
+        self._postorder = None
+
+    def __getstate__(self) -> dict:
+        # A memory-mapped graph is sent to other processes as its file name, and mapped again there
+        if self.path is not None:
+            return {"path": self.path}
+        return self.__dict__
+
+    def __setstate__(self, state: dict):
+        if "path" in state and len(state) == 1:
+            state = CompactReconGraph.load(state["path"]).__dict__
+        self.__dict__.update(state)
+
+    @classmethod
+    def from_dict(cls, recon_graph: dict, roots: list = None) -> "CompactReconGraph":
+        """
+        :param recon_graph <dict>   - reconciliation graph in the format of recongraph_tools.DP
+        :param roots <list>         - mapping nodes that can be the root of an MPR. By default, the mapping nodes
+            of recon_graph whose parasite is not the child of any event, i.e. those of the parasite root
+        :return: the same graph as a CompactReconGraph. The names are shared with recon_graph, not copied.
+        """
+        node_id = {mapping_node: i for i, mapping_node in enumerate(recon_graph)}
+        n_events = sum(len(events) for events in recon_graph.values())
+        event_types = np.empty(n_events, dtype=np.uint8)
+        event_children = np.empty((n_events, 2), dtype=np.int32)
+        event_offsets = np.empty(len(node_id) + 1, dtype=np.int64)
+        event_offsets[0] = 0
+
+        def child_id(mapping_node):
+            if mapping_node == (None, None):
+                return NO_NODE
+            if mapping_node not in node_id:
+                node_id[mapping_node] = len(node_id)
+            return node_id[mapping_node]
+
+        e = 0
+        for i, events in enumerate(recon_graph.values()):
+            for event in events:
+                event_types[e] = _EVENT_CODE[event[0]]
+                event_children[e, 0] = child_id(event[1])
+                event_children[e, 1] = child_id(event[2])
+                e += 1
+            event_offsets[i + 1] = e
+
+        if roots is None:
+            child_parasites = {
+                child[0]
+                for events in recon_graph.values()
+                for event in events
+                for child in event[1:3]
+            }
+            roots = [
+                mapping_node
+                for mapping_node in recon_graph
+                if mapping_node[0] not in child_parasites
+            ]
+
+        parasite_id = {}
+        host_id = {}
+        node_parasite = np.empty(len(node_id), dtype=np.int32)
+        node_host = np.empty(len(node_id), dtype=np.int32)
+        for i, (parasite, host) in enumerate(node_id):
+            node_parasite[i] = parasite_id.setdefault(parasite, len(parasite_id))
+            node_host[i] = host_id.setdefault(host, len(host_id))
+
+        return cls(
+            list(parasite_id),
+            list(host_id),
+            node_parasite,
+            node_host,
+            event_offsets,
+            event_types,
+            event_children,
+            np.array([node_id[root] for root in roots], dtype=np.int32),
+        )
+
+    def __len__(self) -> int:
+        return self.n_nodes
+
+    @property
+    def n_events(self) -> int:
+        return len(self.event_types)
+
+    def save(self, path: str, metadata: dict = None):
+        """
+        Save self to path in the binary format described at the top of this file
+        :param path <str>       - name of the file to write
+        :param metadata <dict>  - JSON-serializable book-keeping information, returned by read_metadata
+        """
+        arrays = {}
+        for name in _ARRAYS:
+            array = getattr(self, name)
+            if array is not None:
+                array = np.asarray(array)
+                arrays[name] = np.ascontiguousarray(
+                    array, dtype=array.dtype.newbyteorder("<")
+                )
+
+        # The offsets of the arrays depend on the length of the header, which contains them, so they are
+        # counted from the aligned end of the header
+        array_specs = {}
+        offset = 0
+        for name, array in arrays.items():
+            array_specs[name] = {
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset,
+            }
+            offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+        header = json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "metadata": metadata or {},
+                "parasite_names": self.parasite_names,
+                "host_names": self.host_names,
+                "arrays": array_specs,
+            }
+        ).encode("utf-8")
+        data_start = _data_start(len(header))
+
+        with open(path, "wb") as graph_file:
+            graph_file.write(_MAGIC)
+            graph_file.write(np.array([FORMAT_VERSION, 0], dtype="<u4").tobytes())
+            graph_file.write(np.array([len(header)], dtype="<u8").tobytes())
+            graph_file.write(header)
+            for name, array in arrays.items():
+                graph_file.seek(data_start + array_specs[name]["offset"])
+                graph_file.write(array.tobytes())
+            graph_file.truncate(data_start + offset)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompactReconGraph":
+        """
+        Load a graph saved with save
+        :param path <str>    - name of the file to read
+        :param mmap <bool>   - memory-map the arrays read-only instead of reading them into memory
+        :return: the CompactReconGraph saved in path
+        """
+        header = _read_header(path)
+        data_start = _data_start(header["length"])
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape))
+            offset = data_start + spec["offset"]
+            if mmap and count > 0:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode="r", offset=offset, shape=shape
+                )
+            else:
+                arrays[name] = np.fromfile(
+                    path, dtype=dtype, count=count, offset=offset
+                ).reshape(shape)
+        graph = cls(header["parasite_names"], header["host_names"], **arrays)
+        if mmap:
+            graph.path = path
+        return graph
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes taken by the arrays (the name tables are shared with the trees)
+        """
+        return sum(
+            array.nbytes
+            for array in (
+                self.node_parasite,
+                self.node_host,
+                self.event_offsets,
+                self.event_types,
+                self.event_children,
+                self.roots,
+            )
+        )
+
+    def mapping_node(self, i: int) -> tuple:
+        """
+        :return: the (parasite, host) mapping node with id i, or (None, None) for NO_NODE
+        """
+        if i == NO_NODE:
+            return None, None
+        return (
+            self.parasite_names[self.node_parasite[i]],
+            self.host_names[self.node_host[i]],
+        )
+
+    def node_id(self, mapping_node: tuple) -> int:
+        """
+        :return: the id of a (parasite, host) mapping node, NO_NODE for (None, None)
+        """
+        if mapping_node == (None, None):
+            return NO_NODE
+        if self._node_id is None:
+            self._node_id = {
+                self.mapping_node(i): i for i in range(len(self.node_parasite))
+            }
+        return self._node_id[mapping_node]
+
+    def events(self, i: int) -> list:
+        """
+        :return: the events of mapping node i, in the format of recongraph_tools.DP
+        """
+        start, stop = self.event_offsets[i], self.event_offsets[i + 1]
+        return [
+            (
+                EVENT_TYPES[event_type],
+                self.mapping_node(child1),
+                self.mapping_node(child2),
+            )
+            for event_type, (child1, child2) in zip(
+                self.event_types[start:stop].tolist(),
+                self.event_children[start:stop].tolist(),
+            )
+        ]
+
+    def as_dict(self) -> "ReconGraphView":
+        """
+        :return: a read-only view of self in the format of recongraph_tools.DP, which builds events on lookup
+        """
+        return ReconGraphView(self)
+
+    def to_dict(self) -> dict:
+        """
+        :return: self in the format of recongraph_tools.DP
+        """
+        return {self.mapping_node(i): self.events(i) for i in range(self.n_nodes)}
+
+    def root_nodes(self) -> list:
+        """
+        :return: the roots as (parasite, host) mapping nodes
+        """
+        return [self.mapping_node(i) for i in self.roots.tolist()]
+
+    def postorder(self) -> List[int]:
+        """
+        :return: the ids of the mapping nodes that are keys of the graph, every node after all of its children
+        """
+        if self._postorder is None:
+            offsets = self.event_offsets.tolist()
+            children = self.event_children.tolist()
+            visited = [False] * self.n_nodes
+            order = []
+            for start in range(self.n_nodes):
+                if visited[start]:
+                    continue
+                visited[start] = True
+                stack = [(start, offsets[start])]
+                while stack:
+                    i, e = stack[-1]
+                    if e == offsets[i + 1]:
+                        stack.pop()
+                        order.append(i)
+                        continue
+                    stack[-1] = (i, e + 1)
+                    for child in children[e]:
+                        if 0 <= child < self.n_nodes and not visited[child]:
+                            visited[child] = True
+                            stack.append((child, offsets[child]))
+            self._postorder = order
+        return self._postorder
+
+    def counts(self) -> Tuple[list, list]:
+        """
+        :return: the number of MPRs below every mapping node and every event, as python ints (which do not
+            overflow). Mapping nodes that are not keys of the graph count as one MPR, like (None, None).
+        """
+        offsets = self.event_offsets.tolist()
+        children = self.event_children.tolist()
+        node_counts = [1] * len(self.node_parasite)
+        event_counts = [0] * self.n_events
+        for i in self.postorder():
+            count = 0
+            for e in range(offsets[i], offsets[i + 1]):
+                child1, child2 = children[e]
+                event_counts[e] = (node_counts[child1] if child1 >= 0 else 1) * (
+                    node_counts[child2] if child2 >= 0 else 1
+                )
+                count += event_counts[e]
+            node_counts[i] = count
+        return node_counts, event_counts
+
+    def count_mprs(self, roots: list = None) -> int:
+        """
+        Same as recongraph_tools.count_mprs_wrapper
+        :param roots <list> - ids of the root mapping nodes, self.roots by default
+        :return: the number of MPRs
+        """
+        if roots is None:
+            roots = self.roots.tolist()
+        node_counts, _ = self.counts()
+        return sum(node_counts[i] for i in roots)
+
+    def frequencies(self, normalize: bool = True) -> Tuple[list, list, int]:
+        """
+        The frequencies of median.generate_frequencies_dict, by mapping node id and event index instead of by
+        mapping node and event. As there, the mapping nodes of the parasite root start with their number of MPRs.
+        :param normalize <bool> - whether to divide the frequencies by the number of MPRs
+        :return: the frequency of every mapping node, the frequency of every event, and the number of MPRs
+        """
+        node_counts, event_counts = self.counts()
+        offsets = self.event_offsets.tolist()
+        children = self.event_children.tolist()
+        root_parasites = set(self.node_parasite[self.roots].tolist())
+        node_parasite = self.node_parasite.tolist()
+        count = sum(
+            node_counts[i]
+            for i in range(self.n_nodes)
+            if node_parasite[i] in root_parasites
+        )
+        if count == 0:
+            raise ValueError("The graph has no MPR from its roots")
+
+        node_frequencies = [0.0] * len(self.node_parasite)
+        event_frequencies = [0.0] * self.n_events
+        for i in reversed(self.postorder()):
+            if node_parasite[i] in root_parasites:
+                node_frequencies[i] = node_counts[i]
+            multiplier = float(node_frequencies[i]) / node_counts[i]
+            for e in range(offsets[i], offsets[i + 1]):
+                event_frequencies[e] = multiplier * event_counts[e]
+                for child in children[e]:
+                    if child >= 0:
+                        node_frequencies[child] += event_frequencies[e]
+
+        if normalize:
+            node_frequencies = [
+                frequency / float(count) for frequency in node_frequencies
+            ]
+            event_frequencies = [
+                frequency / float(count) for frequency in event_frequencies
+            ]
+        return node_frequencies, event_frequencies, count
+
+    def union(self, other: "CompactReconGraph") -> "CompactReconGraph":
+        """
+        Same as cluster_util.graph_union: the mapping nodes of self followed by the new mapping nodes of other,
+        each with its events in self followed by its new events in other
+        :return: the union of self and other
+        """
+        graphs = (self, other)
+        # Mapping nodes that are keys of either graph come before the other mapping nodes
+        union_id = {}
+        for graph in graphs:
+            for i in range(graph.n_nodes):
+                union_id.setdefault(graph.mapping_node(i), len(union_id))
+        n_nodes = len(union_id)
+        for graph in graphs:
+            for i in range(graph.n_nodes, len(graph.node_parasite)):
+                union_id.setdefault(graph.mapping_node(i), len(union_id))
+
+        node_events = [dict() for _ in range(n_nodes)]
+        for graph in graphs:
+            ids = [
+                union_id[graph.mapping_node(i)] for i in range(len(graph.node_parasite))
+            ]
+            offsets = graph.event_offsets.tolist()
+            types = graph.event_types.tolist()
+            children = graph.event_children.tolist()
+            for i in range(graph.n_nodes):
+                events = node_events[ids[i]]
+                for e in range(offsets[i], offsets[i + 1]):
+                    child1, child2 = children[e]
+                    event = (
+                        types[e],
+                        ids[child1] if child1 >= 0 else NO_NODE,
+                        ids[child2] if child2 >= 0 else NO_NODE,
+                    )
+                    events.setdefault(event, None)
+
+        parasite_id = {}
+        host_id = {}
+        node_parasite = np.empty(len(union_id), dtype=np.int32)
+        node_host = np.empty(len(union_id), dtype=np.int32)
+        for i, (parasite, host) in enumerate(union_id):
+            node_parasite[i] = parasite_id.setdefault(parasite, len(parasite_id))
+            node_host[i] = host_id.setdefault(host, len(host_id))
+        event_offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+        event_offsets[1:] = np.cumsum([len(events) for events in node_events])
+        event_array = np.array(
+            [event for events in node_events for event in events], dtype=np.int32
+        ).reshape(-1, 3)
+        roots = dict.fromkeys(
+            union_id[graph.mapping_node(i)]
+            for graph in graphs
+            for i in graph.roots.tolist()
+        )
+        return CompactReconGraph(
+            list(parasite_id),
+            list(host_id),
+            node_parasite,
+            node_host,
+            event_offsets,
+            event_array[:, 0].astype(np.uint8),
+            np.ascontiguousarray(event_array[:, 1:]),
+            np.array(list(roots), dtype=np.int32),
+        )
+
+
+def read_metadata(path: str) -> dict:
+    """
+    :param path <str> - name of a file written by CompactReconGraph.save
+    :return: the metadata saved with the graph
+    """
+    return _read_header(path)["metadata"]
+
+
+def _data_start(header_length: int) -> int:
+    """
+    :return: the position of the first array in a file whose header is header_length bytes long
+    """
+    end = len(_MAGIC) + 16 + header_length
+    return -(-end // _ALIGNMENT) * _ALIGNMENT
+
+
+def _read_header(path: str) -> dict:
+    """
+    :return: the header of a file written by CompactReconGraph.save, with its length as "length"
+    """
+    with open(path, "rb") as graph_file:
+        if graph_file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("%s is not a saved reconciliation graph" % path)
+        version, _ = np.frombuffer(graph_file.read(8), dtype="<u4").tolist()
+        if version > FORMAT_VERSION:
+            raise ValueError(
+                "%s has format version %d, but only versions up to %d can be read"
+                % (path, version, FORMAT_VERSION)
+            )
+        (length,) = np.frombuffer(graph_file.read(8), dtype="<u8").tolist()
+        header = json.loads(graph_file.read(length).decode("utf-8"))
+    header["length"] = length
+    return header
+
+
+class ReconGraphView(Mapping):
+    """
+    A read-only view of a CompactReconGraph in the format of recongraph_tools.DP. The events of a mapping node
+    are built each time they are looked up.
+    """
+
+    def __init__(self, graph: CompactReconGraph):
+        self.graph = graph
+
+    def __getitem__(self, mapping_node: tuple) -> list:
+        i = self.graph.node_id(mapping_node)
+        if not 0 <= i < self.graph.n_nodes:
+            raise KeyError(mapping_node)
+        return self.graph.events(i)
+
+    def __iter__(self):
+        for i in range(self.graph.n_nodes):
+            yield self.graph.mapping_node(i)
+
+    def __len__(self) -> int:
+        return self.graph.n_nodes
+
+    def __contains__(self, mapping_node) -> bool:
+        try:
+            i = self.graph.node_id(mapping_node)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return 0 <= i < self.graph.n_nodes
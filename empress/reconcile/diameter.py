@@ -59,6 +59,10 @@
 #   exit_table_a) or uB (for exit_table_b) leads to an exit event. This table is two tables, rather than one, to allow
 #   for the generalization of the Diameter algorithm to work on any pair of reconciliation graphs based on the same
 #   species tree and gene tree.
+#
+#   The exit tables of u are only read while computing enter_table[u], and enter_table[u] is only read while computing
+#   the enter table of the parent of u. So, following the postorder of the gene tree, the tables of a gene node are
+#   freed as soon as they have been read (except in debug mode, which prints the exit tables at the end).
 
 
 # DATA STRUCTURE QUICK REFERENCE:
@@ -92,12 +96,16 @@ from collections import OrderedDict
 from itertools import product
 import sys
 
+from empress import instrumentation
+from empress.reconcile import recongraph_tools
+from empress.reconcile.tree_index import ancestry_relation
+
 
 def reformat_tree(tree, root):
     """
-    A recursive function that changes the format of a (species or gene) tree from edge to vertex, as described
-    above. It returns the tree (in postorder), the root of the tree, and the number of nodes in the tree. The base
-    case of this function is when there are no children for a given root.
+    A function that changes the format of a (species or gene) tree from edge to vertex, as described
+    above. It returns the tree (in postorder), the root of the tree, and the number of nodes in the tree. The edges
+    are visited with recongraph_tools.postorder, which does not recurse, so deep trees are handled in linear time.
     :param tree <dict>                 - a tree in edge format
     :param root <str> | <tuple>        - the root of that tree
     :return                            0 <dict> - the new vertex based tree,
@@ -108,36 +116,23 @@ def reformat_tree(tree, root):
     # This line catches the "xTop" handle and replaces
     new_root = root[1] if isinstance(root, tuple) else tree[root][1]
 
-    child1 = (
-        tree[root][2][1] if tree[root][2] is not None else None
-    )  # These lines handle the leaves, where
-    child2 = (
-        tree[root][3][1] if tree[root][3] is not None else None
-    )  # there is None in the place of a tuple
-
-    # This is the tree that we will be returning. We will add the subtrees of our children first, then add this node.
+    # This is the tree that we will be returning. Every node is added after the subtrees of its children.
     new_vertex_tree = (
         OrderedDict()
     )  # This has to be an OrderedDict, otherwise we can't guarantee it's in postorder
 
-    # This is the number of nodes in the subtree rooted at each of our children
-    # We actually don't need to calculate this here at all, since the count will just be the length of new_vertex_tree
-    child1_count = 0
-    child2_count = 0
-
-    if (
-        child1 is not None
-    ):  # If this node has children, then we need to add their children's subtrees to the dict
-        child1_tree, _, child1_count = reformat_tree(tree, tree[root][2])
-        new_vertex_tree.update(child1_tree)
-    if child2 is not None:
-        child2_tree, _, child2_count = reformat_tree(tree, tree[root][3])
-        new_vertex_tree.update(child2_tree)
-    new_vertex_tree.update(
-        {new_root: (child1, child2)}
-    )  # We add this node last, to ensure postorderness.
+    node_count = 0
+    for edge in recongraph_tools.postorder(tree, root):
+        _, vertex, child1_edge, child2_edge = tree[edge]
+        if edge == root:
+            vertex = new_root
+        # These lines handle the leaves, where there is None in the place of a tuple
+        child1 = child1_edge[1] if child1_edge is not None else None
+        child2 = child2_edge[1] if child2_edge is not None else None
+        new_vertex_tree[vertex] = (child1, child2)
+        node_count += 1
 
-    return new_vertex_tree, new_root, (child1_count + child2_count + 1)
+    return new_vertex_tree, new_root, node_count
 
 
 def intersect_cost(event):
@@ -171,7 +166,8 @@ def calculate_ancestral_table(species_tree):
     as keys vertices of the tree (again) and values which are strings,
     representing how the first index relates to the second (see below
     for info on what certain strings mean). It creates these dictionaries
-    by traversing the tree.
+    by traversing the tree. It takes O(V^2) time and memory, so diameter_algorithm answers
+    the same queries with tree_index.ancestry_relation instead.
     """
 
     # Initialize the ancestral table which we will be returning
@@ -485,16 +481,16 @@ def make_group_dict(gene_tree, dtl_recon_graph, postorder_species_nodes):
     :return <dict>                          - a dict keyed by gene node, where the values are the lists of mapping nodes for that
                                               gene node
     """
-    postorder_group = {}
-    for u in gene_tree:
-        # First we make the dictionary only contain nodes that have this gene node
-        postorder_group[u] = [mapping for mapping in dtl_recon_graph if mapping[0] == u]
-        # Then we sort the dictionary into postorder, using the species node's index in the postorder species list as a
-        # guide.
-        postorder_group[u] = sorted(
-            postorder_group[u],
-            key=lambda mapping: postorder_species_nodes.index(mapping[1]),
-        )
+    # First we make the dictionary only contain nodes that have this gene node
+    postorder_group = {u: [] for u in gene_tree}
+    for mapping in dtl_recon_graph:
+        if mapping[0] in postorder_group:
+            postorder_group[mapping[0]].append(mapping)
+    # Then we sort the dictionary into postorder, using the species node's index in the postorder species list as a
+    # guide.
+    species_position = {species: i for i, species in enumerate(postorder_species_nodes)}
+    for u in postorder_group:
+        postorder_group[u].sort(key=lambda mapping: species_position[mapping[1]])
     return postorder_group
 
 
@@ -506,6 +502,7 @@ def diameter_algorithm(
     dtl_recon_graph_b,
     debug,
     zero_loss,
+    species_index=None,
 ):
     """
     This function finds the diameter of a reconciliation graph, as measured by the largest symmetric set difference
@@ -520,6 +517,7 @@ def diameter_algorithm(
     :param dtl_recon_graph_b <dict>   - the other reconciliation graph. Both must share the same species and gene trees.
     :param debug <bool>               - whether or not to print out pretty tables
     :param zero_loss <bool>           - whether losses should count at all
+    :param species_index <HostTreeIndex> - index of the species tree to reuse (see tree_index.py), or None
     :return <int>                     - the diameter of the reconciliation.
     """
 
@@ -532,15 +530,26 @@ def diameter_algorithm(
         gene_tree, dtl_recon_graph_b, postorder_species_nodes
     )
 
-    ancestral_table = calculate_ancestral_table(species_tree)
+    # Ancestry queries in O(1), from the Euler tour of the index of the species tree if there is one
+    if species_index is not None:
+        species_index.check_vertex_tree(species_tree)
+        relation = species_index.relation
+    else:
+        relation = ancestry_relation(species_tree)
 
     if debug:
+        ancestral_table = {
+            A: {B: relation(A, B) for B in species_tree} for A in species_tree
+        }
         print_table_nicely(ancestral_table, ", ", "Ancestral", "literal")
 
     exit_table_a = {}
     exit_table_b = {}
 
     enter_table = {}
+    # Number of entries of the tables that are not freed yet, with its peak (see 4. above)
+    table_entries = 0
+    peak_table_entries = 0
 
     for u in postorder_gene_nodes:
         enter_table[u] = {}
@@ -562,8 +571,8 @@ def diameter_algorithm(
                     dtl_recon_graph_b,
                 )
 
-                # Look up ancestry string in the precomputed table (indexed by the species nodes of the mapping nodes)
-                ancestry = ancestral_table[uA[1]][uB[1]]
+                # How the species nodes of the mapping nodes relate to each other
+                ancestry = relation(uA[1], uB[1])
 
                 uA_loss_events = [
                     event
@@ -633,7 +642,7 @@ def diameter_algorithm(
                     )
                 else:
                     raise ValueError(
-                        "Invalid ancestry type '{0}', check calculate_ancestral_table().".format(
+                        "Invalid ancestry type '{0}', check the ancestry relation.".format(
                             ancestry
                         )
                     )
@@ -648,6 +657,20 @@ def diameter_algorithm(
         if debug:
             print_table_nicely(enter_table[u], ", ", "EnterTable({0})".format(u))
 
+        table_entries += sum(len(row) for row in enter_table[u].values())
+        for exit_table in (exit_table_a, exit_table_b):
+            table_entries += sum(len(row) for row in exit_table[u].values())
+        peak_table_entries = max(peak_table_entries, table_entries)
+        if not debug:
+            for exit_table in (exit_table_a, exit_table_b):
+                table_entries -= sum(len(row) for row in exit_table.pop(u).values())
+            for child in gene_tree[u]:
+                if child is not None:
+                    table_entries -= sum(
+                        len(row) for row in enter_table.pop(child).values()
+                    )
+
+    instrumentation.count(peak_table_entries=peak_table_entries)
     if debug:
         print("Exit Table A: {0}".format(exit_table_a))
         print("")
@@ -33,7 +33,10 @@ from empress.reconcile import recongraph_tools, diameter
 
 
 def mapping_node_sort(
-    ordered_gene_node_list, ordered_species_node_list, mapping_node_list
+    ordered_gene_node_list,
+    ordered_species_node_list,
+    mapping_node_list,
+    species_index=None,
 ):
     """
     :param ordered_gene_node_list: an ordered dictionary of the gene nodes, where each key is a node
@@ -42,6 +45,8 @@ def mapping_node_sort(
     return mapping nodes sorted in preorder. The species and gene orderings must match.
     :param ordered_species_node_list: same as for the gene node list above, except for the species tree
     :param mapping_node_list: a list of all mapping nodes within a given reconciliation graph
+    :param species_index: HostTreeIndex of the species tree (see tree_index.py), whose postorder numbering
+    is used instead of ordered_species_node_list, which may then be None
     :return: the given mapping nodes except sorted in the order corresponding to the order in which
     the species and gene nodes are passed in (see description of ordered_gene_node_list for more on this).
     The returned mapping node list is sorted first by gene node and then by species node
@@ -50,7 +55,11 @@ def mapping_node_sort(
     # In order to sort the mapping nodes, we need a way to convert them into numbers. These two lookup tables allow
     # us to achieve a lexicographical ordering with gene nodes more significant than species nodes.
     gene_level_lookup = {}
-    species_level_lookup = {}
+    if species_index is not None:
+        ordered_species_node_list = species_index.vertices
+        species_level_lookup = species_index.vertex_id
+    else:
+        species_level_lookup = {}
 
     # By multiplying the gene node keys by the number of species nodes, we can ensure that a mapping node with a later
     # gene node always comes before one with a later species node, because a gene node paired with the last species
@@ -60,8 +69,9 @@ def mapping_node_sort(
     for i1, gene_node in enumerate(ordered_gene_node_list):
         gene_level_lookup[gene_node] = i1 * gene_multiplier
 
-    for i2, species_node in enumerate(ordered_species_node_list):
-        species_level_lookup[species_node] = i2
+    if species_index is None:
+        for i2, species_node in enumerate(ordered_species_node_list):
+            species_level_lookup[species_node] = i2
 
     # The lambda function looks up the level of both the gene node and the species nodes and adds them together to
     # get a number to give to the sorting algorithm for that mapping node. The gene node is weighted far more heavily
@@ -142,41 +152,55 @@ def count_mprs(mapping_node, recon_graph, counts):
     for the parasite tree onto a node of the host tree, in the format
     (p, h), where p is the parasite node and h is the host node
     :param recon_graph: The reconciliation graph whose events we want to compute the corresponding frequencies
-    :param counts: a dictionary representing the running memo that is passed
-    down recursive calls of this function. At first it is just an empty
-    dictionary (see above function), but as it gets passed down calls, it collects
+    :param counts: a dictionary representing the running memo that is shared
+    between calls of this function. At first it is just an empty
+    dictionary (see above function), but as it gets passed along, it collects
     keys of mapping nodes or event nodes and values of MPR counts. This memo improves runtime
     of the algorithm
     :return: the number of MPRs spawned below the given mapping node in the graph
     """
 
-    # Search the counts dictionary for previously calculated results (this is the memoization)
-    if mapping_node in counts:
-        return counts[mapping_node]
-
-    # Base case, occurs if being called on a child produced by a loss or contemporary event
-    if mapping_node == (None, None):
-        return 1
-
-    # Initialize a variable to keep count of the number of MPRs
-    count = 0
-
-    # Loop over all event nodes corresponding to the current mapping node
-    for eventNode in recon_graph[mapping_node]:
-        # Save the children produced by the current event
-        mapping_child1 = eventNode[1]
-        mapping_child2 = eventNode[2]
-
-        # Add the product of the counts of both children (over all children) for this event to get the parent's count
-        counts[eventNode] = count_mprs(
-            mapping_child1, recon_graph, counts
-        ) * count_mprs(mapping_child2, recon_graph, counts)
-        count += counts[eventNode]
-
-    # Save the result in the counts
-    counts[mapping_node] = count
-
-    return count
+    def count_node(node):
+        # Yields the children whose counts are needed, and is sent their counts back
+        count = 0
+
+        # Loop over all event nodes corresponding to the current mapping node
+        for eventNode in recon_graph[node]:
+            # Add the product of the counts of both children (over all children) for this event to get the
+            # parent's count
+            child1_count = yield eventNode[1]
+            child2_count = yield eventNode[2]
+            counts[eventNode] = child1_count * child2_count
+            count += counts[eventNode]
+
+        # Save the result in the counts
+        counts[node] = count
+        return count
+
+    # The stack holds one count_node per mapping node on the current path, so the counts are filled in the
+    # same order as a recursive depth-first search without being limited by the recursion depth
+    stack = []
+    request = mapping_node
+    while True:
+        # Search the counts dictionary for previously calculated results (this is the memoization)
+        if request in counts:
+            result = counts[request]
+        # Base case, occurs if being called on a child produced by a loss or contemporary event
+        elif request == (None, None):
+            result = 1
+        else:
+            stack.append(count_node(request))
+            request = next(stack[-1])
+            continue
+        while True:
+            if not stack:
+                return result
+            try:
+                request = stack[-1].send(result)
+                break
+            except StopIteration as done:
+                stack.pop()
+                result = done.value
 
 
 def calculate_event_frequencies_for_children(
@@ -387,34 +411,34 @@ def choose_random_median(median_recon, map_node, count_dict):
     # Initialize the dictionary that will store the final single-path median that we choose
     random_submedian = dict()
 
-    # Find the total number of medians we can get from the current mapping node
-    total_meds = float(count_dict[map_node])
-
-    # Use a convoluted numpy workaround to select tuples (events) from a list, taking into account
-    # how many medians each event can produce
-    next_event = median_recon[map_node][
-        np.random.choice(
-            len(median_recon[map_node]),
-            p=[count_dict[event] / total_meds for event in median_recon[map_node]],
-        )
-    ]
+    # The mapping nodes are visited in preorder with an explicit stack, so the events are drawn in the same
+    # order as a recursive traversal would draw them
+    stack = [map_node]
+    while stack:
+        map_node = stack.pop()
+
+        # Find the total number of medians we can get from the current mapping node
+        total_meds = float(count_dict[map_node])
+
+        # Use a convoluted numpy workaround to select tuples (events) from a list, taking into account
+        # how many medians each event can produce
+        next_event = median_recon[map_node][
+            np.random.choice(
+                len(median_recon[map_node]),
+                p=[count_dict[event] / total_meds for event in median_recon[map_node]],
+            )
+        ]
 
-    random_submedian.update({map_node: [next_event]})
+        random_submedian[map_node] = [next_event]
 
-    # Check for a loss
-    if next_event[0] == "L":
-        random_submedian.update(
-            choose_random_median(median_recon, next_event[1], count_dict)
-        )
+        # Check for a loss
+        if next_event[0] == "L":
+            stack.append(next_event[1])
 
-    # Check for events that produce two children
-    elif next_event[0] in ["T", "S", "D"]:
-        random_submedian.update(
-            choose_random_median(median_recon, next_event[1], count_dict)
-        )
-        random_submedian.update(
-            choose_random_median(median_recon, next_event[2], count_dict)
-        )
+        # Check for events that produce two children
+        elif next_event[0] in ["T", "S", "D"]:
+            stack.append(next_event[2])
+            stack.append(next_event[1])
 
     # Make sure our single path median is indeed a subgraph of the median
     assert check_subgraph(median_recon, random_submedian), (
@@ -434,11 +458,20 @@ def usage():
 
 
 def get_median_graph(
-    recon_graph, postorder_gene_tree, postorder_species_tree, gene_tree_root, best_roots
+    recon_graph,
+    postorder_gene_tree,
+    postorder_species_tree,
+    gene_tree_root,
+    best_roots,
+    species_index=None,
 ):
-    # Get a list of the mapping nodes in preorder
+    # Get a list of the mapping nodes in preorder. A species_index replaces postorder_species_tree
+    # (see mapping_node_sort)
     postorder_mapping_node_list = mapping_node_sort(
-        postorder_gene_tree, postorder_species_tree, list(recon_graph.keys())
+        postorder_gene_tree,
+        postorder_species_tree,
+        list(recon_graph.keys()),
+        species_index,
     )
     # Find the dictionary for frequencies for the given mapping nodes and graph, and the given gene root
     _, event_frequencies, _ = generate_frequencies_dict(
@@ -30,6 +30,8 @@ from numpy import mean
 from numpy import median as md
 
 from empress.reconcile import reconcile_main_input
+from empress import instrumentation
+from empress.reconcile.compact_graph import CompactReconGraph
 from empress.input_reader import _ReconInput
 
 Infinity = float("inf")
@@ -42,32 +44,32 @@ def preorder(tree: dict, root_edge_name: Tuple) -> Iterator:
     :yield: list of edges in the given tree in preorder (high to low edges).
     """
 
-    value = tree[root_edge_name]
-    _, _, left_child_edge_name, right_child_edge_name = value
-
-    # Base case
-    if left_child_edge_name is None:  # Then right_child_edge_name == None also
-        yield root_edge_name
-    else:  # Recursive call
-        yield root_edge_name
-        yield from preorder(tree, left_child_edge_name)
-        yield from preorder(tree, right_child_edge_name)
+    # Explicit stack, so that deep trees neither hit the recursion limit nor pay for chained generators
+    stack = [root_edge_name]
+    while stack:
+        edge_name = stack.pop()
+        yield edge_name
+        _, _, left_child_edge_name, right_child_edge_name = tree[edge_name]
+        if left_child_edge_name is not None:  # Then right_child_edge_name != None also
+            stack.append(right_child_edge_name)
+            stack.append(left_child_edge_name)
 
 
 def postorder(tree: dict, root_edge_name: Tuple) -> Iterator:
     """The parameters of this function are the same as that of preorder above, except it
     yields the edge list in postorder."""
 
-    value = tree[root_edge_name]
-    _, _, left_child_edge_name, right_child_edge_name = value
-
-    # Base case
-    if left_child_edge_name is None:  # then right_child_edge_name == None also
-        yield root_edge_name
-    else:  # Recursive call
-        yield from postorder(tree, left_child_edge_name)
-        yield from postorder(tree, right_child_edge_name)
-        yield root_edge_name
+    # Each edge is on the stack twice: once to push its children, then to be yielded after them
+    stack = [(root_edge_name, False)]
+    while stack:
+        edge_name, children_done = stack.pop()
+        _, _, left_child_edge_name, right_child_edge_name = tree[edge_name]
+        if children_done or left_child_edge_name is None:
+            yield edge_name
+        else:
+            stack.append((edge_name, True))
+            stack.append((right_child_edge_name, False))
+            stack.append((left_child_edge_name, False))
 
 
 def contemporaneous(host_1, host_1_parent, host_2, host_2_parent, distances):
@@ -91,14 +93,45 @@ def contemporaneous(host_1, host_1_parent, host_2, host_2_parent, distances):
     return True
 
 
+class _SharedList:
+    """
+    An immutable list made by concatenating items and other _SharedLists. The other lists are referenced
+    rather than copied, so building o_best and best_switch_locations in DP takes O(1) space per entry
+    instead of O(|H|). The items are only listed when iterated, i.e. when a transfer event is created.
+    """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, *parts):
+        """
+        :param parts - items (mapping node tuples) and _SharedLists, in order
+        """
+        self.parts = parts
+
+    def __iter__(self) -> Iterator:
+        stack = list(reversed(self.parts))
+        while stack:
+            part = stack.pop()
+            if isinstance(part, _SharedList):
+                stack.extend(reversed(part.parts))
+            else:
+                yield part
+
+
 def DP(
-    tree_data: _ReconInput, dup_cost: float, transfer_cost: float, loss_cost: float
+    tree_data: _ReconInput,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    host_index=None,
 ) -> Tuple[dict, float, int, list]:
     """
     :param tree_data <_ReconInput> object - See newickFormatReader (data comes from getInput)
     :param dup_cost <float> - cost of a duplication event
     :param transfer_cost <float> - cost of a transfer event
     :param loss_cost <float> - cost of a loss event
+    :param host_index <HostTreeIndex> - index of the host tree (see tree_index.py) whose traversal orders
+    are reused, or None to compute them
     :return: the DTL reconciliation graph in the form of a dictionary, the total cost of the best reconciliation,
     the number of maximum parsimony reconciliations, and the roots for a reconciliation graph that could produce a
     Maximum Parsimony Reconciliation.
@@ -108,6 +141,47 @@ def DP(
     corresponding to lists which include all valid event nodes for a given
     mapping node for the MPR.
     """
+    parasite_dict = tree_data.parasite_dict
+    with instrumentation.span(
+        "dp_tables",
+        parasite_edges=len(parasite_dict),
+        host_edges=len(tree_data.host_dict),
+    ):
+        events_dict, min_cost = _dp_tables(
+            tree_data, dup_cost, transfer_cost, loss_cost, host_index
+        )
+
+    with instrumentation.span("graph_build"):
+        # Create the list of minimum cost mapping nodes involving root of parasite tree
+        tree_min = find_best_roots(parasite_dict, min_cost)
+
+        # Build the reconciliation graph as a dictionary, with keys as mapping nodes and values as event nodes
+        dtl_recon_graph = build_dtl_recon_graph(tree_min, events_dict, {})
+        instrumentation.count(
+            mapping_nodes=len(dtl_recon_graph),
+            events=sum(len(events) for events in dtl_recon_graph.values()),
+        )
+
+    mpr_count = count_mprs_wrapper(tree_min, dtl_recon_graph)
+
+    # The total cost of the best reconciliation
+    best_cost = min_cost[tree_min[0]]
+
+    # Returns the graph, the optimal cost, the number of MPRs, and the roots that could produce an MPR
+    return dtl_recon_graph, best_cost, mpr_count, tree_min
+
+
+def _dp_tables(
+    tree_data: _ReconInput,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    host_index,
+) -> Tuple[dict, dict]:
+    """
+    Fill the cost tables of DP
+    :return: the events of every mapping node with a finite cost, and the minimum cost of each of them
+    """
     host_dict = tree_data.host_dict
     host_distances = tree_data.host_distances
     parasite_dict = tree_data.parasite_dict
@@ -128,9 +202,19 @@ def DP(
     # Keeps track of which vertex mappings 'gave' O its cost for the corresponding edges
     o_best = {}
 
-    # Keeps track of switch locations. Keys are edges, values are edges to send the key edges to for transfers
+    # Keeps track of switch locations. Keys are edges, values are edges to send the key edges to for transfers.
+    # Both o_best and best_switch_locations hold _SharedLists, so each entry refers to the lists it extends
     best_switch_locations = {}
 
+    # The host tree is traversed once per parasite edge, so keep its traversal orders
+    if host_index is not None:
+        host_index.check_tree(host_dict)
+        host_postorder = host_index.edges
+        host_preorder = host_index.preorder_edges
+    else:
+        host_postorder = list(postorder(host_dict, "hTop"))
+        host_preorder = list(preorder(host_dict, "hTop"))
+
     # Following logic taken from tech report, we loop over all ep and eh
     for ep in postorder(parasite_dict, "pTop"):
         # Get the parasite tree info in the format
@@ -150,13 +234,12 @@ def DP(
             p_child2 = ep2[1]
 
         # Begin looping over host edges
-        for eh in postorder(host_dict, "hTop"):
+        for eh in host_postorder:
             # Similar format to that of the parasite tree above
             _, vh, eh1, eh2 = host_dict[eh]
 
             # Initialize entries for this iteration of ep and eh
             events_dict[(vp, vh)] = []
-            o_best[(vp, vh)] = []
 
             # Same logic as for the parasite tree above
             if eh1 is None:
@@ -234,61 +317,48 @@ def DP(
                 dup_ep_eh = Infinity
                 dup_list = [Infinity]
 
-            # Next, Compute T and create event list to add
-            # to events_dict using best_switch_locations
+            # Next, compute T. The transfer events themselves are only created below if T is optimal,
+            # since listing the landing sites in best_switch_locations is the expensive part
             if not vp_is_a_tip:
-                switch_list = []  # List to keep track of lowest cost switch
-
                 # Calculate the cost of a switch/transfer event
                 switch_ep_eh = transfer_cost + min(
                     C[(ep1, eh)] + best_switch[(ep2, eh)],
                     C[(ep2, eh)] + best_switch[(ep1, eh)],
                 )
+            else:  # vp is a tip
+                switch_ep_eh = Infinity
 
+            # Compute C[(ep, eh)] and add the event or events with that cost
+            # to the dictionary events_dict
+            C[(ep, eh)] = min(A[(ep, eh)], dup_ep_eh, switch_ep_eh)
+
+            # Add the minimum costs for the current edges to the min_cost dict
+            min_cost[(vp, vh)] = C[(ep, eh)]
+
+            # Find which events produce the optimal cost for these edges and add to eventDict
+            if C[(ep, eh)] == dup_ep_eh:
+                events_dict[(vp, vh)].append(dup_list)
+            if C[(ep, eh)] == switch_ep_eh and not vp_is_a_tip:
                 # If ep2 switching has the lowest cost or equal to the other
                 if (C[(ep1, eh)] + best_switch[(ep2, eh)]) <= (
                     C[(ep2, eh)] + best_switch[(ep1, eh)]
                 ):
-                    # Search for the optimal switch location by searching through the best switch
-                    # locations for the given child and vh pair
+                    # The optimal switch locations are the best switch locations
+                    # for the given child and vh pair
                     for location in best_switch_locations[(p_child2, vh)]:
                         # Proposed new landing site
                         current_loc = location[1]
                         # Append the proposed event to the list of possible switches
-                        switch_list.append(
+                        events_dict[(vp, vh)].append(
                             ("T", (p_child1, vh), (p_child2, current_loc))
                         )
-                # If ep1 switching has the lowest cost or equal to the other
-                elif (C[(ep2, eh)] + best_switch[(ep1, eh)]) <= (
-                    C[(ep1, eh)] + best_switch[(ep2, eh)]
-                ):
-                    # Search for the optimal switch location by searching through the best switch
-                    # locations for the given child and vh pair
+                # If ep1 switching has the lowest cost
+                else:
                     for location in best_switch_locations[(p_child1, vh)]:
-                        # Proposed new landing site
                         current_loc = location[1]
-
-                        # Append the proposed event to the list of possible switches
-                        switch_list.append(
+                        events_dict[(vp, vh)].append(
                             ("T", (p_child2, vh), (p_child1, current_loc))
                         )
-
-            else:  # vp is a tip
-                switch_ep_eh = Infinity
-                switch_list = [Infinity]
-
-            # Compute C[(ep, eh)] and add the event or events with that cost
-            # to the dictionary events_dict
-            C[(ep, eh)] = min(A[(ep, eh)], dup_ep_eh, switch_ep_eh)
-
-            # Add the minimum costs for the current edges to the min_cost dict
-            min_cost[(vp, vh)] = C[(ep, eh)]
-
-            # Find which events produce the optimal cost for these edges and add to eventDict
-            if C[(ep, eh)] == dup_ep_eh:
-                events_dict[(vp, vh)].append(dup_list)
-            if C[(ep, eh)] == switch_ep_eh:
-                events_dict[(vp, vh)].extend(switch_list)
             if C[(ep, eh)] == A[(ep, eh)]:
                 events_dict[(vp, vh)].extend(A_min)
 
@@ -301,35 +371,31 @@ def DP(
             # Compute o_best[(vp, vh)], the source of O(ep, eh)
             if vh_is_a_tip:
                 O[(ep, eh)] = C[(ep, eh)]
-                o_best[(vp, vh)] = [(vp, vh)]
+                o_best[(vp, vh)] = _SharedList((vp, vh))
             else:
                 # Compute O(ep, eh) if vh is not a tip
                 O[(ep, eh)] = min(C[(ep, eh)], O[(ep, eh1)], O[(ep, eh2)])
 
-                # o_min helps us easily find which value (between C, O for child 1, and O for child 2) produces
-                # O for this edge. Knowing what its indices represent, we search through to see which produce O
-                o_min = [
-                    ind
-                    for ind, elem in enumerate(
-                        [C[(ep, eh)], O[(ep, eh1)], O[(ep, eh2)]]
-                    )
-                    if elem == O[(ep, eh)]
-                ]
+                # Find which values (between C, O for child 1, and O for child 2) produce O
+                # for this edge. The lists of the children are shared, not copied
+                o_parts = []
 
                 # Corresponds to C
-                if 0 in o_min:
-                    o_best[(vp, vh)].append((vp, vh))
+                if C[(ep, eh)] == O[(ep, eh)]:
+                    o_parts.append((vp, vh))
 
                 # Corresponds to the O table for each child
-                if 1 in o_min:
-                    o_best[(vp, vh)].extend(o_best[(vp, h_child1)])
-                if 2 in o_min:
-                    o_best[(vp, vh)].extend(o_best[(vp, h_child2)])
+                if O[(ep, eh1)] == O[(ep, eh)]:
+                    o_parts.append(o_best[(vp, h_child1)])
+                if O[(ep, eh2)] == O[(ep, eh)]:
+                    o_parts.append(o_best[(vp, h_child2)])
+                o_best[(vp, vh)] = _SharedList(*o_parts)
 
         # Compute best_switch values
         best_switch[(ep, "hTop")] = Infinity
-        best_switch_locations[(vp, host_dict["hTop"][1])] = [(None, None)]
-        for eh in preorder(host_dict, "hTop"):
+        root_locations = _SharedList((None, None))
+        best_switch_locations[(vp, host_dict["hTop"][1])] = root_locations
+        for eh in host_preorder:
             # Redefine the host information for this new loop
             _, vh, eh1, eh2 = host_dict[eh]
 
@@ -346,51 +412,31 @@ def DP(
             # Find best cost for a switch to occur (best_switch)
             # and the location to which the edge switches (best_switch_locations)
             if not vh_is_a_tip:
-                # Initialize lists for switch locations
-                best_switch_locations[(vp, h_child1)] = []
-                best_switch_locations[(vp, h_child2)] = []
-
                 # Compute the switch costs
                 best_switch[(ep, eh1)] = min(best_switch[(ep, eh)], O[(ep, eh2)])
                 best_switch[(ep, eh2)] = min(best_switch[(ep, eh)], O[(ep, eh1)])
 
+                # The switch locations of a child are those of vh (unless vh is the root)
+                # followed by the o_best locations of its sibling, each when they give the best switch
+                inherit = best_switch_locations[(vp, vh)] is not root_locations
+
                 # Add best switch locations for child 1
-                if best_switch[(ep, eh1)] == best_switch[
-                    (ep, eh)
-                ] and best_switch_locations[(vp, vh)] != [(None, None)]:
-                    best_switch_locations[(vp, h_child1)].extend(
-                        best_switch_locations[(vp, vh)]
-                    )
-                if best_switch[(ep, eh1)] == O[(ep, eh2)] and o_best[
-                    (vp, h_child2)
-                ] != [(None, None)]:
-                    best_switch_locations[(vp, h_child1)].extend(o_best[(vp, h_child2)])
+                locations1 = []
+                if best_switch[(ep, eh1)] == best_switch[(ep, eh)] and inherit:
+                    locations1.append(best_switch_locations[(vp, vh)])
+                if best_switch[(ep, eh1)] == O[(ep, eh2)]:
+                    locations1.append(o_best[(vp, h_child2)])
+                best_switch_locations[(vp, h_child1)] = _SharedList(*locations1)
 
                 # Add best switch locations for child 2
-                if best_switch[(ep, eh2)] == best_switch[
-                    (ep, eh)
-                ] and best_switch_locations[(vp, vh)] != [(None, None)]:
-                    best_switch_locations[(vp, h_child2)].extend(
-                        best_switch_locations[(vp, vh)]
-                    )
-                if best_switch[(ep, eh2)] == O[(ep, eh1)] and o_best[
-                    (vp, h_child1)
-                ] != [(None, None)]:
-                    best_switch_locations[(vp, h_child2)].extend(o_best[(vp, h_child1)])
+                locations2 = []
+                if best_switch[(ep, eh2)] == best_switch[(ep, eh)] and inherit:
+                    locations2.append(best_switch_locations[(vp, vh)])
+                if best_switch[(ep, eh2)] == O[(ep, eh1)]:
+                    locations2.append(o_best[(vp, h_child1)])
+                best_switch_locations[(vp, h_child2)] = _SharedList(*locations2)
 
-    # Create the list of minimum cost mapping nodes involving root of parasite tree
-    tree_min = find_best_roots(parasite_dict, min_cost)
-
-    # Build the reconciliation graph as a dictionary, with keys as mapping nodes and values as event nodes
-    dtl_recon_graph = build_dtl_recon_graph(tree_min, events_dict, {})
-
-    mpr_count = count_mprs_wrapper(tree_min, dtl_recon_graph)
-
-    # The total cost of the best reconciliation
-    best_cost = min_cost[tree_min[0]]
-
-    # Returns the graph, the optimal cost, the number of MPRs, and the roots that could produce an MPR
-    return dtl_recon_graph, best_cost, mpr_count, tree_min
+    return events_dict, min_cost
 
 
 def calculate_mean_med_event_nodes_per_mapping_node(
@@ -421,24 +467,33 @@ def count_mprs_wrapper(mapping_node_list: list, dtl_recon_graph: dict) -> int:
     nodes for the root of the parasite tree that could produce a MPR.
     See findBestRoots for more info on this input.
     :param dtl_recon_graph: the output from buildDTLReconGraph. See that
-    function for more info on this input.
+    function for more info on this input. It can also be a CompactReconGraph.
     :return: this function uses the helper function countMPRs to loop over
     all of the minimum cost parasite root mappings and sum their MPR counts
     to find the total number of MPRs for the given DTLReconGraph. This
     number is returned as an integer
     """
 
-    # Initialize the memo
-    memo = dict()
+    with instrumentation.span("count_mprs", mapping_nodes=len(dtl_recon_graph)):
+        if isinstance(dtl_recon_graph, CompactReconGraph):
+            return dtl_recon_graph.count_mprs(
+                [
+                    dtl_recon_graph.node_id(mapping_node)
+                    for mapping_node in mapping_node_list
+                ]
+            )
 
-    # Initialize the very start count, for the first call of countMPRs
-    count = 0
+        # Initialize the memo
+        memo = dict()
 
-    # Loop over all given minimum cost reconciliation roots
-    for mappingNode in mapping_node_list:
-        count += count_mprs(mappingNode, dtl_recon_graph, memo)
+        # Initialize the very start count, for the first call of countMPRs
+        count = 0
 
-    return count
+        # Loop over all given minimum cost reconciliation roots
+        for mappingNode in mapping_node_list:
+            count += count_mprs(mappingNode, dtl_recon_graph, memo)
+
+        return count
 
 
 def count_mprs(mapping_node: tuple, dtl_recon_graph: dict, memo: dict) -> int:
@@ -448,40 +503,52 @@ def count_mprs(mapping_node: tuple, dtl_recon_graph: dict, memo: dict) -> int:
     (p, h), where p is the parasite node and h is the host node
     :param dtl_recon_graph: a DTLReconGraph, output from buildDTLReconGraph
     (see that function for more info on the format of this input)
-    :param memo: a dictionary representing the running memo that is passed
-    down recursive calls of this function. At first it is just an empty
-    dictionary (see above function), but as it gets passed down calls, it collects
+    :param memo: a dictionary representing the running memo that is shared
+    between calls of this function. At first it is just an empty
+    dictionary (see above function), but as it gets passed along, it collects
     keys of mapping nodes and values of MPR counts. This memo improves runtime
     of the algorithm
     :return: the number of MPRs spawned below the given mapping node in the graph
     """
 
-    # Search the memo dictionary for previously calculated results
-    if mapping_node in memo:
-        return memo[mapping_node]
-
     # Base case, occurs if being called on a child produced by a loss or contemporary evet
     if mapping_node == (None, None):
         return 1
 
-    # Initialize a variable to keep count of the number of MPRs
-    count = 0
-
-    # Loop over all event nodes corresponding to the current mapping node
-    for eventNode in dtl_recon_graph[mapping_node]:
-        # Save the children produced by the current event
-        mapping_child1 = eventNode[1]
-        mapping_child2 = eventNode[2]
+    # Count the mapping nodes below mapping_node before mapping_node itself, with an explicit stack so that
+    # deep graphs do not hit the recursion limit. A node is pushed once to push its children, then again
+    # to be counted after them.
+    stack = [(mapping_node, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if node in memo:
+            continue
+        if children_done:
+            # Add the product of the counts of both children (over all children) for each event to get the
+            # parent's count
+            count = 0
+            for eventNode in dtl_recon_graph[node]:
+                count += _memo_count(eventNode[1], memo) * _memo_count(
+                    eventNode[2], memo
+                )
+            memo[node] = count
+        else:
+            stack.append((node, True))
+            for eventNode in dtl_recon_graph[node]:
+                for mapping_child in eventNode[1:3]:
+                    if mapping_child != (None, None) and mapping_child not in memo:
+                        stack.append((mapping_child, False))
 
-        # Add the product of the counts of both children (over all children) for this event to get the parent's count
-        count += count_mprs(mapping_child1, dtl_recon_graph, memo) * count_mprs(
-            mapping_child2, dtl_recon_graph, memo
-        )
+    return memo[mapping_node]
 
-    # Save the result in the memo
-    memo[mapping_node] = count
 
-    return count
+def _memo_count(mapping_node: tuple, memo: dict) -> int:
+    """
+    :return: the MPR count of a mapping node already counted by count_mprs
+    """
+    if mapping_node == (None, None):
+        return 1
+    return memo[mapping_node]
 
 
 def find_best_roots(parasite_dict: dict, min_cost_dict: dict) -> list:
@@ -516,29 +583,47 @@ def build_dtl_recon_graph(
     :param event_dict: a dictionary representing events and the corresponding children
     for each node - see eventDict in DP for more info on the format of this input
     :param unique_dict: a dictionary of unique vertex mappings, which initially
-    starts empty and gets built up using eventDict and tupleList using recursion
-    :return: the modified uniqueDict for this particular call of the function which,
-    after all recursive calls are done, will be the final DTL reconciliation graph
+    starts empty and gets built up using eventDict by a depth-first search from the roots
+    :return: the modified uniqueDict, which will be the final DTL reconciliation graph
     """
 
+    def children(vertex_pair):
+        for event in event_dict[vertex_pair]:
+            for location in event:
+                if type(location) is tuple and location != (None, None):
+                    yield location
+
+    # The stack holds the unvisited children of the vertex pairs on the current path, so vertex pairs are
+    # added in the same order as a recursive depth-first search
     for vertexPair in best_roots:
         if vertexPair not in unique_dict:
             unique_dict[vertexPair] = event_dict[vertexPair]
-            for event in event_dict[vertexPair]:
-                for location in event:
-                    if type(location) is tuple and location != (None, None):
-                        build_dtl_recon_graph([location], event_dict, unique_dict)
+            stack = [children(vertexPair)]
+            while stack:
+                location = next(stack[-1], None)
+                if location is None:
+                    stack.pop()
+                elif location not in unique_dict:
+                    unique_dict[location] = event_dict[location]
+                    stack.append(children(location))
     return unique_dict
 
 
 def reconcile(
-    tree_data: _ReconInput, dup_cost: float, transfer_cost: float, loss_cost: float
+    tree_data: _ReconInput,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    host_index=None,
+    cache=None,
 ) -> Tuple[dict, dict, dict, int, list]:
     """
     :param tree_data <_ReconInput>: Output of newickFormatReader.getInput()
     :param dup_cost: the cost associated with a duplication event
     :param transfer_cost: the cost associated with a transfer event
     :param loss_cost: the cost associated with a loss event
+    :param host_index: HostTreeIndex of the host tree to reuse, or None (see DP)
+    :param cache: ResultCache to read the result from and store it in, or None
     :return: the host tree used, the parasite tree used, the DTLReconGraph, the number of MPRs (as an int), and
     a list of the roots that could be used to produce an MPR for the given trees. See preceding functions
     for details on the format of the host and parasite trees as well as the DTLReconGraph
@@ -546,10 +631,25 @@ def reconcile(
     # Note: I have made modifications to the return statement to make diameter.py possible without re-reconciling.
     host = tree_data.host_dict
     paras = tree_data.parasite_dict
-    graph, best_cost, num_recon, best_roots = DP(
-        tree_data, dup_cost, transfer_cost, loss_cost
-    )
-    return host, paras, graph, num_recon, best_roots
+    result = None
+    if cache is not None:
+        result = cache.get(tree_data, dup_cost, transfer_cost, loss_cost)
+    if result is None:
+        graph, best_cost, num_recon, best_roots = DP(
+            tree_data, dup_cost, transfer_cost, loss_cost, host_index
+        )
+        if cache is not None:
+            result = {
+                "graph": graph,
+                "total_cost": best_cost,
+                "n_recon": num_recon,
+                "roots": best_roots,
+                "event_frequencies": None,
+                "node_frequencies": None,
+            }
+            cache.put(tree_data, dup_cost, transfer_cost, loss_cost, result)
+        return host, paras, graph, num_recon, best_roots
+    return host, paras, result["graph"], result["n_recon"], result["roots"]
 
 
 # The remaining code handles the case of the user wanting to run reconcile from the command line
@@ -0,0 +1,149 @@
+# result_cache.py
+# On-disk cache of reconciliation results
+
+# Reconciling the same trees and tip mapping under the same costs always gives the same result, so the result can be
+# stored and read back instead of rerunning the DP. An entry is addressed by the SHA-256 of the canonicalized host
+# tree, parasite tree and tip mapping (their content, not the bytes of the input files), the three costs and
+# CACHE_VERSION, which must be increased whenever the output of the DP changes.
+#
+# Every entry is one pickle file in the cache directory. An entry is written to a temporary file and renamed into
+# place, so concurrent writers never leave a partial entry behind, and readers see either nothing or a whole entry.
+# Reading an entry touches its modification time; when the cache grows beyond its size limit the least recently used
+# entries are removed.
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+from empress.input_reader import _ReconInput
+
+CACHE_VERSION = 1
+# Default size limit of a cache, in bytes
+DEFAULT_MAX_BYTES = 1 << 30
+
+_SUFFIX = ".pickle"
+
+
+def _canonical(mapping: dict) -> str:
+    """
+    :return: a string that is the same for any two dicts with the same items, whatever their order
+    """
+    return repr(sorted(repr(item) for item in mapping.items()))
+
+
+def cache_key(recon_input: _ReconInput, dup_cost, trans_cost, loss_cost) -> str:
+    """
+    :param recon_input <_ReconInput>    - the host tree, parasite tree and tip mapping
+    :params dup_cost, trans_cost, loss_cost <float> - the DTL costs
+    :return: the hexadecimal SHA-256 that addresses the reconciliation of recon_input under the costs
+    """
+    sha = hashlib.sha256()
+    for part in (
+        "empress-recon-cache %d" % CACHE_VERSION,
+        _canonical(recon_input.host_dict),
+        _canonical(recon_input.parasite_dict),
+        _canonical(recon_input.tip_mapping),
+        repr((float(dup_cost), float(trans_cost), float(loss_cost))),
+    ):
+        sha.update(part.encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+class ResultCache:
+    """
+    A directory of reconciliation results, each a dict with the keys "graph", "total_cost", "n_recon" and "roots"
+    (the results of recongraph_tools.DP), and "event_frequencies" and "node_frequencies" (those of
+    median.generate_frequencies_dict, or None if they were not computed).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param cache_dir <str>  - directory of the cache, created if needed
+        :param max_bytes <int>  - size above which least recently used entries are removed
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _SUFFIX)
+
+    def get(self, recon_input: _ReconInput, dup_cost, trans_cost, loss_cost) -> dict:
+        """
+        :return: the cached result of reconciling recon_input under the costs, or None
+        """
+        path = self._path(cache_key(recon_input, dup_cost, trans_cost, loss_cost))
+        try:
+            with open(path, "rb") as entry_file:
+                result = pickle.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # An unreadable entry (for instance, corrupt or from another version of empress, whose modules moved) is
+            # a miss
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since it was read
+            pass
+        return result
+
+    def put(
+        self, recon_input: _ReconInput, dup_cost, trans_cost, loss_cost, result: dict
+    ):
+        """
+        Store result as the reconciliation of recon_input under the costs, then evict entries if the cache is too
+        large
+        """
+        path = self._path(cache_key(recon_input, dup_cost, trans_cost, loss_cost))
+        entry_file = tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".tmp", delete=False
+        )
+        try:
+            with entry_file:
+                pickle.dump(result, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(entry_file.name, path)
+        except BaseException:
+            self._remove(entry_file.name)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is at most max_bytes large
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Removed by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(_SUFFIX):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -6,12 +6,26 @@
 # of solution costs.
 # https://www.ncbi.nlm.nih.gov/pmc/articles/PMC379178/
 
+from __future__ import annotations
+
+import contextlib
+import math
 import random
-import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+from empress import instrumentation
 from empress.input_reader import _ReconInput
-import matplotlib.pyplot as plt
 
-from empress.reconcile import recongraph_tools
+from empress.reconcile import array_dp
+
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
+
+# Number of random trials reconciled together by _trials
+TRIAL_BATCH = 100
+# Number of random trials sequential_stats runs before checking whether it can stop
+SEQUENTIAL_BATCH = 50
 
 
 def _trials(
@@ -20,6 +34,10 @@ def _trials(
     transfer_cost: float,
     loss_cost: float,
     num_trials: int,
+    n_workers: int = 1,
+    seed: int = None,
+    first_trial: int = 0,
+    executor: ProcessPoolExecutor = None,
 ) -> list:
     """
     :param recon_input <_ReconInput> - class containing host tree, parasite tree, tip mapping
@@ -27,37 +45,96 @@ def _trials(
     :param transfer_cost <float> - transfer cost
     :param loss_cost <float> -loss cost
     :param num_trials <int> - number of trials in Monte Carlo simulation
+    :param n_workers <int> - number of processes the trials are split across
+    :param seed <int> - base seed of the trials. Trial t draws its random tip mapping from its own
+        stream, seeded by (seed, t), so the costs do not depend on n_workers. If None, the base seed
+        is drawn from the random module.
+    :param first_trial <int> - number of the first trial, to continue an earlier run with the same seed
+    :param executor <ProcessPoolExecutor> - pool of n_workers processes to run the trials in, to reuse it across
+        calls, or None to start one if needed
     :return: list of floating point costs of reconciliations of the Monte Carlo samples
     """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
 
+    # Only the cost of each trial is needed, and the trials only differ in their tip mappings,
+    # so each chunk of at most TRIAL_BATCH trials is reconciled together
+    chunk_size = max(1, min(TRIAL_BATCH, -(-num_trials // n_workers)))
+    end = first_trial + num_trials
+    chunks = [
+        (start, min(start + chunk_size, end))
+        for start in range(first_trial, end, chunk_size)
+    ]
+    chunk_args = [
+        (recon_input, dup_cost, transfer_cost, loss_cost, seed, start, stop)
+        for start, stop in chunks
+    ]
     costs = list()  # List of costs of random trials
+    # The memory of the worker processes is not traced
+    with instrumentation.span("p_value_trials", trials=end - first_trial):
+        if n_workers > 1 and len(chunks) > 1:
+            if executor is None:
+                pool = ProcessPoolExecutor(n_workers)
+            else:
+                pool = contextlib.nullcontext(executor)
+            with pool as executor:
+                for chunk_costs in executor.map(_trial_chunk, *zip(*chunk_args)):
+                    costs.extend(chunk_costs)
+        else:
+            for args in chunk_args:
+                costs.extend(_trial_chunk(*args))
+    return costs
+
+
+def _trial_chunk(
+    recon_input: _ReconInput,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    seed: int,
+    start: int,
+    stop: int,
+) -> list:
+    """
+    Run the trials numbered start to stop - 1 (see _trials)
+    :return: list of floating point costs of reconciliations of these trials
+    """
+    random_phis = list()  # Tip mappings of random trials
     parasites = recon_input.tip_mapping.keys()
     hosts = list(recon_input.tip_mapping.values())
-    for t in range(num_trials):
-        random_phi = _create_random_phi(recon_input.tip_mapping)
+    for t in range(start, stop):
+        trial_random = _trial_random(seed, t)
+        random_phi = _create_random_phi(recon_input.tip_mapping, trial_random)
         for p in parasites:
-            h = random.choice(hosts)
+            h = trial_random.choice(hosts)
             random_phi[p] = h
-        new_input = _ReconInput(
-            recon_input.host_dict, None, recon_input.parasite_dict, None, random_phi
-        )
-        _, cost, _, _ = recongraph_tools.DP(
-            new_input, dup_cost, transfer_cost, loss_cost
-        )
-        costs.append(cost)
-    return costs
+        random_phis.append(random_phi)
+    costs = array_dp.DP_cost_batch(
+        recon_input, random_phis, dup_cost, transfer_cost, loss_cost
+    )
+    return costs.tolist()
+
+
+def _trial_random(seed: int, t: int) -> random.Random:
+    """
+    :return: the random number generator of trial t. String seeds are hashed with SHA-512,
+        so the streams of different (seed, t) are independent and the same in every process.
+    """
+    return random.Random("%d:%d" % (seed, t))
 
 
-def _create_random_phi(tip_mapping: dict) -> dict:
+def _create_random_phi(tip_mapping: dict, rng=random) -> dict:
     """
     :param tip_mapping <dict> - dictionary representation of parasite tip to host tip mapping
+    :param rng - the random module or a random.Random to draw from
     :return: a dictionary of parasite tips to host tips that preserves the degree of
         of the host tips in tip_mapping
     """
     random_phi = {}
     parasites = list(tip_mapping.keys())
     hosts = list(tip_mapping.values())
-    unique_hosts = list(set(hosts))
+    # In order of first appearance, so that the same rng always gives the same mapping
+    unique_hosts = list(dict.fromkeys(hosts))
     parasite_count = (
         {}
     )  # keys are hosts, values are the number of parasites on that host wrt tip_mapping
@@ -69,7 +146,7 @@ def _create_random_phi(tip_mapping: dict) -> dict:
         else:
             parasite_count[h] = 1
     for h in unique_hosts:
-        parasite_samples = random.sample(parasites, parasite_count[h])
+        parasite_samples = rng.sample(parasites, parasite_count[h])
         for p in parasite_samples:
             random_phi[p] = h
             parasites.remove(p)
@@ -82,12 +159,13 @@ def draw_stats(ax: plt.Axes, mpr_cost: float, costs: list, pvalue: float = None)
     :param mpr_cost <float> - cost of MPR for given host-parasite-tip_mapping and DTL costs
     :param costs <list> -list of floating point costs of Monte Carlo samples
     """
-    if pvalue is not None:
-        ax.set_title("p-value = %f" % pvalue)
-    ax.hist(costs, 10, color="blue", label="random")
-    ax.axvline(mpr_cost, color="red", linewidth=2, label="this reconciliation")
-    ax.set_xlabel("total cost")
-    ax.set_ylabel("count")
+    with instrumentation.span("render", drawing="p_value"):
+        if pvalue is not None:
+            ax.set_title("p-value = %f" % pvalue)
+        ax.hist(costs, 10, color="blue", label="random")
+        ax.axvline(mpr_cost, color="red", linewidth=2, label="this reconciliation")
+        ax.set_xlabel("total cost")
+        ax.set_ylabel("count")
 
 
 def stats(
@@ -96,6 +174,9 @@ def stats(
     transfer_cost: float,
     loss_cost: float,
     num_trials: int,
+    n_workers: int = 1,
+    seed: int = None,
+    mpr_cost: float = None,
 ) -> (float, list, float):
     """
     :param recon_input <_ReconInput> - class containing host tree, parasite tree, tip mapping
@@ -103,18 +184,123 @@ def stats(
     :param transfer_cost <float> - float transfer cost
     :param loss_cost <float> -loss cost
     :param num_trials <int> - int number of trials in Monte Carlo simulation
+    :param n_workers <int> - number of processes the trials are split across
+    :param seed <int> - base seed of the trials, see _trials. The results for a given seed
+        are the same for any n_workers.
+    :param mpr_cost <float> - cost of an MPR for the given data, if already known
     :return: tuple of three items:
         float cost of optimal MPR for given data
         list of floating point costs of reconciliations of the Monte Carlo samples
         float empirical p-value between 0 and 1
     """
-    _, mpr_cost, _, _ = recongraph_tools.DP(
-        recon_input, dup_cost, transfer_cost, loss_cost
+    if mpr_cost is None:
+        mpr_cost = array_dp.DP_cost(recon_input, dup_cost, transfer_cost, loss_cost)
+    costs = _trials(
+        recon_input, dup_cost, transfer_cost, loss_cost, num_trials, n_workers, seed
     )
-    costs = _trials(recon_input, dup_cost, transfer_cost, loss_cost, num_trials)
 
     # Empirical p-value computed as (r+1)/(n+1) where n is the number of trials and r is the number of trials
     # whose cost is less than or equal to the cost of the MPR for the actual data.
     r = len([score for score in costs if score <= mpr_cost])
     p = (r + 1) / (num_trials + 1)
     return mpr_cost, costs, p
+
+
+def sequential_stats(
+    recon_input: _ReconInput,
+    dup_cost: float,
+    transfer_cost: float,
+    loss_cost: float,
+    max_trials: int,
+    alpha: float,
+    confidence: float = 0.99,
+    n_workers: int = 1,
+    seed: int = None,
+    mpr_cost: float = None,
+) -> (float, list, float, tuple):
+    """
+    Like stats, but stops sampling as soon as a confidence interval on the p-value lies entirely
+    below or above alpha. The trials are run SEQUENTIAL_BATCH at a time, and the trials that are run
+    are the first ones stats would run with the same seed.
+    :param recon_input <_ReconInput> - class containing host tree, parasite tree, tip mapping
+    :param dup_cost <float> - duplication cost
+    :param transfer_cost <float> - float transfer cost
+    :param loss_cost <float> -loss cost
+    :param max_trials <int> - maximum number of trials in Monte Carlo simulation, at least 1
+    :param alpha <float> - significance level the p-value is compared to
+    :param confidence <float> - confidence level of the interval, between 0 and 1
+    :param n_workers <int> - number of processes the trials are split across
+    :param seed <int> - base seed of the trials, see _trials
+    :param mpr_cost <float> - cost of an MPR for the given data, if already known
+    :return: tuple of four items:
+        float cost of optimal MPR for given data
+        list of floating point costs of reconciliations of the Monte Carlo samples that were run
+        float empirical p-value between 0 and 1
+        (low, high) Wilson score interval of the p-value at the given confidence
+    """
+    if max_trials < 1:
+        raise ValueError("max_trials must be at least 1, not {}".format(max_trials))
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    z = _normal_quantile(0.5 + confidence / 2)
+    if mpr_cost is None:
+        mpr_cost = array_dp.DP_cost(recon_input, dup_cost, transfer_cost, loss_cost)
+
+    costs = list()
+    r = 0
+    # The worker processes are started once for all the batches
+    if n_workers > 1:
+        pool = ProcessPoolExecutor(n_workers)
+    else:
+        pool = contextlib.nullcontext()
+    with pool as executor:
+        while len(costs) < max_trials:
+            n_new = min(SEQUENTIAL_BATCH, max_trials - len(costs))
+            new_costs = _trials(
+                recon_input,
+                dup_cost,
+                transfer_cost,
+                loss_cost,
+                n_new,
+                n_workers,
+                seed,
+                len(costs),
+                executor,
+            )
+            costs.extend(new_costs)
+            r += len([score for score in new_costs if score <= mpr_cost])
+            interval = _wilson_interval(r + 1, len(costs) + 1, z)
+            if interval[1] < alpha or interval[0] > alpha:
+                break
+
+    # Same estimate as stats, over the trials that were run
+    p = (r + 1) / (len(costs) + 1)
+    return mpr_cost, costs, p, interval
+
+
+def _wilson_interval(successes: int, n: int, z: float) -> tuple:
+    """
+    :return: (low, high) Wilson score interval of a proportion successes / n, where z is the
+        standard normal quantile of the confidence level
+    """
+    p_hat = successes / n
+    denominator = 1 + z * z / n
+    center = (p_hat + z * z / (2 * n)) / denominator
+    half_width = (
+        z * math.sqrt(p_hat * (1 - p_hat) / n + z * z / (4 * n * n)) / denominator
+    )
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def _normal_quantile(q: float) -> float:
+    """
+    :return: the x for which the standard normal cumulative distribution function is q, found by bisection
+    """
+    low, high = -40.0, 40.0
+    for _ in range(200):
+        middle = (low + high) / 2
+        if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < q:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
@@ -0,0 +1,223 @@
+# tree_index.py
+# Precomputed structure of an edge-based tree, reusable across reconciliations
+
+# A TreeIndex numbers the edges of a tree (see the top of recongraph_tools.py for the edge format) in postorder and
+# keeps everything the DP and the diameter, histogram, median and cluster code need to know about the shape of the
+# tree: child and parent ids, traversal orders, height and depth levels, Euler tour intervals (for O(1) ancestry
+# tests), and the vertex-based tree of diameter.reformat_tree and ancestral table of
+# diameter.calculate_ancestral_table, built on first use. The diameter and histogram algorithms only need single
+# ancestry queries, which relation (or ancestry_relation, for a vertex-based tree) answers without the table.
+#
+# Since one host tree is often reconciled with many parasite trees, a HostTreeIndex can be built once and passed
+# to every call that accepts a host_index (or species_index) argument. The index must have been built from the same
+# host tree as the one in the reconciliation input: check_tree and check_vertex_tree catch most mix-ups cheaply.
+
+from collections import OrderedDict
+
+import numpy as np
+
+from empress.reconcile import recongraph_tools
+
+
+class TreeIndex:
+    """
+    An edge-based tree whose edges are numbered in postorder, so that every child has a smaller id than its parent
+    and the root edge has the largest id.
+    """
+
+    def __init__(self, tree: dict, root_edge_name: str):
+        """
+        :param tree <dict>           - host or parasite tree in edge format
+        :param root_edge_name <str>  - "hTop" or "pTop"
+        """
+        self.tree = tree
+        self.root_edge_name = root_edge_name
+        self.edges = list(recongraph_tools.postorder(tree, root_edge_name))
+        self.edge_id = {edge: i for i, edge in enumerate(self.edges)}
+        # The name of the vertex at the bottom of each edge
+        self.vertices = [tree[edge][1] for edge in self.edges]
+        self.vertex_id = {vertex: i for i, vertex in enumerate(self.vertices)}
+        self.size = len(self.edges)
+        self.root = self.size - 1
+
+        # Child edge ids, or -1 for tips
+        self.child1 = np.full(self.size, -1, dtype=np.intp)
+        self.child2 = np.full(self.size, -1, dtype=np.intp)
+        for i, edge in enumerate(self.edges):
+            _, _, child1_edge, child2_edge = tree[edge]
+            if child1_edge is not None:
+                self.child1[i] = self.edge_id[child1_edge]
+                self.child2[i] = self.edge_id[child2_edge]
+        self.is_tip = self.child1 < 0
+        self.tips = np.flatnonzero(self.is_tip)
+
+        # Parent edge ids, or -1 for the root
+        self.parent = np.full(self.size, -1, dtype=np.intp)
+        internal = np.flatnonzero(~self.is_tip)
+        self.parent[self.child1[internal]] = internal
+        self.parent[self.child2[internal]] = internal
+
+        # The same links as python lists of ints, for per-node lookups
+        self.child_ids = list(zip(self.child1.tolist(), self.child2.tolist()))
+        self.parent_ids = self.parent.tolist()
+
+        self.preorder = [
+            self.edge_id[edge]
+            for edge in recongraph_tools.preorder(tree, root_edge_name)
+        ]
+        self.preorder_edges = [self.edges[i] for i in self.preorder]
+
+        # Height (0 for tips), depth (0 for the root) and number of edges in the subtree of every edge
+        height = np.zeros(self.size, dtype=np.intp)
+        subtree_size = np.ones(self.size, dtype=np.intp)
+        for i in range(self.size):
+            if not self.is_tip[i]:
+                c1, c2 = self.child_ids[i]
+                height[i] = 1 + max(height[c1], height[c2])
+                subtree_size[i] += subtree_size[c1] + subtree_size[c2]
+        depth = np.zeros(self.size, dtype=np.intp)
+        for i in self.preorder:
+            if not self.is_tip[i]:
+                depth[self.child1[i]] = depth[i] + 1
+                depth[self.child2[i]] = depth[i] + 1
+
+        # Internal edges grouped by height (bottom-up) and by depth (top-down). All edges of one group can be
+        # processed by a single vectorized operation, since none of them is an ancestor of another.
+        self.height_levels = [
+            internal[height[internal] == level]
+            for level in range(1, int(height.max()) + 1)
+        ]
+        self.depth_levels = [
+            internal[depth[internal] == level]
+            for level in range(int(depth[internal].max()) + 1 if len(internal) else 0)
+        ]
+
+        # Euler tour intervals: the subtree of edge i is the edges whose preorder rank is in [enter[i], leave[i]]
+        self.enter = np.empty(self.size, dtype=np.intp)
+        self.enter[self.preorder] = np.arange(self.size)
+        self.leave = self.enter + subtree_size - 1
+        self._enter = self.enter.tolist()
+        self._leave = self.leave.tolist()
+
+        self._vertex_tree = None
+        self._ancestral_table = None
+
+    def is_ancestor(self, a: int, b: int) -> bool:
+        """
+        :return: whether edge a is an ancestor of edge b or equal to it
+        """
+        return self._enter[a] <= self._enter[b] <= self._leave[a]
+
+    def check_tree(self, tree: dict):
+        """
+        Raise a ValueError unless tree is the edge-based tree self was built from, or has as many edges and the same
+        root edge. This is a cheap guard against passing the index of another tree, not a full comparison.
+        :param tree <dict>  - the tree in edge format that self is about to be used for
+        """
+        if tree is self.tree:
+            return
+        root = self.root_edge_name
+        if len(tree) != self.size or tree.get(root) != self.tree[root]:
+            raise ValueError(
+                "The index of tree {} was not built from this tree".format(root)
+            )
+
+    def check_vertex_tree(self, vertex_tree: dict):
+        """
+        Raise a ValueError unless vertex_tree has as many vertices as self and the same root, like check_tree
+        :param vertex_tree <dict>   - the tree in vertex format and postorder that self is about to be used for
+        """
+        if self._vertex_tree is not None and vertex_tree is self._vertex_tree[0]:
+            return
+        if (
+            len(vertex_tree) != self.size
+            or next(reversed(vertex_tree), None) != self.vertices[self.root]
+        ):
+            raise ValueError(
+                "The index of tree {} was not built from this tree".format(
+                    self.root_edge_name
+                )
+            )
+
+    def relation(self, A, B) -> str:
+        """
+        :param A - a vertex name
+        :param B - a vertex name
+        :return: how A relates to B, as in the table of diameter.calculate_ancestral_table:
+        "eq", "an" (A is an ancestor of B), "des" (A is a descendant of B) or "in" (incomparable)
+        """
+        a = self.vertex_id[A]
+        b = self.vertex_id[B]
+        if a == b:
+            return "eq"
+        if self.is_ancestor(a, b):
+            return "an"
+        if self.is_ancestor(b, a):
+            return "des"
+        return "in"
+
+    def vertex_tree(self) -> tuple:
+        """
+        :return: what diameter.reformat_tree returns for this tree: the vertex-based tree as an OrderedDict in
+        postorder, its root, and its number of nodes
+        """
+        if self._vertex_tree is None:
+            vertex_tree = OrderedDict()
+            for i, vertex in enumerate(self.vertices):
+                c1, c2 = self.child_ids[i]
+                if c1 < 0:
+                    vertex_tree[vertex] = (None, None)
+                else:
+                    vertex_tree[vertex] = (self.vertices[c1], self.vertices[c2])
+            self._vertex_tree = (vertex_tree, self.vertices[self.root], self.size)
+        return self._vertex_tree
+
+    def ancestral_table(self) -> dict:
+        """
+        :return: the table diameter.calculate_ancestral_table returns for this tree
+        """
+        if self._ancestral_table is None:
+            self._ancestral_table = {
+                A: {B: self.relation(A, B) for B in self.vertices}
+                for A in self.vertices
+            }
+        return self._ancestral_table
+
+
+def ancestry_relation(vertex_tree: dict):
+    """
+    :param vertex_tree <dict>   - a tree in vertex format and postorder (output from diameter.reformat_tree)
+    :return: a function of two vertices A and B that returns how A relates to B, like TreeIndex.relation. The
+        subtree of a vertex is the run of vertices that ends with it in postorder, so each query is two comparisons.
+    """
+    position = {}
+    # Postorder position of the first vertex of the subtree of each vertex
+    first = {}
+    for i, (vertex, (child1, child2)) in enumerate(vertex_tree.items()):
+        position[vertex] = i
+        first[vertex] = i if child1 is None else min(first[child1], first[child2])
+
+    def relation(A, B) -> str:
+        a = position[A]
+        b = position[B]
+        if a == b:
+            return "eq"
+        if first[A] <= b < a:
+            return "an"
+        if first[B] <= a < b:
+            return "des"
+        return "in"
+
+    return relation
+
+
+class HostTreeIndex(TreeIndex):
+    """
+    The TreeIndex of a host tree, rooted at its "hTop" edge
+    """
+
+    def __init__(self, host_dict: dict):
+        """
+        :param host_dict <dict> - host tree in edge format
+        """
+        TreeIndex.__init__(self, host_dict, "hTop")
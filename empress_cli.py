@@ -6,6 +6,9 @@
 
 import argparse
 
+from empress import instrumentation
+import cli_commands.analyze
+import cli_commands.batch
 import cli_commands.cluster
 import cli_commands.cost_regions
 import cli_commands.histogram
@@ -19,6 +22,13 @@ def main():
         description="Empress tool for duplication-transfer-loss maximum parsimony reconciliation.",
         epilog="Show help for each command by running `python empress_cli.py <command> --help`",
     )
+    parser.add_argument(
+        "--profile",
+        metavar="<filename>",
+        default=None,
+        help="append the time and memory used by each stage to this file as JSON lines, "
+        "or print them to stderr if the filename is -",
+    )
 
     # Create subparsers and setup the subparsers
     subparsers = parser.add_subparsers(
@@ -86,6 +96,32 @@ def main():
     )
     cli_commands.p_value.add_p_value_to_parser(p_value_parser)
 
+    # Analyze
+    analyze_description = (
+        "Reconcile once and run any of the median, histogram, p-value and cluster analyses "
+        "on the result."
+    )
+    analyze_parser = subparsers.add_parser(
+        "analyze",
+        description=analyze_description,
+        help=analyze_description.lower().rstrip("."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    cli_commands.analyze.add_analyze_to_parser(analyze_parser)
+
+    # Batch
+    batch_description = (
+        "Reconcile many parasite trees with one host tree, as listed in a manifest file, "
+        "and collect the results in one file."
+    )
+    batch_parser = subparsers.add_parser(
+        "batch",
+        description=batch_description,
+        help=batch_description.lower().rstrip("."),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    cli_commands.batch.add_batch_to_parser(batch_parser)
+
     # Tanglegram
     tanglegram_description = (
         "View a tanglegram which shows the tip mapping between the two trees."
@@ -101,6 +137,15 @@ def main():
     # Determine which command we should run and run it
     args = parser.parse_args()
 
+    if args.profile is None or args.command == "batch":
+        # batch profiles each family in the worker process that reconciles it
+        run_command(args)
+    else:
+        with instrumentation.profiling(args.profile, command=args.command):
+            run_command(args)
+
+
+def run_command(args):
     if args.command == "cost-regions":
         cli_commands.cost_regions.run_cost_regions(args)
     elif args.command == "reconcile":
@@ -111,6 +156,10 @@ def main():
         cli_commands.cluster.run_cluster(args)
     elif args.command == "p-value":
         cli_commands.p_value.run_p_value(args)
+    elif args.command == "analyze":
+        cli_commands.analyze.run_analyze(args)
+    elif args.command == "batch":
+        cli_commands.batch.run_batch(args)
     elif args.command == "tanglegram":
         cli_commands.tanglegram.run_tanglegram(args)
 
@@ -9,6 +9,7 @@ from tkinter import filedialog
 import os
 import sys
 import pathlib
+import multiprocessing
 
 import matplotlib
 
@@ -958,7 +959,10 @@ class App(tk.Frame):
 
     def open_window_pvalue_histogram(self):
         """Pop up a new tkinter window to display the p-value histogram."""
-        App.p_value_histogram = App.recon_graph.draw_stats()
+        # Sample the random mappings on all cores
+        App.p_value_histogram = App.recon_graph.draw_stats(
+            n_workers=os.cpu_count() or 1
+        )
         self.view_pvalue_histogram_window = tk.Toplevel(self.master)
         self.view_pvalue_histogram_window.geometry("700x700")
         self.view_pvalue_histogram_window.title("p-value Histogram")
@@ -1237,10 +1241,14 @@ def on_closing():
     root.destroy()
 
 
-root = tk.Tk()
-root.geometry("700x600")
-root.title("eMPRess GUI Version 1")
-App(root)
-root.protocol("WM_DELETE_WINDOW", on_closing)
-root.mainloop()
-root.quit()
+if __name__ == "__main__":
+    # The p-value window starts worker processes, which import this module again on
+    # platforms that spawn them, and need freeze_support in the pyinstaller build
+    multiprocessing.freeze_support()
+    root = tk.Tk()
+    root.geometry("700x600")
+    root.title("eMPRess GUI Version 1")
+    App(root)
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
+    root.quit()
@@ -0,0 +1,105 @@
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import cli_commands.analyze
+import cli_commands.p_value
+import cli_commands.reconcile
+from empress.reconcile import statistics
+
+
+class AnalyzeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for name in [
+            "heliconius_host.nwk",
+            "heliconius_parasite.nwk",
+            "heliconius_mapping.mapping",
+        ]:
+            shutil.copy(os.path.join("examples", name), self.temp_dir.name)
+            self.files.append(os.path.join(self.temp_dir.name, name))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_command(self, add_to_parser, run, *options):
+        parser = argparse.ArgumentParser()
+        add_to_parser(parser)
+        args = parser.parse_args(self.files + list(options))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            run(args)
+        return output.getvalue()
+
+    def output_path(self, command_str):
+        return os.path.join(
+            self.temp_dir.name, "heliconius_parasite.{}.2.0-3.0-1.0".format(command_str)
+        )
+
+    def test_analyze(self):
+        output = self.run_command(
+            cli_commands.reconcile.add_reconcile_to_parser,
+            cli_commands.reconcile.run_reconcile,
+        )
+        n_recon = re.search(r"Number of optimal reconciliations: (\d+)", output)
+        with mock.patch.object(
+            statistics, "draw_stats", wraps=statistics.draw_stats
+        ) as draw_stats:
+            self.run_command(
+                cli_commands.p_value.add_p_value_to_parser,
+                cli_commands.p_value.run_p_value,
+                "--n-samples",
+                "10",
+                "--seed",
+                "1",
+            )
+        p = draw_stats.call_args[0][3]
+
+        for workers in ["1", "2"]:
+            with self.subTest(workers=workers):
+                output = self.run_command(
+                    cli_commands.analyze.add_analyze_to_parser,
+                    cli_commands.analyze.run_analyze,
+                    "--median",
+                    "--graph",
+                    "--histogram",
+                    "--clusters",
+                    "2",
+                    "--p-value",
+                    "--n-samples",
+                    "10",
+                    "--seed",
+                    "1",
+                    "--workers",
+                    workers,
+                )
+                for path in [
+                    self.output_path("recon") + ".csv",
+                    self.output_path("recon_graph") + ".csv",
+                    self.output_path("histogram") + ".csv",
+                    self.output_path("histogram") + ".pdf",
+                    self.output_path("pvalue") + ".pdf",
+                ]:
+                    self.assertTrue(os.path.exists(path), path)
+                    os.remove(path)
+                self.assertIn(n_recon.group(0), output)
+                self.assertIn("p-value {},".format(p), output)
+
+    def test_no_stage(self):
+        self.assertRaises(
+            SystemExit,
+            self.run_command,
+            cli_commands.analyze.add_analyze_to_parser,
+            cli_commands.analyze.run_analyze,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
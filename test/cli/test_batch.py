@@ -0,0 +1,133 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import cli_commands.batch
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        for name in [
+            "heliconius_host.nwk",
+            "heliconius_parasite.nwk",
+            "heliconius_mapping.mapping",
+        ]:
+            shutil.copy(os.path.join("examples", name), self.temp_dir.name)
+        self.manifest = os.path.join(self.temp_dir.name, "manifest.tsv")
+        with open(self.manifest, "w") as manifest_file:
+            manifest_file.write("parasite\tmapping\n")
+            manifest_file.write("heliconius_parasite.nwk\theliconius_mapping.mapping\n")
+            manifest_file.write(
+                "heliconius_parasite.nwk\theliconius_mapping.mapping\t1\t1\t1\n"
+            )
+            manifest_file.write("missing.nwk\theliconius_mapping.mapping\n")
+        self.results = os.path.join(self.temp_dir.name, "results.tsv")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_batch(self, **kwargs):
+        parser = argparse.ArgumentParser()
+        cli_commands.batch.add_batch_to_parser(parser)
+        args = parser.parse_args(
+            [
+                os.path.join(self.temp_dir.name, "heliconius_host.nwk"),
+                self.manifest,
+                "--results",
+                self.results,
+                "--workers",
+                "1",
+            ]
+        )
+        vars(args).update(kwargs)
+        cli_commands.batch.run_batch(args)
+        with open(self.results, newline="") as results_file:
+            return list(csv.DictReader(results_file, delimiter="\t"))
+
+    def test_batch(self):
+        rows = self.run_batch()
+        self.assertEqual(len(rows), 3)
+        status = {(row["parasite"], row["dup_cost"]): row["status"] for row in rows}
+        parasite = os.path.join(self.temp_dir.name, "heliconius_parasite.nwk")
+        self.assertEqual(status[(parasite, "2.0")], "ok")
+        self.assertEqual(status[(parasite, "1.0")], "ok")
+        missing = os.path.join(self.temp_dir.name, "missing.nwk")
+        self.assertTrue(status[(missing, "2.0")].startswith("error"))
+        for row in rows:
+            if row["status"] == "ok":
+                self.assertTrue(os.path.exists(row["median_csv"]))
+        ok_row = [row for row in rows if row["dup_cost"] == "1.0"][0]
+        self.assertEqual(ok_row["total_cost"], "4.0")
+
+        # A second run only retries the failed family when asked to
+        self.assertEqual(len(self.run_batch()), 3)
+        self.assertEqual(len(self.run_batch(retry_failed=True)), 4)
+
+    def test_profile(self):
+        profile = os.path.join(self.temp_dir.name, "profile.jsonl")
+        self.run_batch(profile=profile)
+        with open(profile) as profile_file:
+            records = [json.loads(line) for line in profile_file]
+        parasite = os.path.join(self.temp_dir.name, "heliconius_parasite.nwk")
+        missing = os.path.join(self.temp_dir.name, "missing.nwk")
+        # Every stage of a family is tagged with it, even when the family fails
+        self.assertEqual({record["family"] for record in records}, {parasite, missing})
+        spans = [record["span"] for record in records]
+        self.assertEqual(spans.count("parse"), 3)
+        self.assertEqual(spans.count("dp_tables"), 2)
+
+    def test_timeout(self):
+        rows = self.run_batch(timeout=1e-6)
+        self.assertEqual(len(rows), 3)
+        for row in rows:
+            if "missing" not in row["parasite"]:
+                self.assertEqual(row["status"], "timeout")
+        # Timed out families are done unless retried
+        self.assertEqual(len(self.run_batch()), 3)
+        self.assertEqual(len(self.run_batch(retry_failed=True)), 6)
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == "fork",
+        "the workers only see the patch when they are forked",
+    )
+    def test_worker_death(self):
+        # The family that kills its worker is the first one, so that others are left for a new pool
+        with open(self.manifest, "w") as manifest_file:
+            manifest_file.write("missing.nwk\theliconius_mapping.mapping\n")
+            manifest_file.write("heliconius_parasite.nwk\theliconius_mapping.mapping\n")
+            manifest_file.write(
+                "heliconius_parasite.nwk\theliconius_mapping.mapping\t1\t1\t1\n"
+            )
+        family_result = cli_commands.batch._family_result
+
+        def die_on_missing(family):
+            if "missing" in family[0]:
+                os._exit(1)
+            return family_result(family)
+
+        with mock.patch.object(cli_commands.batch, "_family_result", die_on_missing):
+            rows = self.run_batch()
+        self.assertEqual(len(rows), 3)
+        status = {(row["parasite"], row["dup_cost"]): row["status"] for row in rows}
+        missing = os.path.join(self.temp_dir.name, "missing.nwk")
+        self.assertEqual(status[(missing, "2.0")], "error: worker process died")
+        # The pool is started again for the families after the one that died
+        parasite = os.path.join(self.temp_dir.name, "heliconius_parasite.nwk")
+        self.assertIn(status[(parasite, "2.0")], ["ok", "error: worker process died"])
+        self.assertEqual(status[(parasite, "1.0")], "ok")
+
+    def test_bad_manifest(self):
+        with open(self.manifest, "a") as manifest_file:
+            manifest_file.write("only_one_field\n")
+        self.assertRaises(SystemExit, self.run_batch)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -68,3 +68,69 @@ class HistogramTestCase(unittest.TestCase):
         self.assertEqual(
             new_hist.histogram_dict, {2: 1, 3: 1, 4: 1, 5: 4, 6: 2, 7: 1, 8: 2}
         )
+
+    def product_reference(self, a: dict, b: dict, n_choices: int) -> dict:
+        # Every pair of distances, counted once per choice that is not between two zeros
+        product = {}
+        for i, x in a.items():
+            for j, y in b.items():
+                n = max(n_choices - (i == 0) - (j == 0), 0) if n_choices else 0
+                product[i + j] = product.get(i + j, 0) + x * y * 2**n
+        return {k: v for k, v in sorted(product.items()) if v != 0}
+
+    def test_product_choices(self):
+        histA = {0: 3, 1: 1, 4: 2}
+        histB = {0: 1, 2: 5}
+        for n_choices in range(4):
+            new_hist = Histogram(histA).product_combine(Histogram(histB), n_choices)
+            self.assertEqual(
+                new_hist.histogram_dict,
+                self.product_reference(histA, histB, n_choices),
+            )
+
+    def test_product_long(self):
+        # Long enough for the FFT
+        histA = {i: (i * 7919) % 1000 for i in range(400)}
+        histB = {i: (i * 104729) % 997 for i in range(300)}
+        new_hist = Histogram(histA).product_combine(Histogram(histB), 2)
+        self.assertEqual(
+            new_hist.histogram_dict, self.product_reference(histA, histB, 2)
+        )
+
+    def test_big_counts(self):
+        # Counts far beyond int64, short and long enough for the FFT
+        for length in (3, 300):
+            histA = {i: 3**100 + i for i in range(length)}
+            histB = {i + 1: 2**70 * (i + 1) for i in range(length)}
+            histA[0] = 5
+            new_hist = Histogram(histA).product_combine(Histogram(histB), 1)
+            self.assertEqual(
+                new_hist.histogram_dict, self.product_reference(histA, histB, 1)
+            )
+            total = Histogram(histA) + Histogram(histB)
+            self.assertEqual((total - Histogram(histB)).histogram_dict, histA)
+            doubled = Histogram(histA).double_nonzero_entry().histogram_dict
+            self.assertEqual(
+                doubled, {k: v if k == 0 else 2 * v for k, v in histA.items()}
+            )
+
+    def test_subtract(self):
+        histA = Histogram({0: 1, 2: 4, 3: 2})
+        histB = Histogram({0: 1, 2: 1})
+        self.assertEqual((histA - histB).histogram_dict, {2: 3, 3: 2})
+        self.assertEqual((histA - histA).histogram_dict, {})
+
+    def test_zero_bins(self):
+        # Distances of count 0 are not kept, so they do not change equality
+        hist = Histogram({0: 1, 2: 0, 3: 2})
+        self.assertEqual(hist.histogram_dict, {0: 1, 3: 2})
+        self.assertEqual(hist, Histogram({0: 1, 3: 2}))
+
+    def test_set_dict(self):
+        hist = Histogram(0)
+        # The dict is a copy of the counts
+        hist.histogram_dict[5] = 1
+        self.assertEqual(hist.histogram_dict, {0: 1})
+        hist.histogram_dict = {1: 2, 4: 3}
+        self.assertEqual(hist.histogram_dict, {1: 2, 4: 3})
+        self.assertEqual((hist << 1).histogram_dict, {2: 2, 5: 3})
@@ -0,0 +1,161 @@
+import io
+import json
+import random
+import unittest
+
+import empress
+from empress import instrumentation
+from empress.cluster import cluster_util
+from empress.histogram import histogram_alg
+from empress.histogram.Histogram import Histogram
+from empress.miscs import input_generator
+from empress.reconcile import diameter
+
+
+class HistogramAlgTestCase(unittest.TestCase):
+    def setUp(self):
+        # Random trees with thousands of MPRs
+        random.seed(2)
+        recon_input = input_generator.generate_random_recon_input(15, 15)
+        self.recon_input = empress.ReconInputWrapper(
+            recon_input.host_dict,
+            None,
+            recon_input.parasite_dict,
+            None,
+            recon_input.tip_mapping,
+        )
+        self.gene_tree, self.gene_root, _ = diameter.reformat_tree(
+            self.recon_input.parasite_dict, "pTop"
+        )
+        self.species_tree, _, _ = diameter.reformat_tree(
+            self.recon_input.host_dict, "hTop"
+        )
+
+    def test_symmetric(self):
+        for costs in ((1, 1, 1), (2, 3, 1)):
+            graph = self.recon_input.reconcile(*costs)
+            hists = [
+                histogram_alg.diameter_algorithm(
+                    self.species_tree,
+                    self.gene_tree,
+                    self.gene_root,
+                    graph.recongraph,
+                    graph.recongraph,
+                    False,
+                    False,
+                    symmetric=symmetric,
+                )
+                for symmetric in (False, True)
+            ]
+            self.assertEqual(hists[0].histogram_dict, hists[1].histogram_dict)
+            # Every unordered pair of MPRs, and every MPR with itself
+            n_recon = graph.n_recon
+            self.assertEqual(
+                sum(hists[1].histogram_dict.values()), n_recon * (n_recon + 1) // 2
+            )
+
+    def test_memory_budget(self):
+        graph = self.recon_input.reconcile(1, 1, 1)
+        args = (
+            self.species_tree,
+            self.gene_tree,
+            self.gene_root,
+            graph.recongraph,
+            graph.recongraph,
+            False,
+            False,
+        )
+        out = io.StringIO()
+        with instrumentation.profiling(out):
+            with instrumentation.span("histogram"):
+                hist = histogram_alg.diameter_algorithm(*args)
+        (record,) = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertGreater(record["peak_table_bytes"], 0)
+        self.assertGreater(record["peak_table_entries"], 0)
+
+        # The peak is enough, and less is not
+        budget_hist = histogram_alg.diameter_algorithm(
+            *args, memory_budget=record["peak_table_bytes"]
+        )
+        self.assertEqual(budget_hist.histogram_dict, hist.histogram_dict)
+        with self.assertRaises(MemoryError):
+            histogram_alg.diameter_algorithm(
+                *args, memory_budget=record["peak_table_bytes"] - 1
+            )
+
+    def test_moments_statistics(self):
+        # The statistics printed by histogram --stats do not depend on the engine
+        recon_input = empress.ReconInputWrapper.from_files(
+            "./examples/gopher_louse_host.nwk",
+            "./examples/gopher_louse_parasite.nwk",
+            "./examples/gopher_louse_map.mapping",
+        )
+        gene_tree, gene_root, _ = diameter.reformat_tree(
+            recon_input.parasite_dict, "pTop"
+        )
+        species_tree, _, _ = diameter.reformat_tree(recon_input.host_dict, "hTop")
+        for costs in ((2, 3, 1), (1, 3, 1), (1, 1, 2)):
+            graph = recon_input.reconcile(*costs)
+            hist, moments = [
+                histogram_alg.diameter_algorithm(
+                    species_tree,
+                    gene_tree,
+                    gene_root,
+                    graph.recongraph,
+                    graph.recongraph,
+                    False,
+                    False,
+                    engine=engine,
+                )
+                for engine in ("histogram", "moments")
+            ]
+            self.assertEqual(moments.mean(), hist.mean())
+            self.assertEqual(moments.standard_deviation(), hist.standard_deviation())
+
+    def test_shared_counts(self):
+        memory = histogram_alg._TableMemory(None)
+        hist = Histogram({1: 2, 3: 4})
+        memory.add("u", hist, 2)
+        memory.add("v", Histogram.sum([hist]))
+        memory.add("v", hist << 0)
+        self.assertEqual((memory.entries, memory.bytes), (4, hist.nbytes))
+        memory.release("u")
+        self.assertEqual((memory.entries, memory.bytes), (2, hist.nbytes))
+        memory.release("v")
+        self.assertEqual((memory.entries, memory.bytes), (0, 0))
+        self.assertEqual(memory.peak_bytes, hist.nbytes)
+
+    def test_moments(self):
+        for costs in ((1, 1, 1), (2, 3, 1)):
+            graph = self.recon_input.reconcile(*costs)
+            hist, moments = [
+                histogram_alg.diameter_algorithm(
+                    self.species_tree,
+                    self.gene_tree,
+                    self.gene_root,
+                    graph.recongraph,
+                    graph.recongraph,
+                    False,
+                    False,
+                    engine=engine,
+                )
+                for engine in ("histogram", "moments")
+            ]
+            hist_dict = hist.histogram_dict
+            self.assertEqual(moments.zero, graph.n_recon)
+            self.assertEqual(moments.count, sum(hist_dict.values()))
+            self.assertEqual(moments.largest, max(hist_dict))
+            self.assertEqual(moments.mean(), hist.mean())
+            self.assertEqual(moments.standard_deviation(), hist.standard_deviation())
+
+            scores = [
+                cluster_util.mk_pdv_score(
+                    self.species_tree, self.gene_tree, self.gene_root, engine=engine
+                )(graph.recongraph)
+                for engine in histogram_alg.PDV_ENGINES
+            ]
+            self.assertEqual(scores[0], scores[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
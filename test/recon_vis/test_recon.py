@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from empress.recon_vis.recon import (
+    MappingNode,
+    Cospeciation,
+    Duplication,
+    Transfer,
+    Loss,
+    TipTip,
+    Reconciliation,
+    ReconGraph,
+)
+
+
+class TestReconSaveLoad(unittest.TestCase):
+    def setUp(self):
+        self.root = MappingNode("p0", "h0")
+        self.left = MappingNode("p1", "h1")
+        self.right = MappingNode("p2", "h2")
+        self.lost = MappingNode("p2", "h0")
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "recon.bin")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_reconciliation(self):
+        recon = Reconciliation(self.root, {})
+        recon.set_event(self.root, Cospeciation(self.left, self.lost, 0.5))
+        recon.set_event(self.lost, Loss(self.right))
+        recon.set_event(self.left, TipTip())
+        recon.set_event(self.right, TipTip(1.0))
+        recon.save(self.path, {"name": "test"})
+        loaded = Reconciliation.load(self.path)
+        self.assertEqual(repr(loaded), repr(recon))
+        self.assertEqual(loaded.source, self.root)
+        self.assertEqual(loaded.event_of(self.root).freq, 0.5)
+        self.assertIsNone(loaded.event_of(self.left).freq)
+        self.assertEqual(loaded.mapping_of("p2"), self.right)
+
+    def test_recon_graph(self):
+        graph = ReconGraph([self.root], {})
+        graph.set_events(
+            self.root,
+            [
+                Duplication(self.left, self.right, 0.25),
+                Transfer(self.left, self.right, 0.75),
+            ],
+        )
+        graph.set_events(self.left, [TipTip()])
+        graph.set_events(self.right, [TipTip()])
+        graph.save(self.path)
+        loaded = ReconGraph.load(self.path)
+        self.assertEqual(loaded.sources, [self.root])
+        self.assertEqual(loaded.events_of(self.root), graph.events_of(self.root))
+        self.assertEqual(
+            [event.freq for event in loaded.events_of(self.root)], [0.25, 0.75]
+        )
+        # A graph with two events for a mapping node is not a Reconciliation
+        self.assertRaises(ValueError, Reconciliation.load, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import itertools
+import random
+import unittest
+
+import empress
+from empress.input_reader import _ReconInput
+from empress.miscs import input_generator
+from empress.reconcile import recongraph_tools, array_dp
+
+EXAMPLES = [
+    (
+        "./examples/test_size5_no924_host.nwk",
+        "./examples/test_size5_no924_parasite.nwk",
+        "./examples/test_size5_no924_mapping.mapping",
+    ),
+    (
+        "./examples/heliconius_host.nwk",
+        "./examples/heliconius_parasite.nwk",
+        "./examples/heliconius_mapping.mapping",
+    ),
+    (
+        "./examples/gopher_louse_host.nwk",
+        "./examples/gopher_louse_parasite.nwk",
+        "./examples/gopher_louse_map.mapping",
+    ),
+]
+
+# Zero and equal costs produce many ties, which exercise the ordering of events
+COSTS = [(1, 1, 1), (2, 3, 1), (4, 2, 0), (0, 0, 0), (1.5, 0.5, 2.5)]
+
+
+class ArrayDPTestCase(unittest.TestCase):
+    """
+    array_dp.DP must return exactly what recongraph_tools.DP returns,
+    including the order of events and roots.
+    """
+
+    def assert_same_result(self, recon_input, dup_cost, trans_cost, loss_cost):
+        expected = recongraph_tools.DP(recon_input, dup_cost, trans_cost, loss_cost)
+        expected_graph, expected_cost, expected_n_recon, expected_roots = expected
+        for vectorize, lazy in itertools.product((True, False), repeat=2):
+            result = array_dp.DP(
+                recon_input,
+                dup_cost,
+                trans_cost,
+                loss_cost,
+                vectorize=vectorize,
+                lazy=lazy,
+            )
+            graph, cost, n_recon, roots = result
+            self.assertEqual(list(graph.items()), list(expected_graph.items()))
+            self.assertEqual(cost, expected_cost)
+            self.assertEqual(n_recon, expected_n_recon)
+            self.assertEqual(roots, expected_roots)
+        self.assertEqual(
+            array_dp.DP_cost(recon_input, dup_cost, trans_cost, loss_cost),
+            expected_cost,
+        )
+
+    def test_examples(self):
+        for host, parasite, mapping in EXAMPLES:
+            recon_input = empress.ReconInputWrapper.from_files(host, parasite, mapping)
+            for costs in COSTS:
+                with self.subTest(host=host, costs=costs):
+                    self.assert_same_result(recon_input, *costs)
+
+    def test_all_small_inputs(self):
+        for recon_input in input_generator.generate_all_recon_input(3, 3):
+            for costs in COSTS:
+                self.assert_same_result(recon_input, *costs)
+
+    def test_random_inputs(self):
+        # The 80 leaf host has wide enough levels to be filled level by level
+        for n_host_leaves, n_parasite_leaves in [(8, 12), (15, 10), (20, 20), (80, 25)]:
+            recon_input = input_generator.generate_random_recon_input(
+                n_host_leaves, n_parasite_leaves
+            )
+            for costs in COSTS:
+                self.assert_same_result(recon_input, *costs)
+
+    def test_batch(self):
+        recon_inputs = [
+            empress.ReconInputWrapper.from_files(host, parasite, mapping)
+            for host, parasite, mapping in EXAMPLES
+        ]
+        recon_inputs.append(input_generator.generate_random_recon_input(15, 20))
+        for recon_input in recon_inputs:
+            batch = array_dp.DPBatch(recon_input, COSTS)
+            self.assertEqual(len(batch), len(COSTS))
+            for k, costs in enumerate(COSTS):
+                expected = recongraph_tools.DP(recon_input, *costs)
+                graph, cost, n_recon, roots = batch.result(k)
+                self.assertEqual(list(graph.items()), list(expected[0].items()))
+                self.assertEqual((cost, n_recon, roots), expected[1:])
+                self.assertEqual(batch.total_costs()[k], expected[1])
+
+    def test_cost_batch(self):
+        recon_input = input_generator.generate_random_recon_input(12, 18)
+        host_tips = list(set(recon_input.tip_mapping.values()))
+        tip_mappings = [
+            {p: random.choice(host_tips) for p in recon_input.tip_mapping}
+            for _ in range(10)
+        ]
+        for costs in COSTS:
+            batch_costs = array_dp.DP_cost_batch(recon_input, tip_mappings, *costs)
+            for tip_mapping, cost in zip(tip_mappings, batch_costs):
+                trial_input = _ReconInput(
+                    recon_input.host_dict,
+                    None,
+                    recon_input.parasite_dict,
+                    None,
+                    tip_mapping,
+                )
+                self.assertEqual(cost, recongraph_tools.DP(trial_input, *costs)[1])
+
+    def test_reconcile_engine(self):
+        host, parasite, mapping = EXAMPLES[0]
+        recon_input = empress.ReconInputWrapper.from_files(host, parasite, mapping)
+        recongraph = recon_input.reconcile(1, 1, 1, engine="array")
+        self.assertTrue(isinstance(recongraph, empress.ReconGraphWrapper))
+        self.assertEqual(
+            recongraph.recongraph, recon_input.reconcile(1, 1, 1).recongraph
+        )
+        self.assertRaises(ValueError, recon_input.reconcile, 1, 1, 1, engine="none")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+import empress
+from empress.cluster import cluster_util
+from empress.miscs import input_generator
+from empress.reconcile import diameter, median, recongraph_tools
+from empress.reconcile import compact_graph
+from empress.reconcile.compact_graph import CompactReconGraph
+
+
+class CompactReconGraphTestCase(unittest.TestCase):
+    def setUp(self):
+        self.recon_inputs = [
+            empress.ReconInputWrapper.from_files(
+                "./examples/heliconius_host.nwk",
+                "./examples/heliconius_parasite.nwk",
+                "./examples/heliconius_mapping.mapping",
+            ),
+            input_generator.generate_random_recon_input(20, 25),
+        ]
+
+    def test_conversion(self):
+        for recon_input in self.recon_inputs:
+            graph, _, _, roots = recongraph_tools.DP(recon_input, 1, 1, 1)
+            compact = CompactReconGraph.from_dict(graph, roots)
+            self.assertEqual(len(compact), len(graph))
+            self.assertEqual(list(compact.to_dict().items()), list(graph.items()))
+            self.assertEqual(list(compact.as_dict().items()), list(graph.items()))
+            self.assertEqual(compact.root_nodes(), roots)
+            self.assertFalse(("not", "a node") in compact.as_dict())
+
+    def test_count_mprs(self):
+        for recon_input in self.recon_inputs:
+            for costs in [(1, 1, 1), (0, 0, 0), (2, 3, 1)]:
+                graph, _, n_recon, roots = recongraph_tools.DP(recon_input, *costs)
+                compact = CompactReconGraph.from_dict(graph, roots)
+                self.assertEqual(compact.count_mprs(), n_recon)
+                self.assertEqual(
+                    recongraph_tools.count_mprs_wrapper(roots, compact), n_recon
+                )
+
+    def test_frequencies(self):
+        recon_input = self.recon_inputs[1]
+        graph, _, _, roots = recongraph_tools.DP(recon_input, 0, 0, 0)
+        parasite_tree, parasite_root, _ = diameter.reformat_tree(
+            recon_input.parasite_dict, "pTop"
+        )
+        host_tree, _, _ = diameter.reformat_tree(recon_input.host_dict, "hTop")
+        preorder_mapping_nodes = median.mapping_node_sort(
+            parasite_tree, host_tree, list(graph.keys())
+        )[::-1]
+        node_frequencies, event_frequencies, count = median.generate_frequencies_dict(
+            preorder_mapping_nodes, graph, parasite_root
+        )
+
+        compact = CompactReconGraph.from_dict(graph, roots)
+        compact_node_frequencies, compact_event_frequencies, compact_count = (
+            compact.frequencies()
+        )
+        self.assertEqual(compact_count, count)
+        e = 0
+        for i, (mapping_node, events) in enumerate(graph.items()):
+            self.assertAlmostEqual(
+                compact_node_frequencies[i], node_frequencies[mapping_node]
+            )
+            for event in events:
+                # All tip mappings share the same event tuple in event_frequencies
+                if event[0] != "C":
+                    self.assertAlmostEqual(
+                        compact_event_frequencies[e], event_frequencies[event]
+                    )
+                e += 1
+
+    def test_default_roots(self):
+        for recon_input in self.recon_inputs:
+            graph, _, n_recon, roots = recongraph_tools.DP(recon_input, 1, 1, 1)
+            compact = CompactReconGraph.from_dict(graph)
+            self.assertEqual(set(compact.root_nodes()), set(roots))
+            self.assertEqual(compact.count_mprs(), n_recon)
+            self.assertEqual(
+                compact.frequencies(),
+                CompactReconGraph.from_dict(graph, roots).frequencies(),
+            )
+
+        with self.assertRaises(ValueError):
+            CompactReconGraph.from_dict(graph, []).frequencies()
+
+    def test_union(self):
+        recon_input = self.recon_inputs[1]
+        graph1, _, _, roots1 = recongraph_tools.DP(recon_input, 1, 1, 1)
+        graph2, _, _, roots2 = recongraph_tools.DP(recon_input, 1, 2, 1)
+        union = CompactReconGraph.from_dict(graph1, roots1).union(
+            CompactReconGraph.from_dict(graph2, roots2)
+        )
+        expected = cluster_util.graph_union(graph1, graph2)
+        self.assertEqual(list(union.to_dict().items()), list(expected.items()))
+
+    def test_save_load(self):
+        graph, _, _, roots = recongraph_tools.DP(self.recon_inputs[0], 1, 1, 1)
+        compact = CompactReconGraph.from_dict(graph, roots)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "graph.bin")
+            compact.save(path, {"costs": [1, 1, 1]})
+            self.assertEqual(compact_graph.read_metadata(path), {"costs": [1, 1, 1]})
+            for mmap in [True, False]:
+                loaded = CompactReconGraph.load(path, mmap=mmap)
+                self.assertEqual(isinstance(loaded.event_children, np.memmap), mmap)
+                self.assertEqual(list(loaded.to_dict().items()), list(graph.items()))
+                self.assertEqual(loaded.root_nodes(), roots)
+                self.assertEqual(loaded.count_mprs(), compact.count_mprs())
+            # A memory-mapped graph is pickled as its file name
+            loaded = CompactReconGraph.load(path)
+            unpickled = pickle.loads(pickle.dumps(loaded))
+            self.assertLess(len(pickle.dumps(loaded)), 1000)
+            self.assertEqual(list(unpickled.to_dict().items()), list(graph.items()))
+            del loaded, unpickled
+
+    def test_load_errors(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "graph.bin")
+            with open(path, "wb") as graph_file:
+                graph_file.write(b"not a graph")
+            self.assertRaises(ValueError, CompactReconGraph.load, path)
+            with open(path, "wb") as graph_file:
+                graph_file.write(compact_graph._MAGIC)
+                graph_file.write(
+                    np.array(
+                        [compact_graph.FORMAT_VERSION + 1, 0], dtype="<u4"
+                    ).tobytes()
+                )
+            self.assertRaises(ValueError, CompactReconGraph.load, path)
+
+
+if __name__ == "__main__":
+    unittest.main()
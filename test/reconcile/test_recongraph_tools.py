@@ -1,4 +1,5 @@
-from empress.reconcile import recongraph_tools
+from empress.input_reader import _ReconInput
+from empress.reconcile import recongraph_tools, diameter, median
 import unittest
 
 
@@ -35,3 +36,50 @@ class EdgeTreeTraversalTestCase(unittest.TestCase):
         result = list(recongraph_tools.postorder(self.tree, ("Top", "A")))
         expected = [("B", "D"), ("B", "E"), ("A", "B"), ("A", "C"), ("Top", "A")]
         self.assertEqual(result, expected)
+
+
+class DeepTreeTestCase(unittest.TestCase):
+    """
+    Trees much deeper than the recursion limit
+    """
+
+    def setUp(self):
+        depth = 3000
+        newick_string = "p0"
+        for i in range(1, depth):
+            newick_string = "(%s,p%d)" % (newick_string, i)
+        parasite_dict, _ = _ReconInput._parse_newick(newick_string + ";", "parasite")
+        host_dict, _ = _ReconInput._parse_newick("((h0,h1),h2);", "host")
+        tip_mapping = {"p%d" % i: "h%d" % (i % 3) for i in range(depth)}
+        self.recon_input = _ReconInput(
+            host_dict, None, parasite_dict, None, tip_mapping
+        )
+        self.depth = depth
+
+    def test_traversals(self):
+        parasite_dict = self.recon_input.parasite_dict
+        preorder = list(recongraph_tools.preorder(parasite_dict, "pTop"))
+        postorder = list(recongraph_tools.postorder(parasite_dict, "pTop"))
+        self.assertEqual(len(preorder), 2 * self.depth - 1)
+        self.assertEqual(preorder[0], "pTop")
+        self.assertEqual(postorder[-1], "pTop")
+        self.assertEqual(sorted(preorder, key=str), sorted(postorder, key=str))
+        vertex_tree, root, node_count = diameter.reformat_tree(parasite_dict, "pTop")
+        self.assertEqual(list(vertex_tree), [parasite_dict[e][1] for e in postorder])
+        self.assertEqual(node_count, 2 * self.depth - 1)
+
+    def test_reconcile(self):
+        graph, cost, n_recon, roots = recongraph_tools.DP(self.recon_input, 1, 1, 1)
+        self.assertEqual(recongraph_tools.count_mprs_wrapper(roots, graph), n_recon)
+        parasite_tree, parasite_root, _ = diameter.reformat_tree(
+            self.recon_input.parasite_dict, "pTop"
+        )
+        host_tree, _, _ = diameter.reformat_tree(self.recon_input.host_dict, "hTop")
+        median_graph, n_meds, median_roots = median.get_median_graph(
+            graph, parasite_tree, host_tree, parasite_root, roots
+        )
+        med_counts = median.get_med_counts(median_graph, median_roots)
+        random_median = median.choose_random_median_wrapper(
+            median_graph, median_roots, med_counts
+        )
+        self.assertTrue(median.check_subgraph(median_graph, random_median))
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import empress
+from empress.reconcile import recongraph_tools, result_cache
+from empress.reconcile.result_cache import ResultCache
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.recon_input = empress.ReconInputWrapper.from_files(
+            "./examples/heliconius_host.nwk",
+            "./examples/heliconius_parasite.nwk",
+            "./examples/heliconius_mapping.mapping",
+        )
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key(self):
+        key = result_cache.cache_key(self.recon_input, 1, 2, 3)
+        self.assertEqual(key, result_cache.cache_key(self.recon_input, 1.0, 2.0, 3.0))
+        self.assertNotEqual(key, result_cache.cache_key(self.recon_input, 1, 3, 2))
+        # The order of the items of the input does not matter
+        reordered = empress.ReconInputWrapper(
+            dict(reversed(list(self.recon_input.host_dict.items()))),
+            None,
+            self.recon_input.parasite_dict,
+            None,
+            dict(reversed(list(self.recon_input.tip_mapping.items()))),
+        )
+        self.assertEqual(key, result_cache.cache_key(reordered, 1, 2, 3))
+
+    def test_reconcile_hit(self):
+        recongraph = self.recon_input.reconcile(1, 2, 3, cache=self.cache)
+        with mock.patch.dict(empress.RECON_ENGINES, {"dict": None}):
+            # The DP is not run again
+            cached = self.recon_input.reconcile(1, 2, 3, cache=self.cache)
+        self.assertEqual(cached.recongraph, recongraph.recongraph)
+        self.assertEqual(cached.roots, recongraph.roots)
+        self.assertEqual(cached.n_recon, recongraph.n_recon)
+        self.assertEqual(cached.total_cost, recongraph.total_cost)
+        self.assertEqual(cached.event_frequencies, recongraph.event_frequencies)
+        self.assertEqual(cached.node_frequencies, recongraph.node_frequencies)
+
+        expected = recongraph_tools.reconcile(self.recon_input, 1, 2, 3)
+        with mock.patch.object(recongraph_tools, "DP", None):
+            self.assertEqual(
+                recongraph_tools.reconcile(self.recon_input, 1, 2, 3, cache=self.cache),
+                expected,
+            )
+
+    def test_eviction(self):
+        self.recon_input.reconcile(1, 1, 1, cache=self.cache)
+        entry_size = sum(
+            os.path.getsize(os.path.join(self.temp_dir.name, name))
+            for name in os.listdir(self.temp_dir.name)
+        )
+        cache = ResultCache(self.temp_dir.name, int(entry_size * 1.5))
+        self.recon_input.reconcile(2, 1, 1, cache=cache)
+        # Only the most recent entry is left
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 1)
+        self.assertIsNone(cache.get(self.recon_input, 1, 1, 1))
+        self.assertIsNotNone(cache.get(self.recon_input, 2, 1, 1))
+
+    def test_corrupt_entry(self):
+        self.recon_input.reconcile(1, 1, 1, cache=self.cache)
+        (name,) = os.listdir(self.temp_dir.name)
+        for content in [
+            b"not a pickle",
+            # A class of a module that was moved
+            b"cempress.no_such_module\nThing\n.",
+            # An object whose construction fails
+            b"c__builtin__\nint\n(S'not a number'\ntR.",
+        ]:
+            with self.subTest(content=content):
+                with open(os.path.join(self.temp_dir.name, name), "wb") as entry_file:
+                    entry_file.write(content)
+                self.assertIsNone(self.cache.get(self.recon_input, 1, 1, 1))
+                self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import random
+import unittest
+from unittest import mock
+
+import empress
+
+from empress.input_reader import _ReconInput
+from empress.miscs import input_generator
+from empress.reconcile import recongraph_tools, statistics
+
+
+class StatisticsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.recon_input = input_generator.generate_random_recon_input(10, 14)
+
+    def test_trials(self):
+        """
+        The costs of the trials are the costs recongraph_tools.DP finds
+        for the random tip mappings of the streams of the trials
+        """
+        costs = statistics._trials(self.recon_input, 2, 3, 1, 12, seed=5)
+
+        hosts = list(self.recon_input.tip_mapping.values())
+        expected = []
+        for t in range(12):
+            trial_random = statistics._trial_random(5, t)
+            random_phi = statistics._create_random_phi(
+                self.recon_input.tip_mapping, trial_random
+            )
+            for p in self.recon_input.tip_mapping:
+                random_phi[p] = trial_random.choice(hosts)
+            trial_input = _ReconInput(
+                self.recon_input.host_dict,
+                None,
+                self.recon_input.parasite_dict,
+                None,
+                random_phi,
+            )
+            expected.append(recongraph_tools.DP(trial_input, 2, 3, 1)[1])
+        self.assertEqual(costs, expected)
+
+    def test_workers(self):
+        """
+        For a given seed, the results do not depend on the number of workers
+        """
+        expected = statistics.stats(self.recon_input, 2, 3, 1, 30, seed=11)
+        for n_workers in (2, 3):
+            result = statistics.stats(
+                self.recon_input, 2, 3, 1, 30, n_workers=n_workers, seed=11
+            )
+            self.assertEqual(result, expected)
+
+    def test_global_seed(self):
+        """
+        Without a seed, the trials are still reproducible from the random module
+        """
+        random.seed(3)
+        expected = statistics._trials(self.recon_input, 2, 3, 1, 10)
+        random.seed(3)
+        self.assertEqual(statistics._trials(self.recon_input, 2, 3, 1, 10), expected)
+
+    def test_stats(self):
+        mpr_cost, costs, p = statistics.stats(self.recon_input, 2, 3, 1, 20)
+        self.assertEqual(mpr_cost, recongraph_tools.DP(self.recon_input, 2, 3, 1)[1])
+        self.assertEqual(len(costs), 20)
+        r = len([cost for cost in costs if cost <= mpr_cost])
+        self.assertEqual(p, (r + 1) / 21)
+
+    def test_stats_known_cost(self):
+        expected = statistics.stats(self.recon_input, 2, 3, 1, 20, seed=4)
+        with mock.patch.object(statistics.array_dp, "DP_cost") as dp_cost:
+            result = statistics.stats(
+                self.recon_input, 2, 3, 1, 20, seed=4, mpr_cost=expected[0]
+            )
+        # The MPR cost is not computed again
+        dp_cost.assert_not_called()
+        self.assertEqual(result, expected)
+
+    def test_sequential_stats(self):
+        recon_input = empress.ReconInputWrapper.from_files(
+            "./examples/heliconius_host.nwk",
+            "./examples/heliconius_parasite.nwk",
+            "./examples/heliconius_mapping.mapping",
+        )
+        mpr_cost, costs, p, (low, high) = statistics.sequential_stats(
+            recon_input, 2, 3, 1, 1000, 0.05, seed=2
+        )
+        # The heliconius reconciliation is clearly significant
+        self.assertLess(len(costs), 1000)
+        self.assertLess(high, 0.05)
+        self.assertTrue(low <= p <= high)
+        # The trials are the first ones stats runs with the same seed
+        self.assertEqual(
+            (mpr_cost, costs, p),
+            statistics.stats(recon_input, 2, 3, 1, len(costs), seed=2),
+        )
+
+    def test_sequential_stats_undecided(self):
+        # At a confidence of 1 the interval is too wide to exclude alpha = 0.5
+        _, costs, p, (low, high) = statistics.sequential_stats(
+            self.recon_input, 2, 3, 1, 120, 0.5, confidence=1.0, seed=2
+        )
+        self.assertEqual(len(costs), 120)
+        self.assertTrue(low <= 0.5 <= high)
+
+        # The worker processes are started once for all the batches, with the same trials
+        with mock.patch.object(
+            statistics, "ProcessPoolExecutor", wraps=statistics.ProcessPoolExecutor
+        ) as executor:
+            _, parallel_costs, _, _ = statistics.sequential_stats(
+                self.recon_input, 2, 3, 1, 120, 0.5, 1.0, 2, seed=2
+            )
+        executor.assert_called_once_with(2)
+        self.assertEqual(parallel_costs, costs)
+
+    def test_sequential_stats_no_trials(self):
+        with self.assertRaises(ValueError):
+            statistics.sequential_stats(self.recon_input, 2, 3, 1, 0, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
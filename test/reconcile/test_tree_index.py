@@ -0,0 +1,109 @@
+import unittest
+
+import empress
+from empress.histogram import histogram_alg
+from empress.miscs import input_generator
+from empress.reconcile import array_dp, diameter, recongraph_tools
+from empress.reconcile.tree_index import HostTreeIndex, TreeIndex, ancestry_relation
+
+
+class TreeIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.recon_inputs = [
+            empress.ReconInputWrapper.from_files(
+                "./examples/heliconius_host.nwk",
+                "./examples/heliconius_parasite.nwk",
+                "./examples/heliconius_mapping.mapping",
+            ),
+            input_generator.generate_random_recon_input(12, 9),
+        ]
+
+    def test_vertex_tree(self):
+        for recon_input in self.recon_inputs:
+            for tree, root_edge_name in [
+                (recon_input.host_dict, "hTop"),
+                (recon_input.parasite_dict, "pTop"),
+            ]:
+                expected = diameter.reformat_tree(tree, root_edge_name)
+                vertex_tree, root, node_count = TreeIndex(
+                    tree, root_edge_name
+                ).vertex_tree()
+                self.assertEqual(list(vertex_tree.items()), list(expected[0].items()))
+                self.assertEqual((root, node_count), expected[1:])
+
+    def test_ancestral_table(self):
+        for recon_input in self.recon_inputs:
+            host_index = HostTreeIndex(recon_input.host_dict)
+            vertex_tree, root, _ = host_index.vertex_tree()
+            self.assertEqual(
+                host_index.ancestral_table(),
+                diameter.calculate_ancestral_table(vertex_tree),
+            )
+
+    def test_ancestry_relation(self):
+        for recon_input in self.recon_inputs:
+            vertex_tree, _, _ = diameter.reformat_tree(recon_input.host_dict, "hTop")
+            relation = ancestry_relation(vertex_tree)
+            table = diameter.calculate_ancestral_table(vertex_tree)
+            self.assertEqual(
+                {A: {B: relation(A, B) for B in vertex_tree} for A in vertex_tree},
+                table,
+            )
+
+    def test_levels(self):
+        host_index = HostTreeIndex(self.recon_inputs[1].host_dict)
+        # Every internal edge is in exactly one level of each kind
+        for levels in (host_index.height_levels, host_index.depth_levels):
+            ids = sorted(i for level in levels for i in level.tolist())
+            self.assertEqual(
+                ids, sorted(set(range(host_index.size)) - set(host_index.tips))
+            )
+        # Children come before their parents in the height levels
+        seen = set(host_index.tips.tolist())
+        for level in host_index.height_levels:
+            for i in level.tolist():
+                self.assertTrue(set(host_index.child_ids[i]) <= seen)
+            seen.update(level.tolist())
+
+    def test_reuse_in_dp(self):
+        for recon_input in self.recon_inputs:
+            host_index = HostTreeIndex(recon_input.host_dict)
+            for engine in (recongraph_tools.DP, array_dp.DP):
+                expected = engine(recon_input, 2, 3, 1)
+                result = engine(recon_input, 2, 3, 1, host_index=host_index)
+                self.assertEqual(list(result[0].items()), list(expected[0].items()))
+                self.assertEqual(result[1:], expected[1:])
+
+    def test_other_tree(self):
+        host_index = HostTreeIndex(self.recon_inputs[1].host_dict)
+        recon_input = self.recon_inputs[0]
+        for engine in (recongraph_tools.DP, array_dp.DP):
+            with self.assertRaises(ValueError):
+                engine(recon_input, 2, 3, 1, host_index=host_index)
+        with self.assertRaises(ValueError):
+            array_dp.DPBatch(recon_input, [(2, 3, 1)], host_index)
+
+        graph, _, _, _ = recongraph_tools.DP(recon_input, 2, 3, 1)
+        species_tree, _, _ = diameter.reformat_tree(recon_input.host_dict, "hTop")
+        gene_tree, gene_root, _ = diameter.reformat_tree(
+            recon_input.parasite_dict, "pTop"
+        )
+        for algorithm in (
+            diameter.diameter_algorithm,
+            histogram_alg.diameter_algorithm,
+        ):
+            with self.assertRaises(ValueError):
+                algorithm(
+                    species_tree,
+                    gene_tree,
+                    gene_root,
+                    graph,
+                    graph,
+                    False,
+                    False,
+                    species_index=host_index,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 import empress
 import unittest
 import os
+from unittest import mock
+
+from empress.reconcile import median
 
 
 class TestEmpressWrappers(unittest.TestCase):
@@ -31,6 +34,20 @@ class TestEmpressWrappers(unittest.TestCase):
         # the testing recongraph should be designed to have multiple MPRs for DTL = 111
         self.assertGreater(recongraph.n_recon, 1)
 
+    def test_reconcile_batch(self):
+        recon_input = empress.ReconInputWrapper.from_files(
+            self.example_host, self.example_parasite, self.example_mapping
+        )
+        cost_triples = [(1, 1, 1), (2, 3, 1), (1, 4, 2)]
+        batch = recon_input.reconcile_batch(cost_triples)
+        self.assertEqual(len(batch), len(cost_triples))
+        for k, costs in enumerate(cost_triples):
+            recongraph = recon_input.reconcile(*costs)
+            self.assertTrue(isinstance(batch[k], empress.ReconGraphWrapper))
+            self.assertEqual(batch[k].recongraph, recongraph.recongraph)
+            self.assertEqual(batch[k].n_recon, recongraph.n_recon)
+            self.assertEqual(batch.total_costs()[k], recongraph.total_cost)
+
     def test_median(self):
         recon_input = empress.ReconInputWrapper.from_files(
             self.example_host, self.example_parasite, self.example_mapping
@@ -41,6 +58,32 @@ class TestEmpressWrappers(unittest.TestCase):
             isinstance(median_reconciliation, empress.ReconciliationWrapper)
         )
 
+    def test_artifacts(self):
+        recon_input = empress.ReconInputWrapper.from_files(
+            self.example_host, self.example_parasite, self.example_mapping
+        )
+        recongraph = recon_input.reconcile(1, 1, 1)
+        # The frequencies computed by reconcile are reused by median, and the median graph
+        # is only computed once
+        with mock.patch.object(
+            median, "mapping_node_sort", side_effect=AssertionError
+        ), mock.patch.object(
+            median, "generate_frequencies_dict", side_effect=AssertionError
+        ), mock.patch.object(
+            median, "compute_median", wraps=median.compute_median
+        ) as compute_median:
+            for _ in range(3):
+                recongraph.median()
+        self.assertEqual(compute_median.call_count, 1)
+        self.assertIs(recongraph.pdv_histogram, recongraph.pdv_histogram)
+        self.assertEqual(recongraph.pdv_histogram.histogram_dict[0], recongraph.n_recon)
+        # Clustering does not reconcile again
+        with mock.patch.object(
+            empress.recongraph_tools, "DP", side_effect=AssertionError
+        ):
+            clusters = recongraph.cluster(2)
+        self.assertIs(clusters[0].parasite_tree, recongraph.parasite_tree)
+
     def test_clusters(self):
         recon_input = empress.ReconInputWrapper.from_files(
             self.example_host, self.example_parasite, self.example_mapping
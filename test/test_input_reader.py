@@ -141,6 +141,46 @@ class TestInputReader(unittest.TestCase):
         os.remove(parasite_save_path)
         os.remove(tip_mapping_save_path)
 
+    def test_native_newick_parser(self):
+        newick_strings = [
+            "((a:1,b:2)0.95:0.5,(c,'d e')x)r;",
+            "(a,(b,c):2[comment]):1;",
+            "a,b;",
+        ]
+        for file_name in ["./examples/heliconius_host.nwk", self.example_host_file]:
+            with open(file_name) as newick_file:
+                newick_strings.append(newick_file.read().strip())
+        for newick_string in newick_strings:
+            for tree_type in ["host", "parasite"]:
+                tree_dict, distances = input_reader._ReconInput._parse_newick_native(
+                    newick_string, tree_type
+                )
+                expected = input_reader._ReconInput._parse_newick_bio(
+                    newick_string, tree_type
+                )
+                self.assertEqual(list(tree_dict.items()), list(expected[0].items()))
+                self.assertEqual(list(distances.items()), list(expected[1].items()))
+
+    def test_native_newick_parser_deep_tree(self):
+        newick_string = "t0"
+        for i in range(1, 5000):
+            newick_string = "(%s,t%d:1)" % (newick_string, i)
+        tree_dict, distances = input_reader._ReconInput._parse_newick(
+            newick_string + ";", "host"
+        )
+        self.assertEqual(len(tree_dict), 9999)
+        self.assertEqual(distances["t0"], 0)
+        self.assertEqual(distances["t1"], 1)
+
+    def test_newick_fallback(self):
+        # Non-binary trees are left to Bio.Phylo
+        self.assertRaises(
+            input_reader._NewickFallback,
+            input_reader._ReconInput._parse_newick_native,
+            "(a,b,c);",
+            "host",
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
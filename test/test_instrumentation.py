@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import empress
+from empress import instrumentation
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.recon_input = empress.ReconInputWrapper.from_files(
+            "./examples/heliconius_host.nwk",
+            "./examples/heliconius_parasite.nwk",
+            "./examples/heliconius_mapping.mapping",
+        )
+
+    def records(self, run, **tags) -> list:
+        out = io.StringIO()
+        with instrumentation.profiling(out, **tags):
+            run()
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_disabled(self):
+        self.assertFalse(instrumentation.enabled())
+        with instrumentation.span("stage"):
+            # Without profiling, counters go nowhere
+            instrumentation.count(nodes=1)
+
+    def test_nested_spans(self):
+        def run():
+            with instrumentation.span("outer", n=1):
+                with instrumentation.span("inner"):
+                    instrumentation.count(n=2)
+                    data = [0] * 100000
+                del data
+
+        inner, outer = self.records(run, family="f")
+        self.assertEqual(
+            (inner["span"], inner["parent"], inner["depth"], inner["n"]),
+            ("inner", "outer", 1, 2),
+        )
+        self.assertEqual(
+            (outer["span"], outer["parent"], outer["depth"], outer["n"]),
+            ("outer", None, 0, 1),
+        )
+        self.assertEqual((inner["family"], outer["family"]), ("f", "f"))
+        # The list of the inner span is part of the peak of both
+        self.assertGreater(inner["peak_bytes"] - inner["start_bytes"], 800000)
+        self.assertGreaterEqual(outer["peak_bytes"], inner["peak_bytes"])
+        self.assertGreaterEqual(outer["wall"], inner["wall"])
+
+    def test_nested_profiling(self):
+        inner_out = io.StringIO()
+
+        def run():
+            with instrumentation.span("outer"):
+                with instrumentation.profiling(inner_out, family="f"):
+                    with instrumentation.span("inner"):
+                        data = [0] * 100000
+                    del data
+
+        (outer,) = self.records(run)
+        (inner,) = [json.loads(line) for line in inner_out.getvalue().splitlines()]
+        self.assertEqual(
+            (inner["span"], inner["parent"], inner["depth"], inner["family"]),
+            ("inner", "outer", 1, "f"),
+        )
+        self.assertGreaterEqual(outer["peak_bytes"], inner["peak_bytes"])
+        self.assertFalse(instrumentation.enabled())
+
+    def test_reconcile_stages(self):
+        for engine in empress.RECON_ENGINES:
+            records = self.records(
+                lambda: self.recon_input.reconcile(1, 1, 1, engine).median()
+            )
+            spans = {}
+            for record in records:
+                spans.setdefault(record["span"], record)
+            for name in ("dp_tables", "graph_build", "count_mprs", "frequencies"):
+                self.assertEqual(spans[name]["parent"], "reconcile", engine)
+            self.assertEqual(spans["dp_tables"]["parasite_edges"], 2 * 12 - 1)
+            self.assertGreater(spans["graph_build"]["mapping_nodes"], 0)
+            self.assertIn("median_graph", spans)
+            self.assertEqual(records[-1]["span"], "median_graph")
+
+    def test_output_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "profile.jsonl")
+            for family in ("a", "b"):
+                with instrumentation.profiling(path, family=family):
+                    with instrumentation.span("stage"):
+                        pass
+            with open(path) as profile_file:
+                records = [json.loads(line) for line in profile_file]
+        self.assertEqual([record["family"] for record in records], ["a", "b"])
+        self.assertFalse(instrumentation.enabled())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Modules that are only needed to draw, and that take long to import
+DRAWING_MODULES = ["matplotlib", "shapely", "networkx", "Bio"]
+
+# Runs code in a fresh interpreter, then prints how long it took and which drawing modules it imported
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+{}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in {} if name in sys.modules]]))
+"""
+
+
+def run_fresh(code: str) -> tuple:
+    """
+    :return: the time code took to run in a new interpreter, and the drawing modules it imported
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT.format(code, DRAWING_MODULES)],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+    return tuple(json.loads(output.splitlines()[-1]))
+
+
+class StartupTestCase(unittest.TestCase):
+    def test_import_empress(self):
+        elapsed, imported = run_fresh("import empress")
+        self.assertEqual(imported, [], "import empress took {:.3f}s".format(elapsed))
+
+    def test_reconcile_command(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            code = "\n".join(
+                [
+                    "import empress_cli",
+                    "sys.argv = ['empress_cli.py', 'reconcile', 'examples/heliconius_host.nwk',",
+                    "    'examples/heliconius_parasite.nwk', 'examples/heliconius_mapping.mapping',",
+                    "    '--csv', {!r}]".format(os.path.join(temp_dir, "out.csv")),
+                    "empress_cli.main()",
+                ]
+            )
+            elapsed, imported = run_fresh(code)
+        self.assertEqual(
+            imported, [], "empress_cli.py reconcile took {:.3f}s".format(elapsed)
+        )
+
+    def test_drawing_modules_available(self):
+        # The drawing modules are imported on first use
+        elapsed, imported = run_fresh("import empress; empress.histogram_display")
+        self.assertIn("matplotlib", imported)
+
+
+if __name__ == "__main__":
+    unittest.main()